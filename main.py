@@ -1,6 +1,6 @@
 from mymanus.prompt import SYSTEM_PROMPT as system_prompt
-from mymanus.agent import ToolCallingAgent, ToolManager, MemoryManager, LLM
-from mymanus.tool import *
+from mymanus.agent import ToolCallingAgent, ToolManager, MemoryManager, MemoryCompressor, MemoryToolResultStore, LLM
+from mymanus.tool.cache import MemoryToolCache
 import os
 from loguru import logger
 import asyncio
@@ -24,20 +24,24 @@ async def main():
               enable_thinking=False)
 
     # 初始化工具管理器
-    tool_manager = ToolManager()
+    tool_manager = ToolManager(cache=MemoryToolCache(),
+                               schema_cache_path=".tool_schema_cache.json")
     # 初始化记忆管理器
     memory_manager = MemoryManager(max_memory=20)
     # 初始化智能体
     agent = ToolCallingAgent(llm=llm,
                              tool_manager=tool_manager,
                              memory_manager=memory_manager,
+                             memory_compressor=MemoryCompressor(llm=llm),
+                             tool_result_store=MemoryToolResultStore(),
                              max_step=MAX_STEP)
 
-    # 注册工具
-    agent.add_tool(baidu_search, tool_name="baidu_search")
-    agent.add_tool(get_current_time, tool_name="get_current_time")
-    agent.add_tool(terminate, tool_name="terminate")
-    agent.add_tool(add, tool_name="add")
+    # 注册工具，按导入路径懒注册，第一次用到时才导入工具所在的模块
+    agent.add_tool("mymanus.tool.search:baidu_search", tool_name="baidu_search")
+    agent.add_tool("mymanus.tool.general:get_current_time",
+                   tool_name="get_current_time")
+    agent.add_tool("mymanus.tool.terminate:terminate", tool_name="terminate")
+    agent.add_tool("mymanus.tool.math:add", tool_name="add")
 
     while True:
         try:
@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from typing import ClassVar, List, Optional, Set
 
 from pydantic import BaseModel, Field, model_validator
 
+from app.agent.loop_detector import LoopBreakAction, LoopDetector
 from app.llm import LLM
 from app.logger import logger
 from app.sandbox.client import SANDBOX_CLIENT
@@ -41,6 +42,19 @@ class BaseAgent(BaseModel, ABC):
     current_step: int = Field(default=0, description="Current step in execution")
 
     duplicate_threshold: int = 2
+    loop_detector: LoopDetector = Field(
+        default_factory=LoopDetector,
+        description="Detects repeated responses and tool calls",
+    )
+
+    # Fields a spawned agent does not take over, it starts with their defaults
+    spawn_excluded_fields: ClassVar[Set[str]] = {
+        "llm",
+        "memory",
+        "state",
+        "current_step",
+        "loop_detector",
+    }
 
     class Config:
         arbitrary_types_allowed = True
@@ -141,8 +155,9 @@ class BaseAgent(BaseModel, ABC):
                 step_result = await self.step()
 
                 # Check for stuck state
-                if self.is_stuck():
-                    self.handle_stuck_state()
+                loop_action = self.detect_loop()
+                if loop_action:
+                    self.handle_stuck_state(loop_action)
 
                 results.append(f"Step {self.current_step}: {step_result}")
 
@@ -153,6 +168,27 @@ class BaseAgent(BaseModel, ABC):
         await SANDBOX_CLIENT.cleanup()
         return "\n".join(results) if results else "No steps executed"
 
+    def spawn(self) -> Optional["BaseAgent"]:
+        """Create a fresh agent with this agent's configuration.
+
+        The agent is built through the constructor from the explicitly set
+        fields, so validators run again and fields created by a default factory,
+        like most tool collections, are created anew. It shares the LLM but has
+        its own memory, state and loop detector, and can run alongside this agent.
+
+        Returns:
+            The new agent, or None if it would share resources with this agent
+            that concurrent runs cannot use safely.
+        """
+        config = {
+            name: getattr(self, name)
+            for name in self.model_fields_set
+            if name not in self.spawn_excluded_fields
+        }
+        return type(self)(
+            **config, llm=self.llm, loop_detector=self.loop_detector.clone()
+        )
+
     @abstractmethod
     async def step(self) -> str:
         """Execute a single step in the agent's workflow.
@@ -160,30 +196,42 @@ class BaseAgent(BaseModel, ABC):
         Must be implemented by subclasses to define specific behavior.
         """
 
-    def handle_stuck_state(self):
-        """Handle stuck state by adding a prompt to change strategy"""
-        stuck_prompt = "\
-        Observed duplicate responses. Consider new strategies and avoid repeating ineffective paths already attempted."
-        self.next_step_prompt = f"{stuck_prompt}\n{self.next_step_prompt}"
-        logger.warning(f"Agent detected stuck state. Added prompt: {stuck_prompt}")
+    def handle_stuck_state(self, action: Optional[LoopBreakAction] = None):
+        """Handle stuck state by telling the LLM once what it repeats, or stopping.
 
-    def is_stuck(self) -> bool:
-        """Check if the agent is stuck in a loop by detecting duplicate content"""
-        if len(self.memory.messages) < 2:
-            return False
-
-        last_message = self.memory.messages[-1]
-        if not last_message.content:
-            return False
-
-        # Count identical content occurrences
-        duplicate_count = sum(
-            1
-            for msg in reversed(self.memory.messages[:-1])
-            if msg.role == "assistant" and msg.content == last_message.content
+        The instruction is added to memory as a single message instead of being
+        prepended to next_step_prompt, so it is not repeated on every later step.
+        """
+        if action is None:
+            action = self.detect_loop()
+            if action is None:
+                return
+
+        if action.stop:
+            logger.warning(
+                f"Agent still stuck after {action.attempt - 1} attempts to break the "
+                f"loop ({action.reason.value}), stopping"
+            )
+            self.state = AgentState.FINISHED
+            return
+
+        stuck_prompt = action.to_prompt()
+        self.update_memory("user", stuck_prompt)
+        logger.warning(
+            f"Agent detected stuck state ({action.reason.value}). Added prompt: {stuck_prompt}"
         )
 
-        return duplicate_count >= self.duplicate_threshold
+    def detect_loop(self) -> Optional[LoopBreakAction]:
+        """Check the messages added since the last check for repetition.
+
+        Returns:
+            The action to break the loop, or None if the agent is not stuck.
+        """
+        return self.loop_detector.check(self.memory.messages, self.duplicate_threshold)
+
+    def is_stuck(self) -> bool:
+        """Check if the agent is stuck in a loop by detecting duplicate content"""
+        return self.detect_loop() is not None
 
     @property
     def messages(self) -> List[Message]:
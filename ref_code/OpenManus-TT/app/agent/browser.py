@@ -1,5 +1,5 @@
 import json
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, ClassVar, Optional, Set
 
 from pydantic import Field, model_validator
 
@@ -107,6 +107,11 @@ class BrowserAgent(ToolCallAgent):
 
     browser_context_helper: Optional[BrowserContextHelper] = None
 
+    # A spawned agent binds its own helper to itself
+    spawn_excluded_fields: ClassVar[Set[str]] = ToolCallAgent.spawn_excluded_fields | {
+        "browser_context_helper"
+    }
+
     @model_validator(mode="after")
     def initialize_helper(self) -> "BrowserAgent":
         self.browser_context_helper = BrowserContextHelper(self)
@@ -0,0 +1,277 @@
+import hashlib
+import json
+import random
+import re
+from collections import Counter, deque
+from enum import Enum
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from app.schema import Message, ToolCall
+
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# MinHash permutations h -> (a * h + b) mod p, fixed so signatures are comparable
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_PERMUTATIONS = [
+    (rng.randrange(1, _MINHASH_PRIME), rng.randrange(_MINHASH_PRIME))
+    for rng in [random.Random(0)]
+    for _ in range(32)
+]
+
+# Messages scanned back for the last one already observed, bounds a check even
+# when the memory was replaced
+MAX_SCAN_MESSAGES = 200
+
+
+class LoopReason(str, Enum):
+    """Why the agent is considered stuck"""
+
+    REPEATED_RESPONSE = "repeated_response"
+    SIMILAR_RESPONSE = "similar_response"
+    REPEATED_TOOL_CALL = "repeated_tool_call"
+
+
+class LoopBreakAction(BaseModel):
+    """What the agent should do to get out of a detected loop"""
+
+    reason: LoopReason = Field(..., description="Kind of repetition detected")
+    occurrences: int = Field(
+        ..., description="Earlier occurrences within the detection window"
+    )
+    tool_call: Optional[str] = Field(
+        None, description="The repeated tool call, as name(arguments)"
+    )
+    attempt: int = Field(
+        1, description="Consecutive steps this loop was detected, including this one"
+    )
+    stop: bool = Field(False, description="Whether the agent should stop running")
+
+    def to_prompt(self) -> str:
+        """Formats the action as a one-off instruction for the LLM."""
+        if self.reason == LoopReason.REPEATED_TOOL_CALL:
+            problem = (
+                f"The tool call {self.tool_call} was already made "
+                f"{self.occurrences} time(s) with the same arguments and returned "
+                "the same result each time, repeating it will not change that."
+            )
+        elif self.reason == LoopReason.SIMILAR_RESPONSE:
+            problem = "Your last response is nearly identical to earlier ones."
+        else:
+            problem = "Your last response repeats an earlier one word for word."
+        return (
+            f"{problem} Consider new strategies and avoid repeating ineffective "
+            "paths already attempted: use the results you already have, try "
+            "different tools or arguments, or finish the task if it is done."
+        )
+
+
+class _Entry(NamedTuple):
+    """Fingerprints of one assistant message in the detection window"""
+
+    content_hash: Optional[int]
+    minhash: Optional[Tuple[int, ...]]
+    tool_hashes: Tuple[int, ...]
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+def minhash(tokens: List[str]) -> Tuple[int, ...]:
+    """MinHash signature of a set of words.
+
+    The share of equal positions in two signatures estimates the Jaccard
+    similarity of the word sets.
+    """
+    hashes = [_hash(token) % _MINHASH_PRIME for token in set(tokens)]
+    return tuple(
+        min((a * value + b) % _MINHASH_PRIME for value in hashes)
+        for a, b in _MINHASH_PERMUTATIONS
+    )
+
+
+def minhash_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the word sets behind two signatures."""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def _tool_call_signature(tool_call: ToolCall) -> str:
+    """Tool name and canonical arguments, equal for equal calls."""
+    arguments = tool_call.function.arguments or "{}"
+    try:
+        arguments = json.dumps(
+            json.loads(arguments), sort_keys=True, separators=(",", ":")
+        )
+    except (TypeError, ValueError):
+        pass
+    return f"{tool_call.function.name}({arguments})"
+
+
+class LoopDetector(BaseModel):
+    """Detects an agent repeating itself in constant time per message.
+
+    Keeps fingerprints of the last window_size assistant messages: a hash of the
+    normalized content, a MinHash signature of its words, and a hash per tool
+    call of name, arguments and result. A call returning something new each
+    time, like scrolling through a long page, is progress and not a loop.
+    Counters over the window make exact repetition checks O(1); near-duplicate
+    checks compare against at most window_size signatures of fixed length.
+
+    Attributes:
+        window_size: Assistant messages remembered.
+        similarity_threshold: Estimated word overlap from which two responses
+            count as near-duplicates.
+        min_similarity_words: Words a response needs for the near-duplicate
+            check, shorter ones are only compared exactly.
+        max_attempts: Consecutive detections after which the agent is stopped.
+    """
+
+    window_size: int = Field(20, description="Assistant messages remembered")
+    similarity_threshold: float = Field(
+        0.8, description="Word overlap from which responses are near-duplicates"
+    )
+    min_similarity_words: int = Field(
+        8, description="Words a response needs for the near-duplicate check"
+    )
+    max_attempts: int = Field(
+        3, description="Consecutive detections after which the agent is stopped"
+    )
+
+    _window: Deque[_Entry] = PrivateAttr(default_factory=deque)
+    _content_counts: Counter = PrivateAttr(default_factory=Counter)
+    _tool_counts: Counter = PrivateAttr(default_factory=Counter)
+    _last_seen: Optional[Message] = PrivateAttr(default=None)
+    _attempts: int = PrivateAttr(default=0)
+
+    def clone(self) -> "LoopDetector":
+        """Returns a detector with the same settings and no observed messages."""
+        return type(self)(**self.model_dump())
+
+    def reset(self) -> None:
+        """Forgets all observed messages."""
+        self._window.clear()
+        self._content_counts.clear()
+        self._tool_counts.clear()
+        self._last_seen = None
+        self._attempts = 0
+
+    def check(
+        self, messages: List[Message], duplicate_threshold: int
+    ) -> Optional[LoopBreakAction]:
+        """Observes the messages added since the last check.
+
+        Args:
+            messages: The agent's memory.
+            duplicate_threshold: Earlier occurrences that make a repetition a loop.
+
+        Returns:
+            The action to break the loop, or None if the agent is not stuck.
+        """
+        new_messages = []
+        for message in reversed(messages[-MAX_SCAN_MESSAGES:]):
+            if message is self._last_seen:
+                break
+            new_messages.append(message)
+        if messages:
+            self._last_seen = messages[-1]
+
+        # A tool call only repeats if its result does too
+        results = {
+            message.tool_call_id: message.content
+            for message in new_messages
+            if message.role == "tool" and message.tool_call_id
+        }
+        action = None
+        for message in reversed(new_messages):
+            if message.role == "assistant":
+                action = self._observe(message, duplicate_threshold, results) or action
+
+        if action is None:
+            if new_messages:
+                self._attempts = 0
+            return None
+
+        self._attempts += 1
+        action.attempt = self._attempts
+        action.stop = self._attempts > self.max_attempts
+        return action
+
+    def _observe(
+        self, message: Message, duplicate_threshold: int, results: Dict[str, str]
+    ) -> Optional[LoopBreakAction]:
+        """Adds an assistant message to the window, returning a detected loop.
+
+        Args:
+            message: The assistant message.
+            duplicate_threshold: Earlier occurrences that make a repetition a loop.
+            results: Tool results observed with the message, by tool call id.
+        """
+        content_hash = content_minhash = None
+        if message.content:
+            tokens = _WORD_PATTERN.findall(message.content.lower())
+            if tokens:
+                content_hash = _hash(" ".join(tokens))
+                if len(tokens) >= self.min_similarity_words:
+                    content_minhash = minhash(tokens)
+        tool_calls = message.tool_calls or []
+        signatures = [_tool_call_signature(call) for call in tool_calls]
+        tool_hashes = tuple(
+            _hash(f"{signature}\n{results.get(call.id) or ''}")
+            for call, signature in zip(tool_calls, signatures)
+        )
+
+        # Tool calls repeat more often than thoughts and say more about a loop
+        action = None
+        for signature, tool_hash in zip(signatures, tool_hashes):
+            if self._tool_counts[tool_hash] >= duplicate_threshold:
+                action = LoopBreakAction(
+                    reason=LoopReason.REPEATED_TOOL_CALL,
+                    occurrences=self._tool_counts[tool_hash],
+                    tool_call=signature,
+                )
+                break
+        if action is None and content_hash is not None:
+            if self._content_counts[content_hash] >= duplicate_threshold:
+                action = LoopBreakAction(
+                    reason=LoopReason.REPEATED_RESPONSE,
+                    occurrences=self._content_counts[content_hash],
+                )
+            elif content_minhash is not None:
+                similar = sum(
+                    1
+                    for entry in self._window
+                    if entry.minhash is not None
+                    and minhash_similarity(entry.minhash, content_minhash)
+                    >= self.similarity_threshold
+                )
+                if similar >= duplicate_threshold:
+                    action = LoopBreakAction(
+                        reason=LoopReason.SIMILAR_RESPONSE, occurrences=similar
+                    )
+
+        self._add(_Entry(content_hash, content_minhash, tool_hashes))
+        return action
+
+    def _add(self, entry: _Entry) -> None:
+        self._window.append(entry)
+        if entry.content_hash is not None:
+            self._content_counts[entry.content_hash] += 1
+        self._tool_counts.update(entry.tool_hashes)
+
+        while len(self._window) > self.window_size:
+            evicted = self._window.popleft()
+            if evicted.content_hash is not None:
+                self._decrement(self._content_counts, evicted.content_hash)
+            for tool_hash in evicted.tool_hashes:
+                self._decrement(self._tool_counts, tool_hash)
+
+    @staticmethod
+    def _decrement(counter: Counter, key: int) -> None:
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
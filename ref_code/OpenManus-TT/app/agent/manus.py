@@ -1,6 +1,7 @@
-from typing import Dict, List, Optional
+import asyncio
+from typing import ClassVar, Dict, List, Optional, Set
 
-from pydantic import Field, model_validator
+from pydantic import Field, PrivateAttr, model_validator
 
 from app.agent.browser import BrowserContextHelper
 from app.agent.toolcall import ToolCallAgent
@@ -28,7 +29,9 @@ class Manus(ToolCallAgent):
     max_steps: int = 20
 
     # MCP clients for remote tool access
-    mcp_clients: MCPClients = Field(default_factory=MCPClients)
+    mcp_clients: MCPClients = Field(
+        default_factory=lambda: MCPClients.from_settings(config.mcp_config)
+    )
 
     # Add general-purpose tools to the tool collection
     available_tools: ToolCollection = Field(
@@ -49,6 +52,17 @@ class Manus(ToolCallAgent):
         default_factory=dict
     )  # server_id -> url/command
     _initialized: bool = False
+    # tools_version of mcp_clients last mirrored into available_tools
+    _mcp_tools_version: int = PrivateAttr(default=-1)
+
+    # A spawned agent builds its own tools, browser helper and MCP connections,
+    # each run disconnects its MCP clients in cleanup so they cannot be shared
+    spawn_excluded_fields: ClassVar[Set[str]] = ToolCallAgent.spawn_excluded_fields | {
+        "available_tools",
+        "browser_context_helper",
+        "mcp_clients",
+        "connected_servers",
+    }
 
     @model_validator(mode="after")
     def initialize_helper(self) -> "Manus":
@@ -65,28 +79,43 @@ class Manus(ToolCallAgent):
         return instance
 
     async def initialize_mcp_servers(self) -> None:
-        """Initialize connections to configured MCP servers."""
+        """Initialize connections to configured MCP servers.
+
+        All servers connect concurrently. A server not ready within the
+        configured connect timeout keeps connecting in the background and its
+        tools join the agent once it is, cached tools are offered meanwhile.
+        """
+        timeout = config.mcp_config.connect_timeout
+        connections = {}
         for server_id, server_config in config.mcp_config.servers.items():
-            try:
-                if server_config.type == "sse":
-                    if server_config.url:
-                        await self.connect_mcp_server(server_config.url, server_id)
-                        logger.info(
-                            f"Connected to MCP server {server_id} at {server_config.url}"
-                        )
-                elif server_config.type == "stdio":
-                    if server_config.command:
-                        await self.connect_mcp_server(
-                            server_config.command,
-                            server_id,
-                            use_stdio=True,
-                            stdio_args=server_config.args,
-                        )
-                        logger.info(
-                            f"Connected to MCP server {server_id} using command {server_config.command}"
-                        )
-            except Exception as e:
-                logger.error(f"Failed to connect to MCP server {server_id}: {e}")
+            if server_config.type == "sse" and server_config.url:
+                connections[server_id] = self.connect_mcp_server(
+                    server_config.url, server_id, timeout=timeout
+                )
+            elif server_config.type == "stdio" and server_config.command:
+                connections[server_id] = self.connect_mcp_server(
+                    server_config.command,
+                    server_id,
+                    use_stdio=True,
+                    stdio_args=server_config.args,
+                    timeout=timeout,
+                )
+
+        results = await asyncio.gather(*connections.values(), return_exceptions=True)
+        for server_id, result in zip(connections, results):
+            server_config = config.mcp_config.servers[server_id]
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(
+                    f"MCP server {server_id} not ready after {timeout}s, it joins when connected"
+                )
+            elif isinstance(result, Exception):
+                logger.error(f"Failed to connect to MCP server {server_id}: {result}")
+            else:
+                logger.info(
+                    f"Connected to MCP server {server_id} using "
+                    f"{server_config.url or server_config.command}"
+                )
+        self._sync_mcp_tools()
 
     async def connect_mcp_server(
         self,
@@ -94,22 +123,48 @@ class Manus(ToolCallAgent):
         server_id: str = "",
         use_stdio: bool = False,
         stdio_args: List[str] = None,
+        timeout: Optional[float] = None,
     ) -> None:
-        """Connect to an MCP server and add its tools."""
-        if use_stdio:
-            await self.mcp_clients.connect_stdio(
-                server_url, stdio_args or [], server_id
-            )
-            self.connected_servers[server_id or server_url] = server_url
-        else:
-            await self.mcp_clients.connect_sse(server_url, server_id)
-            self.connected_servers[server_id or server_url] = server_url
+        """Connect to an MCP server and add its tools.
+
+        Raises asyncio.TimeoutError if the server is not ready within timeout,
+        it then keeps connecting and its tools are added once it is.
+        """
+        self.connected_servers[server_id or server_url] = server_url
+        try:
+            if use_stdio:
+                await self.mcp_clients.connect_stdio(
+                    server_url, stdio_args or [], server_id, timeout=timeout
+                )
+            else:
+                await self.mcp_clients.connect_sse(
+                    server_url, server_id, timeout=timeout
+                )
+        except asyncio.TimeoutError:
+            raise
+        except Exception:
+            self.connected_servers.pop(server_id or server_url, None)
+            raise
+        finally:
+            self._sync_mcp_tools()
+
+    def _sync_mcp_tools(self) -> None:
+        """Mirrors the tools of the MCP servers into the available tools.
+
+        Servers connecting in the background add and remove tools, this is
+        cheap to call when nothing changed.
+        """
+        if self._mcp_tools_version == self.mcp_clients.tools_version:
+            return
+        self._mcp_tools_version = self.mcp_clients.tools_version
 
-        # Update available tools with only the new tools from this server
-        new_tools = [
-            tool for tool in self.mcp_clients.tools if tool.server_id == server_id
+        base_tools = [
+            tool
+            for tool in self.available_tools.tools
+            if not isinstance(tool, MCPClientTool)
         ]
-        self.available_tools.add_tools(*new_tools)
+        self.available_tools = ToolCollection(*base_tools)
+        self.available_tools.add_tools(*self.mcp_clients.tools)
 
     async def disconnect_mcp_server(self, server_id: str = "") -> None:
         """Disconnect from an MCP server and remove its tools."""
@@ -120,13 +175,7 @@ class Manus(ToolCallAgent):
             self.connected_servers.clear()
 
         # Rebuild available tools without the disconnected server's tools
-        base_tools = [
-            tool
-            for tool in self.available_tools.tools
-            if not isinstance(tool, MCPClientTool)
-        ]
-        self.available_tools = ToolCollection(*base_tools)
-        self.available_tools.add_tools(*self.mcp_clients.tools)
+        self._sync_mcp_tools()
 
     async def cleanup(self):
         """Clean up Manus agent resources."""
@@ -142,6 +191,8 @@ class Manus(ToolCallAgent):
         if not self._initialized:
             await self.initialize_mcp_servers()
             self._initialized = True
+        # Pick up servers that finished connecting in the background
+        self._sync_mcp_tools()
 
         original_prompt = self.next_step_prompt
         recent_messages = self.memory.messages[-3:] if self.memory.messages else []
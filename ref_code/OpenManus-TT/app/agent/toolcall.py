@@ -1,8 +1,8 @@
 import asyncio
 import json
-from typing import Any, List, Optional, Union
+from typing import Any, ClassVar, Dict, List, Optional, Set, Union
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 
 from app.agent.react import ReActAgent
 from app.exceptions import TokenLimitExceeded
@@ -14,6 +14,16 @@ from app.tool import CreateChatCompletion, Terminate, ToolCollection
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
 
+# Characters of a tool result shown in the log, the rest is only counted
+LOG_PREVIEW_CHARS = 500
+
+
+def _preview(text: str, limit: int = LOG_PREVIEW_CHARS) -> str:
+    """Shortens text for the log, so large results cost no logging I/O."""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
+
 
 class ToolCallAgent(ReActAgent):
     """Base agent class for handling tool/function calls with enhanced abstraction"""
@@ -31,10 +41,18 @@ class ToolCallAgent(ReActAgent):
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
-    _current_base64_image: Optional[str] = None
+    # Images returned by the tool calls of the current step, by tool call id
+    _tool_call_images: Dict[str, str] = PrivateAttr(default_factory=dict)
 
     max_steps: int = 30
     max_observe: Optional[Union[int, bool]] = None
+    max_concurrent_tools: int = Field(
+        default=4, description="Concurrency-safe tool calls of a step run at once"
+    )
+
+    spawn_excluded_fields: ClassVar[Set[str]] = ReActAgent.spawn_excluded_fields | {
+        "tool_calls"
+    }
 
     async def think(self) -> bool:
         """Process current state and decide next actions using tools"""
@@ -138,30 +156,69 @@ class ToolCallAgent(ReActAgent):
             return self.messages[-1].content or "No content or commands to execute"
 
         results = []
-        for command in self.tool_calls:
-            # Reset base64_image for each tool call
-            self._current_base64_image = None
+        self._tool_call_images.clear()
+        for batch in self._batch_tool_calls(self.tool_calls):
+            batch_results = await self._execute_batch(batch)
+
+            # Results enter memory in call order, however the calls interleaved
+            for command, result in zip(batch, batch_results):
+                logger.info(
+                    f"🎯 Tool '{command.function.name}' completed its mission! Result: {_preview(result)}"
+                )
 
-            result = await self.execute_tool(command)
+                # Add tool response to memory
+                tool_msg = Message.tool_message(
+                    content=result,
+                    tool_call_id=command.id,
+                    name=command.function.name,
+                    base64_image=self._tool_call_images.pop(command.id, None),
+                )
+                self.memory.add_message(tool_msg)
+                results.append(result)
 
-            if self.max_observe:
-                result = result[: self.max_observe]
+        return "\n\n".join(results)
 
-            logger.info(
-                f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
-            )
+    def _batch_tool_calls(self, tool_calls: List[ToolCall]) -> List[List[ToolCall]]:
+        """Groups consecutive concurrency-safe calls, every other call runs alone.
+
+        A call that is not concurrency-safe acts as a barrier, so it still sees
+        the effects of all calls before it and none of those after it.
+        """
+        batches: List[List[ToolCall]] = []
+        for command in tool_calls:
+            if (
+                self._is_concurrency_safe(command)
+                and batches
+                and self._is_concurrency_safe(batches[-1][0])
+            ):
+                batches[-1].append(command)
+            else:
+                batches.append([command])
+        return batches
+
+    def _is_concurrency_safe(self, command: ToolCall) -> bool:
+        """Check if a tool call may run concurrently with its neighbours"""
+        if not command or not command.function:
+            return False
+        tool = self.available_tools.get_tool(command.function.name)
+        return (
+            tool is not None
+            and tool.concurrency_safe
+            and not self._is_special_tool(command.function.name)
+        )
 
-            # Add tool response to memory
-            tool_msg = Message.tool_message(
-                content=result,
-                tool_call_id=command.id,
-                name=command.function.name,
-                base64_image=self._current_base64_image,
-            )
-            self.memory.add_message(tool_msg)
-            results.append(result)
+    async def _execute_batch(self, batch: List[ToolCall]) -> List[str]:
+        """Executes a batch of tool calls, at most max_concurrent_tools at once."""
+        if len(batch) == 1:
+            return [await self.execute_tool(batch[0])]
 
-        return "\n\n".join(results)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_tools))
+
+        async def execute(command: ToolCall) -> str:
+            async with semaphore:
+                return await self.execute_tool(command)
+
+        return list(await asyncio.gather(*(execute(command) for command in batch)))
 
     async def execute_tool(self, command: ToolCall) -> str:
         """Execute a single tool call with robust error handling"""
@@ -186,24 +243,12 @@ class ToolCallAgent(ReActAgent):
             # Check if result is a ToolResult with base64_image
             if hasattr(result, "base64_image") and result.base64_image:
                 # Store the base64_image for later use in tool_message
-                self._current_base64_image = result.base64_image
+                self._tool_call_images[command.id] = result.base64_image
 
-                # Format result for display
-                observation = (
-                    f"Observed output of cmd `{name}` executed:\n{str(result)}"
-                    if result
-                    else f"Cmd `{name}` completed with no output"
-                )
-                return observation
+            if not result:
+                return f"Cmd `{name}` completed with no output"
 
-            # Format result for display (standard case)
-            observation = (
-                f"Observed output of cmd `{name}` executed:\n{str(result)}"
-                if result
-                else f"Cmd `{name}` completed with no output"
-            )
-
-            return observation
+            return self._format_observation(name, result)
         except json.JSONDecodeError:
             error_msg = f"Error parsing arguments for {name}: Invalid JSON format"
             logger.error(
@@ -215,6 +260,20 @@ class ToolCallAgent(ReActAgent):
             logger.exception(error_msg)
             return f"Error: {error_msg}"
 
+    def _format_observation(self, name: str, result: Any) -> str:
+        """Format a tool result as an observation of at most max_observe characters.
+
+        Only the part of the output that is kept gets copied into the observation,
+        str() of a string output, or of a ToolResult holding one, does not copy it.
+        """
+        prefix = f"Observed output of cmd `{name}` executed:\n"
+        output = str(result)
+        if not self.max_observe:
+            return prefix + output
+        if len(prefix) >= self.max_observe:
+            return prefix[: self.max_observe]
+        return prefix + output[: self.max_observe - len(prefix)]
+
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """Handle special tool execution and state changes"""
         if not self._is_special_tool(name):
@@ -230,6 +289,24 @@ class ToolCallAgent(ReActAgent):
         """Determine if tool execution should finish the agent"""
         return True
 
+    def spawn(self) -> Optional["ToolCallAgent"]:
+        """Create a fresh agent, unless it would share tools that are not concurrency-safe.
+
+        Tools passed to this agent or given as a class-level default are the same
+        objects in the spawned agent, and those keeping session state, like a
+        shell or a browser, would mix the two runs.
+        """
+        agent = super().spawn()
+        if self.available_tools is None or agent.available_tools is None:
+            return agent
+        own_tools = {id(tool) for tool in self.available_tools}
+        if any(
+            id(tool) in own_tools and not tool.concurrency_safe
+            for tool in agent.available_tools
+        ):
+            return None
+        return agent
+
     def _is_special_tool(self, name: str) -> bool:
         """Check if tool name is in special tools list"""
         return name.lower() in [n.lower() for n in self.special_tool_names]
@@ -1,16 +1,27 @@
+import asyncio
 import json
 import sys
+import threading
 import time
 import uuid
 from datetime import datetime
-from typing import Dict, List, Literal, Optional
+from typing import Callable, Dict, List, Literal, Optional, Union
 
 import boto3
 
 
-# Global variables to track the current tool use ID across function calls
-# Tmp solution
-CURRENT_TOOLUSE_ID = None
+# Marks the end of a stream in the queue between the worker thread and the loop
+_STREAM_END = object()
+
+# OpenAI finish reasons of the Bedrock stop reasons
+_FINISH_REASONS = {
+    "end_turn": "stop",
+    "stop_sequence": "stop",
+    "tool_use": "tool_calls",
+    "max_tokens": "length",
+    "guardrail_intervened": "content_filter",
+    "content_filtered": "content_filter",
+}
 
 
 # Class to handle OpenAI-style response formatting
@@ -36,11 +47,11 @@ class OpenAIResponse:
 
 # Main client class for interacting with Amazon Bedrock
 class BedrockClient:
-    def __init__(self):
+    def __init__(self, client=None, queue_size: int = 64):
         # Initialize Bedrock client, you need to configure AWS env first
         try:
-            self.client = boto3.client("bedrock-runtime")
-            self.chat = Chat(self.client)
+            self.client = client or boto3.client("bedrock-runtime")
+            self.chat = Chat(self.client, queue_size)
         except Exception as e:
             print(f"Error initializing Bedrock client: {e}")
             sys.exit(1)
@@ -48,14 +59,16 @@ class BedrockClient:
 
 # Chat interface class
 class Chat:
-    def __init__(self, client):
-        self.completions = ChatCompletions(client)
+    def __init__(self, client, queue_size: int = 64):
+        self.completions = ChatCompletions(client, queue_size)
 
 
 # Core class handling chat completions functionality
 class ChatCompletions:
-    def __init__(self, client):
+    def __init__(self, client, queue_size: int = 64):
         self.client = client
+        # Chunks a stream buffers before its worker thread waits for the consumer
+        self.queue_size = queue_size
 
     def _convert_openai_tools_to_bedrock_format(self, tools):
         # Convert OpenAI function calling format to Bedrock tool format
@@ -97,36 +110,39 @@ class ChatCompletions:
                 }
                 bedrock_messages.append(bedrock_message)
             elif message.get("role") == "assistant":
-                bedrock_message = {
-                    "role": "assistant",
-                    "content": [{"text": message.get("content")}],
-                }
-                openai_tool_calls = message.get("tool_calls", [])
-                if openai_tool_calls:
+                content = []
+                if message.get("content"):
+                    content.append({"text": message.get("content")})
+                for openai_tool_call in message.get("tool_calls") or []:
                     bedrock_tool_use = {
-                        "toolUseId": openai_tool_calls[0]["id"],
-                        "name": openai_tool_calls[0]["function"]["name"],
+                        "toolUseId": openai_tool_call["id"],
+                        "name": openai_tool_call["function"]["name"],
                         "input": json.loads(
-                            openai_tool_calls[0]["function"]["arguments"]
+                            openai_tool_call["function"]["arguments"] or "{}"
                         ),
                     }
-                    bedrock_message["content"].append({"toolUse": bedrock_tool_use})
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = openai_tool_calls[0]["id"]
-                bedrock_messages.append(bedrock_message)
+                    content.append({"toolUse": bedrock_tool_use})
+                bedrock_messages.append(
+                    {"role": "assistant", "content": content or [{"text": "."}]}
+                )
             elif message.get("role") == "tool":
-                bedrock_message = {
-                    "role": "user",
-                    "content": [
-                        {
-                            "toolResult": {
-                                "toolUseId": CURRENT_TOOLUSE_ID,
-                                "content": [{"text": message.get("content")}],
-                            }
-                        }
-                    ],
+                tool_result = {
+                    "toolResult": {
+                        "toolUseId": message.get("tool_call_id"),
+                        "content": [{"text": message.get("content")}],
+                    }
                 }
-                bedrock_messages.append(bedrock_message)
+                # Results of the tool calls of one assistant turn share a user turn,
+                # since Bedrock requires user and assistant turns to alternate
+                previous = bedrock_messages[-1] if bedrock_messages else None
+                if (
+                    previous
+                    and previous["role"] == "user"
+                    and "toolResult" in previous["content"][-1]
+                ):
+                    previous["content"].append(tool_result)
+                else:
+                    bedrock_messages.append({"role": "user", "content": [tool_result]})
             else:
                 raise ValueError(f"Invalid role: {message.get('role')}")
         return system_prompt, bedrock_messages
@@ -146,10 +162,8 @@ class ChatCompletions:
             for content_item in bedrock_response["output"]["message"]["content"]:
                 if content_item.get("toolUse"):
                     bedrock_tool_use = content_item["toolUse"]
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = bedrock_tool_use["toolUseId"]
                     openai_tool_call = {
-                        "id": CURRENT_TOOLUSE_ID,
+                        "id": bedrock_tool_use["toolUseId"],
                         "type": "function",
                         "function": {
                             "name": bedrock_tool_use["name"],
@@ -166,7 +180,9 @@ class ChatCompletions:
             "system_fingerprint": None,
             "choices": [
                 {
-                    "finish_reason": bedrock_response.get("stopReason", "end_turn"),
+                    "finish_reason": _convert_stop_reason(
+                        bedrock_response.get("stopReason", "end_turn")
+                    ),
                     "index": 0,
                     "message": {
                         "content": content,
@@ -180,40 +196,46 @@ class ChatCompletions:
                     },
                 }
             ],
-            "usage": {
-                "completion_tokens": bedrock_response.get("usage", {}).get(
-                    "outputTokens", 0
-                ),
-                "prompt_tokens": bedrock_response.get("usage", {}).get(
-                    "inputTokens", 0
-                ),
-                "total_tokens": bedrock_response.get("usage", {}).get("totalTokens", 0),
-            },
+            "usage": _convert_usage(bedrock_response.get("usage", {})),
         }
         return OpenAIResponse(openai_format)
 
-    async def _invoke_bedrock(
+    def _build_request(
         self,
         model: str,
         messages: List[Dict[str, str]],
         max_tokens: int,
         temperature: float,
         tools: Optional[List[dict]] = None,
-        tool_choice: Literal["none", "auto", "required"] = "auto",
-        **kwargs,
-    ) -> OpenAIResponse:
-        # Non-streaming invocation of Bedrock model
+    ) -> dict:
+        # Build the converse / converse_stream request
         (
             system_prompt,
             bedrock_messages,
         ) = self._convert_openai_messages_to_bedrock_format(messages)
-        response = self.client.converse(
-            modelId=model,
-            system=system_prompt,
-            messages=bedrock_messages,
-            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
-            toolConfig={"tools": tools} if tools else None,
-        )
+        request = {
+            "modelId": model,
+            "system": system_prompt,
+            "messages": bedrock_messages,
+            "inferenceConfig": {"temperature": temperature, "maxTokens": max_tokens},
+        }
+        if tools:
+            request["toolConfig"] = {"tools": tools}
+        return request
+
+    async def _invoke_bedrock(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[dict]] = None,
+        tool_choice: Literal["none", "auto", "required"] = "auto",
+        **kwargs,
+    ) -> OpenAIResponse:
+        # Non-streaming invocation of Bedrock model, boto3 blocks so it runs in a thread
+        request = self._build_request(model, messages, max_tokens, temperature, tools)
+        response = await asyncio.to_thread(self.client.converse, **request)
         openai_response = self._convert_bedrock_response_to_openai_format(response)
         return openai_response
 
@@ -226,78 +248,16 @@ class ChatCompletions:
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         **kwargs,
-    ) -> OpenAIResponse:
+    ) -> "BedrockStream":
         # Streaming invocation of Bedrock model
-        (
-            system_prompt,
-            bedrock_messages,
-        ) = self._convert_openai_messages_to_bedrock_format(messages)
-        response = self.client.converse_stream(
-            modelId=model,
-            system=system_prompt,
-            messages=bedrock_messages,
-            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
-            toolConfig={"tools": tools} if tools else None,
-        )
-
-        # Initialize response structure
-        bedrock_response = {
-            "output": {"message": {"role": "", "content": []}},
-            "stopReason": "",
-            "usage": {},
-            "metrics": {},
-        }
-        bedrock_response_text = ""
-        bedrock_response_tool_input = ""
-
-        # Process streaming response
-        stream = response.get("stream")
-        if stream:
-            for event in stream:
-                if event.get("messageStart", {}).get("role"):
-                    bedrock_response["output"]["message"]["role"] = event[
-                        "messageStart"
-                    ]["role"]
-                if event.get("contentBlockDelta", {}).get("delta", {}).get("text"):
-                    bedrock_response_text += event["contentBlockDelta"]["delta"]["text"]
-                    print(
-                        event["contentBlockDelta"]["delta"]["text"], end="", flush=True
-                    )
-                if event.get("contentBlockStop", {}).get("contentBlockIndex") == 0:
-                    bedrock_response["output"]["message"]["content"].append(
-                        {"text": bedrock_response_text}
-                    )
-                if event.get("contentBlockStart", {}).get("start", {}).get("toolUse"):
-                    bedrock_tool_use = event["contentBlockStart"]["start"]["toolUse"]
-                    tool_use = {
-                        "toolUseId": bedrock_tool_use["toolUseId"],
-                        "name": bedrock_tool_use["name"],
-                    }
-                    bedrock_response["output"]["message"]["content"].append(
-                        {"toolUse": tool_use}
-                    )
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = bedrock_tool_use["toolUseId"]
-                if event.get("contentBlockDelta", {}).get("delta", {}).get("toolUse"):
-                    bedrock_response_tool_input += event["contentBlockDelta"]["delta"][
-                        "toolUse"
-                    ]["input"]
-                    print(
-                        event["contentBlockDelta"]["delta"]["toolUse"]["input"],
-                        end="",
-                        flush=True,
-                    )
-                if event.get("contentBlockStop", {}).get("contentBlockIndex") == 1:
-                    bedrock_response["output"]["message"]["content"][1]["toolUse"][
-                        "input"
-                    ] = json.loads(bedrock_response_tool_input)
-        print()
-        openai_response = self._convert_bedrock_response_to_openai_format(
-            bedrock_response
+        request = self._build_request(model, messages, max_tokens, temperature, tools)
+        return BedrockStream(
+            lambda: self.client.converse_stream(**request),
+            model,
+            queue_size=self.queue_size,
         )
-        return openai_response
 
-    def create(
+    async def create(
         self,
         model: str,
         messages: List[Dict[str, str]],
@@ -307,13 +267,14 @@ class ChatCompletions:
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         **kwargs,
-    ) -> OpenAIResponse:
-        # Main entry point for chat completion
+    ) -> Union[OpenAIResponse, "BedrockStream"]:
+        # Main entry point for chat completion. Like the OpenAI client, a streaming
+        # request returns an async iterator of chat.completion.chunk objects
         bedrock_tools = []
         if tools is not None:
             bedrock_tools = self._convert_openai_tools_to_bedrock_format(tools)
         if stream:
-            return self._invoke_bedrock_stream(
+            return await self._invoke_bedrock_stream(
                 model,
                 messages,
                 max_tokens,
@@ -323,7 +284,7 @@ class ChatCompletions:
                 **kwargs,
             )
         else:
-            return self._invoke_bedrock(
+            return await self._invoke_bedrock(
                 model,
                 messages,
                 max_tokens,
@@ -332,3 +293,217 @@ class ChatCompletions:
                 tool_choice,
                 **kwargs,
             )
+
+
+def _convert_stop_reason(stop_reason: Optional[str]) -> Optional[str]:
+    # Map a Bedrock stop reason to an OpenAI finish reason
+    if stop_reason is None:
+        return None
+    return _FINISH_REASONS.get(stop_reason, "stop")
+
+
+def _convert_usage(usage: dict) -> dict:
+    # Map Bedrock token usage to OpenAI usage
+    return {
+        "completion_tokens": usage.get("outputTokens", 0),
+        "prompt_tokens": usage.get("inputTokens", 0),
+        "total_tokens": usage.get("totalTokens", 0),
+    }
+
+
+class _StreamState:
+    """Converts the events of one Bedrock stream into OpenAI-style chunks.
+
+    Each stream has its own state, so concurrent requests never share tool use ids.
+    """
+
+    def __init__(self, model: str):
+        self.id = f"chatcmpl-{uuid.uuid4()}"
+        self.created = int(time.time())
+        self.model = model
+        # OpenAI tool call index of each Bedrock tool use content block
+        self.tool_call_indexes: Dict[int, int] = {}
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[dict] = None
+
+    def _chunk(
+        self,
+        delta: dict,
+        finish_reason: Optional[str] = None,
+        usage: Optional[dict] = None,
+    ) -> OpenAIResponse:
+        return OpenAIResponse(
+            {
+                "id": self.id,
+                "object": "chat.completion.chunk",
+                "created": self.created,
+                "model": self.model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {
+                            "role": None,
+                            "content": None,
+                            "tool_calls": None,
+                            **delta,
+                        },
+                        "finish_reason": finish_reason,
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+
+    def convert(self, event: dict) -> List[OpenAIResponse]:
+        """Returns the chunks for one stream event."""
+        if "messageStart" in event:
+            return [self._chunk({"role": event["messageStart"].get("role")})]
+
+        if "contentBlockStart" in event:
+            block = event["contentBlockStart"]
+            tool_use = block.get("start", {}).get("toolUse")
+            if not tool_use:
+                return []
+            index = len(self.tool_call_indexes)
+            self.tool_call_indexes[block["contentBlockIndex"]] = index
+            tool_call = {
+                "index": index,
+                "id": tool_use["toolUseId"],
+                "type": "function",
+                "function": {"name": tool_use["name"], "arguments": ""},
+            }
+            return [self._chunk({"tool_calls": [tool_call]})]
+
+        if "contentBlockDelta" in event:
+            block = event["contentBlockDelta"]
+            delta = block.get("delta", {})
+            if delta.get("text"):
+                return [self._chunk({"content": delta["text"]})]
+            if "toolUse" in delta:
+                tool_call = {
+                    "index": self.tool_call_indexes[block["contentBlockIndex"]],
+                    "id": None,
+                    "type": None,
+                    "function": {
+                        "name": None,
+                        "arguments": delta["toolUse"].get("input", ""),
+                    },
+                }
+                return [self._chunk({"tool_calls": [tool_call]})]
+            return []
+
+        if "messageStop" in event:
+            self.finish_reason = _convert_stop_reason(
+                event["messageStop"].get("stopReason", "end_turn")
+            )
+        elif "metadata" in event:
+            self.usage = _convert_usage(event["metadata"].get("usage", {}))
+        return []
+
+    def finish(self) -> OpenAIResponse:
+        """Returns the last chunk, carrying the finish reason and token usage.
+
+        Bedrock sends usage after the stop event, so the finish reason is held
+        back until the stream ends.
+        """
+        return self._chunk({}, self.finish_reason or "stop", self.usage)
+
+
+class BedrockStream:
+    """Async iterator over the chunks of a Bedrock converse stream.
+
+    boto3 reads the event stream with blocking calls, so it is consumed in a
+    worker thread. Chunks are handed to the event loop through a queue bounded by
+    queue_size, which pauses the worker when the consumer falls behind instead of
+    buffering the whole response. Closing the stream stops the worker and
+    releases the HTTP connection.
+    """
+
+    def __init__(
+        self, start: Callable[[], dict], model: str, queue_size: int = 64
+    ) -> None:
+        """Starts the worker thread.
+
+        Args:
+            start: Blocking call sending the request and returning the boto3
+                response holding the event stream.
+            model: Model ID reported in the chunks.
+            queue_size: Chunks buffered before the worker waits for the consumer.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._slots = threading.Semaphore(queue_size)
+        self._closed = threading.Event()
+        self._done = False
+        self._state = _StreamState(model)
+        self._thread = threading.Thread(
+            target=self._pump, args=(start,), name="bedrock-stream", daemon=True
+        )
+        self._thread.start()
+
+    def _pump(self, start: Callable[[], dict]) -> None:
+        # Worker thread: sends the request and forwards converted events
+        stream = None
+        try:
+            stream = start().get("stream")
+            for event in stream or []:
+                for chunk in self._state.convert(event):
+                    if not self._put(chunk):
+                        return
+            self._put(self._state.finish())
+        except BaseException as e:
+            self._put(e, bounded=False)
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            self._put(_STREAM_END, bounded=False)
+
+    def _put(self, item, bounded: bool = True) -> bool:
+        # Hands an item to the event loop, waiting for a free slot for chunks.
+        # Returns False once the consumer closed the stream
+        while bounded and not self._slots.acquire(timeout=0.1):
+            if self._closed.is_set():
+                return False
+        if self._closed.is_set():
+            return False
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop is closed
+            self._closed.set()
+            return False
+        return True
+
+    def __aiter__(self) -> "BedrockStream":
+        return self
+
+    async def __anext__(self) -> OpenAIResponse:
+        if self._done:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is _STREAM_END:
+            self._done = True
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            self._done = True
+            self.close()
+            raise item
+        self._slots.release()
+        return item
+
+    def close(self) -> None:
+        """Stops the worker, chunks not consumed yet are dropped."""
+        self._done = True
+        self._closed.set()
+
+    async def aclose(self) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "BedrockStream":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        self._closed.set()
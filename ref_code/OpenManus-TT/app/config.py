@@ -44,7 +44,7 @@ class SearchSettings(BaseModel):
     )
     retry_delay: int = Field(
         default=60,
-        description="Seconds to wait before retrying all engines again after they all fail",
+        description="Maximum seconds to wait before retrying all engines again after they all fail",
     )
     max_retries: int = Field(
         default=3,
@@ -58,6 +58,74 @@ class SearchSettings(BaseModel):
         default="us",
         description="Country code for search results (e.g., us, cn, uk)",
     )
+    race_engines: int = Field(
+        default=1,
+        description="Number of healthiest engines to query concurrently (1 tries engines one by one)",
+    )
+    race_deadline: float = Field(
+        default=15.0,
+        description="Seconds to wait for racing engines before cancelling stragglers",
+    )
+    race_merge: bool = Field(
+        default=False,
+        description="Merge and deduplicate results from all racing engines that answer before the deadline instead of returning the first good result",
+    )
+    breaker_failure_threshold: int = Field(
+        default=3,
+        description="Consecutive failures after which an engine's circuit breaker opens",
+    )
+    breaker_cooldown: float = Field(
+        default=30.0,
+        description="Seconds an open circuit breaker keeps an engine out of rotation",
+    )
+
+
+class ScreenshotSettings(BaseModel):
+    """Capture policy for the screenshots attached to browser states"""
+
+    full_page: bool = Field(
+        False, description="Capture the full page instead of the viewport"
+    )
+    token_budget: int = Field(
+        1105,
+        description="Image tokens a screenshot may cost, larger screenshots are downscaled",
+    )
+    quality: int = Field(75, description="JPEG quality of the screenshots")
+    min_quality: int = Field(
+        40, description="Lowest JPEG quality used to bring a screenshot under max_bytes"
+    )
+    max_bytes: int = Field(
+        200_000, description="Encoded size above which the JPEG quality is lowered"
+    )
+    skip_unchanged: bool = Field(
+        True, description="Omit the screenshot when the page did not change"
+    )
+    cache_size: int = Field(
+        16, description="Number of encoded screenshots cached by page state"
+    )
+
+
+class BrowserPoolSettings(BaseModel):
+    """Configuration for the browser pool shared by browser tool instances"""
+
+    enabled: bool = Field(
+        False, description="Share pooled browsers instead of launching one per tool"
+    )
+    max_browsers: int = Field(2, description="Maximum number of browser processes")
+    max_contexts_per_browser: int = Field(
+        4, description="Contexts open at the same time in one browser"
+    )
+    max_uses: int = Field(
+        50, description="Contexts a browser serves before it is recycled"
+    )
+    context_memory_limit_mb: Optional[int] = Field(
+        512,
+        description="JS heap of a released context above which its browser is recycled",
+    )
+    warm_contexts: int = Field(0, description="Number of contexts kept ready")
+    warmup_urls: List[str] = Field(
+        default_factory=list, description="Pages loaded into warm contexts"
+    )
 
 
 class BrowserSettings(BaseModel):
@@ -83,6 +151,14 @@ class BrowserSettings(BaseModel):
     max_content_length: int = Field(
         2000, description="Maximum length for content retrieval operations"
     )
+    screenshot: ScreenshotSettings = Field(
+        default_factory=ScreenshotSettings,
+        description="Capture policy for the screenshots of browser states",
+    )
+    pool: BrowserPoolSettings = Field(
+        default_factory=BrowserPoolSettings,
+        description="Browser pool shared by browser tool instances",
+    )
 
 
 class SandboxSettings(BaseModel):
@@ -119,6 +195,25 @@ class MCPSettings(BaseModel):
     servers: Dict[str, MCPServerConfig] = Field(
         default_factory=dict, description="MCP server configurations"
     )
+    connect_timeout: float = Field(
+        10.0,
+        description="Seconds to wait for a server at startup before it joins later",
+    )
+    catalog_cache_dir: Optional[str] = Field(
+        str(PROJECT_ROOT / ".cache" / "mcp_tools"),
+        description="Directory caching server tool catalogs, None disables the cache",
+    )
+    max_in_flight: int = Field(
+        8, description="Tool calls sent to one server at a time, others queue"
+    )
+    call_timeout: Optional[float] = Field(
+        300.0,
+        description="Seconds a tool call may take before it is cancelled, None waits forever",
+    )
+    coalesce_calls: bool = Field(
+        False,
+        description="Share one request between concurrent calls with equal arguments",
+    )
 
     @classmethod
     def load_server_config(cls) -> Dict[str, MCPServerConfig]:
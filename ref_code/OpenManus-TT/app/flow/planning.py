@@ -1,9 +1,11 @@
+import asyncio
 import json
+import re
 import time
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Set, Union
 
-from pydantic import Field
+from pydantic import BaseModel, Field
 
 from app.agent.base import BaseAgent
 from app.flow.base import BaseFlow
@@ -13,6 +15,10 @@ from app.schema import AgentState, Message, ToolChoice
 from app.tool import PlanningTool
 
 
+# Characters of each prerequisite step's result passed to the steps depending on it
+PREREQUISITE_RESULT_LIMIT = 2000
+
+
 class PlanStepStatus(str, Enum):
     """Enum class defining possible statuses of a plan step"""
 
@@ -42,14 +48,34 @@ class PlanStepStatus(str, Enum):
         }
 
 
+class PlanStep(BaseModel):
+    """A step of the active plan as tracked by the flow's scheduler"""
+
+    index: int
+    text: str
+    type: Optional[str] = None
+    dependencies: List[int] = Field(default_factory=list)
+    status: PlanStepStatus = PlanStepStatus.NOT_STARTED
+    result: Optional[str] = None
+
+
 class PlanningFlow(BaseFlow):
-    """A flow that manages planning and execution of tasks using agents."""
+    """A flow that manages planning and execution of tasks using agents.
+
+    Plan steps form a dependency graph. Steps whose dependencies are completed run
+    concurrently, up to max_parallel_steps at a time, each on its own agent instance.
+    """
 
     llm: LLM = Field(default_factory=lambda: LLM())
     planning_tool: PlanningTool = Field(default_factory=PlanningTool)
     executor_keys: List[str] = Field(default_factory=list)
     active_plan_id: str = Field(default_factory=lambda: f"plan_{int(time.time())}")
-    current_step_index: Optional[int] = None
+    max_parallel_steps: int = Field(
+        default=4, description="Maximum number of plan steps running at the same time"
+    )
+    steps: List[PlanStep] = Field(
+        default_factory=list, description="Step index of the active plan"
+    )
 
     def __init__(
         self, agents: Union[BaseAgent, List[BaseAgent], Dict[str, BaseAgent]], **data
@@ -108,26 +134,17 @@ class PlanningFlow(BaseFlow):
                     )
                     return f"Failed to create plan for: {input_text}"
 
-            result = ""
-            while True:
-                # Get current step to execute
-                self.current_step_index, step_info = await self._get_current_step_info()
-
-                # Exit if no more steps or plan completed
-                if self.current_step_index is None:
-                    result += await self._finalize_plan()
-                    break
+            if self.active_plan_id not in self.planning_tool.plans:
+                logger.error(f"Plan with ID {self.active_plan_id} not found")
+                return f"Execution failed: Plan with ID {self.active_plan_id} not found"
 
-                # Execute current step with appropriate agent
-                step_type = step_info.get("type") if step_info else None
-                executor = self.get_executor(step_type)
-                step_result = await self._execute_step(executor, step_info)
-                result += step_result + "\n"
-
-                # Check if agent wants to terminate
-                if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
-                    break
+            self._build_step_index()
+            results, terminated = await self._run_steps()
+            result = "".join(f"{results[index]}\n" for index in sorted(results))
 
+            # A finished agent ends the flow without a summary, as it already concluded
+            if not terminated:
+                result += await self._finalize_plan()
             return result
         except Exception as e:
             logger.error(f"Error in PlanningFlow: {str(e)}")
@@ -141,7 +158,9 @@ class PlanningFlow(BaseFlow):
         system_message = Message.system_message(
             "You are a planning assistant. Create a concise, actionable plan with clear steps. "
             "Focus on key milestones rather than detailed sub-steps. "
-            "Optimize for clarity and efficiency."
+            "Optimize for clarity and efficiency. "
+            "Steps that do not need each other's results can run in parallel, "
+            "so give the dependencies of each step instead of chaining independent steps."
         )
 
         # Create a user message with the request
@@ -174,7 +193,12 @@ class PlanningFlow(BaseFlow):
                     args["plan_id"] = self.active_plan_id
 
                     # Execute the tool via ToolCollection instead of directly
-                    result = await self.planning_tool.execute(**args)
+                    try:
+                        result = await self.planning_tool.execute(**args)
+                    except Exception as e:
+                        # Typically invalid dependencies, fall back to the default plan
+                        logger.error(f"Failed to create plan: {e}")
+                        break
 
                     logger.info(f"Plan creation result: {str(result)}")
                     return
@@ -192,83 +216,131 @@ class PlanningFlow(BaseFlow):
             }
         )
 
-    async def _get_current_step_info(self) -> tuple[Optional[int], Optional[dict]]:
-        """
-        Parse the current plan to identify the first non-completed step's index and info.
-        Returns (None, None) if no active step is found.
-        """
-        if (
-            not self.active_plan_id
-            or self.active_plan_id not in self.planning_tool.plans
-        ):
-            logger.error(f"Plan with ID {self.active_plan_id} not found")
-            return None, None
-
-        try:
-            # Direct access to plan data from planning tool storage
-            plan_data = self.planning_tool.plans[self.active_plan_id]
-            steps = plan_data.get("steps", [])
-            step_statuses = plan_data.get("step_statuses", [])
+    def _build_step_index(self) -> None:
+        """Build the structured step index from the active plan's storage.
 
-            # Find first non-completed step
-            for i, step in enumerate(steps):
-                if i >= len(step_statuses):
-                    status = PlanStepStatus.NOT_STARTED.value
-                else:
-                    status = step_statuses[i]
-
-                if status in PlanStepStatus.get_active_statuses():
-                    # Extract step type/category if available
-                    step_info = {"text": step}
-
-                    # Try to extract step type from the text (e.g., [SEARCH] or [CODE])
-                    import re
-
-                    type_match = re.search(r"\[([A-Z_]+)\]", step)
-                    if type_match:
-                        step_info["type"] = type_match.group(1).lower()
+        Step types come from tags in the step text (e.g., [SEARCH] or [CODE]). Steps
+        without explicit dependencies depend on the previous step, and steps left in
+        progress by an earlier run are started again.
+        """
+        plan_data = self.planning_tool.plans[self.active_plan_id]
+        step_texts = plan_data.get("steps", [])
+        step_statuses = plan_data.get("step_statuses", [])
+        step_dependencies = plan_data.get("step_dependencies")
+
+        self.steps = []
+        for i, text in enumerate(step_texts):
+            status = step_statuses[i] if i < len(step_statuses) else None
+            if status not in PlanStepStatus.get_all_statuses():
+                status = PlanStepStatus.NOT_STARTED
+            elif status == PlanStepStatus.IN_PROGRESS:
+                status = PlanStepStatus.NOT_STARTED
+
+            type_match = re.search(r"\[([A-Z_]+)\]", text)
+            if step_dependencies:
+                dependencies = list(step_dependencies[i])
+            else:
+                dependencies = [i - 1] if i > 0 else []
+
+            self.steps.append(
+                PlanStep(
+                    index=i,
+                    text=text,
+                    type=type_match.group(1).lower() if type_match else None,
+                    dependencies=dependencies,
+                    status=PlanStepStatus(status),
+                )
+            )
 
-                    # Mark current step as in_progress
-                    try:
-                        await self.planning_tool.execute(
-                            command="mark_step",
-                            plan_id=self.active_plan_id,
-                            step_index=i,
-                            step_status=PlanStepStatus.IN_PROGRESS.value,
-                        )
-                    except Exception as e:
-                        logger.warning(f"Error marking step as in_progress: {e}")
-                        # Update step status directly if needed
-                        if i < len(step_statuses):
-                            step_statuses[i] = PlanStepStatus.IN_PROGRESS.value
-                        else:
-                            while len(step_statuses) < i:
-                                step_statuses.append(PlanStepStatus.NOT_STARTED.value)
-                            step_statuses.append(PlanStepStatus.IN_PROGRESS.value)
+    def _get_ready_steps(self) -> List[PlanStep]:
+        """Return the not started steps whose dependencies are all completed."""
+        return [
+            step
+            for step in self.steps
+            if step.status == PlanStepStatus.NOT_STARTED
+            and all(
+                self.steps[index].status == PlanStepStatus.COMPLETED
+                for index in step.dependencies
+            )
+        ]
 
-                        plan_data["step_statuses"] = step_statuses
+    async def _run_steps(self) -> tuple[Dict[int, str], bool]:
+        """Run the plan's steps in dependency order, independent steps concurrently.
 
-                    return i, step_info
+        Returns the results by step index and whether an executor finished the task,
+        in which case no further steps are started. Steps depending on a failed step
+        are never started.
+        """
+        results: Dict[int, str] = {}
+        running: Dict[asyncio.Task, tuple[PlanStep, BaseAgent]] = {}
+        busy_agents: Set[int] = set()
+        terminated = False
 
-            return None, None  # No active step found
+        try:
+            while True:
+                if not terminated:
+                    for step in self._get_ready_steps():
+                        if len(running) >= self.max_parallel_steps:
+                            break
+                        executor = self._acquire_executor(step, busy_agents)
+                        if executor is None:
+                            # Its agent is busy and cannot be spawned, retried
+                            # once a running step completes
+                            continue
+                        await self._update_step_status(step, PlanStepStatus.IN_PROGRESS)
+                        task = asyncio.create_task(self._execute_step(executor, step))
+                        running[task] = (step, executor)
 
-        except Exception as e:
-            logger.warning(f"Error finding current step index: {e}")
-            return None, None
+                if not running:
+                    break
 
-    async def _execute_step(self, executor: BaseAgent, step_info: dict) -> str:
-        """Execute the current step with the specified agent using agent.run()."""
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    step, executor = running.pop(task)
+                    busy_agents.discard(id(executor))
+                    results[step.index] = task.result()
+
+                    # Check if agent wants to terminate
+                    if executor.state == AgentState.FINISHED:
+                        terminated = True
+        finally:
+            for task in running:
+                task.cancel()
+
+        return results, terminated
+
+    def _acquire_executor(
+        self, step: PlanStep, busy_agents: Set[int]
+    ) -> Optional[BaseAgent]:
+        """Get the executor for a step, spawning a fresh agent if it is running another step.
+
+        The spawned agent shares the LLM but has its own tools, memory and state.
+        Returns None if the agent is busy and cannot be spawned, as its tools are
+        not safe to share, so the step has to wait for it.
+        """
+        executor = self.get_executor(step.type)
+        if id(executor) in busy_agents:
+            executor = executor.spawn()
+            if executor is None:
+                return None
+        busy_agents.add(id(executor))
+        return executor
+
+    async def _execute_step(self, executor: BaseAgent, step: PlanStep) -> str:
+        """Execute a step with the specified agent using agent.run()."""
         # Prepare context for the agent with current plan status
         plan_status = await self._get_plan_text()
-        step_text = step_info.get("text", f"Step {self.current_step_index}")
+        prerequisites = self._get_prerequisite_results(step)
 
         # Create a prompt for the agent to execute the current step
         step_prompt = f"""
         CURRENT PLAN STATUS:
         {plan_status}
-
+        {prerequisites}
         YOUR CURRENT TASK:
-        You are now working on step {self.current_step_index}: "{step_text}"
+        You are now working on step {step.index}: "{step.text}"
 
         Please execute this step using the appropriate tools. When you're done, provide a summary of what you accomplished.
         """
@@ -276,30 +348,51 @@ class PlanningFlow(BaseFlow):
         # Use agent.run() to execute the step
         try:
             step_result = await executor.run(step_prompt)
+            step.result = step_result
 
             # Mark the step as completed after successful execution
-            await self._mark_step_completed()
+            await self._update_step_status(step, PlanStepStatus.COMPLETED)
 
             return step_result
         except Exception as e:
-            logger.error(f"Error executing step {self.current_step_index}: {e}")
-            return f"Error executing step {self.current_step_index}: {str(e)}"
+            logger.error(f"Error executing step {step.index}: {e}")
+            await self._update_step_status(step, PlanStepStatus.BLOCKED, str(e))
+            return f"Error executing step {step.index}: {str(e)}"
 
-    async def _mark_step_completed(self) -> None:
-        """Mark the current step as completed."""
-        if self.current_step_index is None:
-            return
+    def _get_prerequisite_results(self, step: PlanStep) -> str:
+        """Format the results of the steps a step depends on.
+
+        Steps may run on fresh agent instances that did not see these results.
+        """
+        sections = []
+        for index in step.dependencies:
+            result = self.steps[index].result
+            if not result:
+                continue
+            if len(result) > PREREQUISITE_RESULT_LIMIT:
+                result = "..." + result[-PREREQUISITE_RESULT_LIMIT:]
+            sections.append(f"Step {index} result:\n{result}")
+
+        if not sections:
+            return ""
+        return "\nRESULTS OF PREREQUISITE STEPS:\n" + "\n\n".join(sections) + "\n"
+
+    async def _update_step_status(
+        self, step: PlanStep, status: PlanStepStatus, notes: Optional[str] = None
+    ) -> None:
+        """Update a step's status in the step index and in the planning tool."""
+        step.status = status
 
         try:
-            # Mark the step as completed
             await self.planning_tool.execute(
                 command="mark_step",
                 plan_id=self.active_plan_id,
-                step_index=self.current_step_index,
-                step_status=PlanStepStatus.COMPLETED.value,
+                step_index=step.index,
+                step_status=status.value,
+                step_notes=notes,
             )
             logger.info(
-                f"Marked step {self.current_step_index} as completed in plan {self.active_plan_id}"
+                f"Marked step {step.index} as {status.value} in plan {self.active_plan_id}"
             )
         except Exception as e:
             logger.warning(f"Failed to update plan status: {e}")
@@ -309,11 +402,11 @@ class PlanningFlow(BaseFlow):
                 step_statuses = plan_data.get("step_statuses", [])
 
                 # Ensure the step_statuses list is long enough
-                while len(step_statuses) <= self.current_step_index:
+                while len(step_statuses) <= step.index:
                     step_statuses.append(PlanStepStatus.NOT_STARTED.value)
 
                 # Update the status
-                step_statuses[self.current_step_index] = PlanStepStatus.COMPLETED.value
+                step_statuses[step.index] = status.value
                 plan_data["step_statuses"] = step_statuses
 
     async def _get_plan_text(self) -> str:
@@ -1,5 +1,5 @@
 import math
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 import tiktoken
 from openai import (
@@ -68,7 +68,7 @@ class TokenCounter:
         For "low" detail: fixed 85 tokens
         For "high" detail:
         1. Scale to fit in 2048x2048 square
-        2. Scale shortest side to 768px
+        2. Scale shortest side down to 768px
         3. Count 512px tiles (170 tokens each)
         4. Add 85 tokens
         """
@@ -86,12 +86,12 @@ class TokenCounter:
             # If dimensions are provided in the image_item
             if "dimensions" in image_item:
                 width, height = image_item["dimensions"]
-                return self._calculate_high_detail_tokens(width, height)
+                return self.high_detail_tokens(width, height)
 
         # Default values when dimensions aren't available or detail level is unknown
         if detail == "high":
             # Default to a 1024x1024 image calculation for high detail
-            return self._calculate_high_detail_tokens(1024, 1024)  # 765 tokens
+            return self.high_detail_tokens(1024, 1024)  # 765 tokens
         elif detail == "medium":
             # Default to a medium-sized image for medium detail
             return 1024  # This matches the original default
@@ -99,28 +99,31 @@ class TokenCounter:
             # For unknown detail levels, use medium as default
             return 1024
 
-    def _calculate_high_detail_tokens(self, width: int, height: int) -> int:
-        """Calculate tokens for high detail images based on dimensions"""
+    @staticmethod
+    def high_detail_tokens(width: int, height: int) -> int:
+        """Calculate tokens for high detail images based on dimensions
+
+        Images are only ever downscaled, a smaller image keeps its size.
+        """
         # Step 1: Scale to fit in MAX_SIZE x MAX_SIZE square
-        if width > self.MAX_SIZE or height > self.MAX_SIZE:
-            scale = self.MAX_SIZE / max(width, height)
-            width = int(width * scale)
-            height = int(height * scale)
+        scale = min(1.0, TokenCounter.MAX_SIZE / max(width, height))
+        width, height = width * scale, height * scale
 
-        # Step 2: Scale so shortest side is HIGH_DETAIL_TARGET_SHORT_SIDE
-        scale = self.HIGH_DETAIL_TARGET_SHORT_SIDE / min(width, height)
-        scaled_width = int(width * scale)
-        scaled_height = int(height * scale)
+        # Step 2: Scale so shortest side is at most HIGH_DETAIL_TARGET_SHORT_SIDE
+        scale = min(
+            1.0, TokenCounter.HIGH_DETAIL_TARGET_SHORT_SIDE / min(width, height)
+        )
+        width, height = width * scale, height * scale
 
         # Step 3: Count number of 512px tiles
-        tiles_x = math.ceil(scaled_width / self.TILE_SIZE)
-        tiles_y = math.ceil(scaled_height / self.TILE_SIZE)
+        tiles_x = math.ceil(width / TokenCounter.TILE_SIZE)
+        tiles_y = math.ceil(height / TokenCounter.TILE_SIZE)
         total_tiles = tiles_x * tiles_y
 
         # Step 4: Calculate final token count
         return (
-            total_tiles * self.HIGH_DETAIL_TILE_TOKENS
-        ) + self.LOW_DETAIL_IMAGE_TOKENS
+            total_tiles * TokenCounter.HIGH_DETAIL_TILE_TOKENS
+        ) + TokenCounter.LOW_DETAIL_IMAGE_TOKENS
 
     def count_content(self, content: Union[str, List[Union[str, dict]]]) -> int:
         """Calculate tokens for message content"""
@@ -151,29 +154,33 @@ class TokenCounter:
                 token_count += self.count_text(function.get("arguments", ""))
         return token_count
 
-    def count_message_tokens(self, messages: List[dict]) -> int:
-        """Calculate the total number of tokens in a message list"""
-        total_tokens = self.FORMAT_TOKENS  # Base format tokens
+    def count_message(self, message: dict) -> int:
+        """Calculate the number of tokens of a single message"""
+        tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
 
-        for message in messages:
-            tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+        # Add role tokens
+        tokens += self.count_text(message.get("role", ""))
+
+        # Add content tokens
+        if "content" in message:
+            tokens += self.count_content(message["content"])
 
-            # Add role tokens
-            tokens += self.count_text(message.get("role", ""))
+        # Add tool calls tokens
+        if "tool_calls" in message:
+            tokens += self.count_tool_calls(message["tool_calls"])
 
-            # Add content tokens
-            if "content" in message:
-                tokens += self.count_content(message["content"])
+        # Add name and tool_call_id tokens
+        tokens += self.count_text(message.get("name", ""))
+        tokens += self.count_text(message.get("tool_call_id", ""))
 
-            # Add tool calls tokens
-            if "tool_calls" in message:
-                tokens += self.count_tool_calls(message["tool_calls"])
+        return tokens
 
-            # Add name and tool_call_id tokens
-            tokens += self.count_text(message.get("name", ""))
-            tokens += self.count_text(message.get("tool_call_id", ""))
+    def count_message_tokens(self, messages: List[dict]) -> int:
+        """Calculate the total number of tokens in a message list"""
+        total_tokens = self.FORMAT_TOKENS  # Base format tokens
 
-            total_tokens += tokens
+        for message in messages:
+            total_tokens += self.count_message(message)
 
         return total_tokens
 
@@ -277,6 +284,9 @@ class LLM:
         """
         Format messages for LLM by converting them to OpenAI message format.
 
+        The formatted dict of a Message object is cached on the message, so it
+        must not be modified.
+
         Args:
             messages: List of messages that can be either dict or Message objects
             supports_images: Flag indicating if the target model supports image inputs
@@ -299,64 +309,108 @@ class LLM:
         formatted_messages = []
 
         for message in messages:
-            # Convert Message objects to dictionaries
-            if isinstance(message, Message):
-                message = message.to_dict()
-
-            if isinstance(message, dict):
-                # If message is a dict, ensure it has required fields
-                if "role" not in message:
-                    raise ValueError("Message dict must contain 'role' field")
-
-                # Process base64 images if present and model supports images
-                if supports_images and message.get("base64_image"):
-                    # Initialize or convert content to appropriate format
-                    if not message.get("content"):
-                        message["content"] = []
-                    elif isinstance(message["content"], str):
-                        message["content"] = [
-                            {"type": "text", "text": message["content"]}
-                        ]
-                    elif isinstance(message["content"], list):
-                        # Convert string items to proper text objects
-                        message["content"] = [
-                            (
-                                {"type": "text", "text": item}
-                                if isinstance(item, str)
-                                else item
-                            )
-                            for item in message["content"]
-                        ]
-
-                    # Add the image to content
-                    message["content"].append(
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{message['base64_image']}"
-                            },
-                        }
-                    )
+            formatted = LLM._format_cached(message, supports_images)
+            if formatted is not None:
+                formatted_messages.append(formatted)
 
-                    # Remove the base64_image field
-                    del message["base64_image"]
-                # If model doesn't support images but message has base64_image, handle gracefully
-                elif not supports_images and message.get("base64_image"):
-                    # Just remove the base64_image field and keep the text content
-                    del message["base64_image"]
+        return formatted_messages
 
-                if "content" in message or "tool_calls" in message:
-                    formatted_messages.append(message)
-                # else: do not include the message
-            else:
-                raise TypeError(f"Unsupported message type: {type(message)}")
+    @staticmethod
+    def _format_cached(
+        message: Union[dict, Message], supports_images: bool
+    ) -> Optional[dict]:
+        """Format a message, reusing the formatted dict cached on Message objects."""
+        if isinstance(message, Message):
+            return message.get_cached(
+                ("formatted", supports_images),
+                lambda: LLM._format_message(message.to_dict(), supports_images),
+            )
+        if isinstance(message, dict):
+            return LLM._format_message(message, supports_images)
+        raise TypeError(f"Unsupported message type: {type(message)}")
+
+    @staticmethod
+    def _format_message(message: dict, supports_images: bool) -> Optional[dict]:
+        """Format a message dict in place, None if it has nothing to send."""
+        # If message is a dict, ensure it has required fields
+        if "role" not in message:
+            raise ValueError("Message dict must contain 'role' field")
+
+        # Process base64 images if present and model supports images
+        if supports_images and message.get("base64_image"):
+            # Initialize or convert content to appropriate format
+            if not message.get("content"):
+                message["content"] = []
+            elif isinstance(message["content"], str):
+                message["content"] = [{"type": "text", "text": message["content"]}]
+            elif isinstance(message["content"], list):
+                # Convert string items to proper text objects
+                message["content"] = [
+                    ({"type": "text", "text": item} if isinstance(item, str) else item)
+                    for item in message["content"]
+                ]
+
+            # Add the image to content
+            message["content"].append(
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{message['base64_image']}"
+                    },
+                }
+            )
 
-        # Validate all messages have required fields
-        for msg in formatted_messages:
-            if msg["role"] not in ROLE_VALUES:
-                raise ValueError(f"Invalid role: {msg['role']}")
+            # Remove the base64_image field
+            del message["base64_image"]
+        # If model doesn't support images but message has base64_image, handle gracefully
+        elif not supports_images and message.get("base64_image"):
+            # Just remove the base64_image field and keep the text content
+            del message["base64_image"]
 
-        return formatted_messages
+        if "content" not in message and "tool_calls" not in message:
+            # Do not include the message
+            return None
+
+        # Validate the message has a valid role
+        if message["role"] not in ROLE_VALUES:
+            raise ValueError(f"Invalid role: {message['role']}")
+
+        return message
+
+    def _prepare_messages(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]],
+        supports_images: bool,
+    ) -> Tuple[List[dict], int]:
+        """
+        Format the request messages and count their input tokens.
+
+        Message objects keep their formatted dict and token count, including the
+        image token estimate, so a request only formats and tokenizes the messages
+        added since the previous one.
+
+        Returns:
+            Tuple[List[dict], int]: The formatted messages and their token count
+        """
+        formatted_messages = []
+        input_tokens = TokenCounter.FORMAT_TOKENS
+
+        for message in [*(system_msgs or []), *messages]:
+            formatted = self._format_cached(message, supports_images)
+            if formatted is None:
+                continue
+
+            if isinstance(message, Message):
+                input_tokens += message.get_cached(
+                    ("tokens", supports_images, self.tokenizer.name),
+                    lambda: self.token_counter.count_message(formatted),
+                )
+            else:
+                input_tokens += self.token_counter.count_message(formatted)
+            formatted_messages.append(formatted)
+
+        return formatted_messages, input_tokens
 
     @retry(
         wait=wait_random_exponential(min=1, max=60),
@@ -394,15 +448,11 @@ class LLM:
             # Check if the model supports images
             supports_images = self.model in MULTIMODAL_MODELS
 
-            # Format system and user messages with image support check
-            if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
-                messages = system_msgs + self.format_messages(messages, supports_images)
-            else:
-                messages = self.format_messages(messages, supports_images)
-
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
+            # Format system and user messages with image support check and count
+            # their tokens, reusing the results cached on messages sent before
+            messages, input_tokens = self._prepare_messages(
+                messages, system_msgs, supports_images
+            )
 
             # Check if token limits are exceeded
             if not self.check_token_limit(input_tokens):
@@ -536,15 +586,17 @@ class LLM:
                     "The last message must be from the user to attach images"
                 )
 
-            # Process the last user message to include images
-            last_message = formatted_messages[-1]
+            # Process the last user message to include images, on a copy since
+            # formatted messages can be cached
+            last_message = dict(formatted_messages[-1])
+            formatted_messages[-1] = last_message
 
             # Convert content to multimodal format if needed
             content = last_message["content"]
             multimodal_content = (
                 [{"type": "text", "text": content}]
                 if isinstance(content, str)
-                else content
+                else list(content)
                 if isinstance(content, list)
                 else []
             )
@@ -687,15 +739,11 @@ class LLM:
             # Check if the model supports images
             supports_images = self.model in MULTIMODAL_MODELS
 
-            # Format messages
-            if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
-                messages = system_msgs + self.format_messages(messages, supports_images)
-            else:
-                messages = self.format_messages(messages, supports_images)
-
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
+            # Format messages and count their tokens, reusing the results cached
+            # on messages sent before
+            messages, input_tokens = self._prepare_messages(
+                messages, system_msgs, supports_images
+            )
 
             # If there are tools, calculate token count for tool descriptions
             tools_tokens = 0
@@ -8,25 +8,107 @@ import argparse
 import asyncio
 import atexit
 import json
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from inspect import Parameter, Signature
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from pydantic import BaseModel, Field
 
 from app.logger import logger
 from app.tool.base import BaseTool
 from app.tool.bash import Bash
+from app.tool.browser_pool import close_browser_pool
 from app.tool.browser_use_tool import BrowserUseTool
 from app.tool.str_replace_editor import StrReplaceEditor
 from app.tool.terminate import Terminate
 
 
-class MCPServer:
-    """MCP Server implementation with tool registration and management."""
+class ToolExecutionPolicy(BaseModel):
+    """How the server runs the calls of one tool"""
+
+    max_concurrency: int = Field(
+        4, description="Calls of the tool running at a time, others wait")
+    offload: bool = Field(
+        False,
+        description="Run calls in the worker pool, for blocking or CPU heavy tools",
+    )
+    cache_ttl: Optional[float] = Field(
+        None,
+        description="Seconds results are reused for equal arguments, only for idempotent tools",
+    )
+    progress_interval: Optional[float] = Field(
+        None,
+        description="Seconds between progress notifications of a running call",
+    )
+
 
-    def __init__(self, name: str = "openmanus"):
+# Policies by tool name. Stateful tools hold one shell or browser session, or
+# the editor's file cache and undo history, so their calls must not overlap
+DEFAULT_POLICIES: Dict[str, ToolExecutionPolicy] = {
+    "bash":
+    ToolExecutionPolicy(max_concurrency=1, progress_interval=5.0),
+    "browser_use":
+    ToolExecutionPolicy(max_concurrency=1, progress_interval=5.0),
+    "str_replace_editor":
+    ToolExecutionPolicy(max_concurrency=1),
+}
+
+
+class _ResultCache:
+    """LRU cache of encoded tool results with a per-entry expiry time."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Tuple[str, str], Tuple[float, Any]] = (
+            OrderedDict())
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[str, str]) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple[str, str], value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class MCPServer:
+    """MCP Server implementation with tool registration and management.
+
+    Each tool runs under its own execution policy: a concurrency limit keeps a
+    slow tool from taking over the server, blocking tools run in a worker pool
+    off the event loop, idempotent tools reuse cached results, and long calls
+    report progress to the client while they run.
+    """
+
+    def __init__(self,
+                 name: str = "openmanus",
+                 max_workers: int = 8,
+                 cache_size: int = 256):
         self.server = FastMCP(name)
         self.tools: Dict[str, BaseTool] = {}
+        self.policies: Dict[str, ToolExecutionPolicy] = dict(DEFAULT_POLICIES)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="mcp-tool")
+        self._cache = _ResultCache(cache_size)
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
 
         # Initialize standard tools
         self.tools["bash"] = Bash()
@@ -36,25 +118,47 @@ class MCPServer:
 
     def register_tool(self,
                       tool: BaseTool,
-                      method_name: Optional[str] = None) -> None:
+                      method_name: Optional[str] = None,
+                      policy: Optional[ToolExecutionPolicy] = None) -> None:
         """Register a tool with parameter validation and documentation."""
         tool_name = method_name or tool.name
         tool_param = tool.to_param()
         tool_function = tool_param["function"]
+        policy = policy or self.policies.get(
+            tool_name) or ToolExecutionPolicy()
+        self.policies[tool_name] = policy
+        self._limits[tool_name] = asyncio.Semaphore(policy.max_concurrency)
+        self._in_flight[tool_name] = 0
 
         # Define the async function to be registered
         # MCP支持的是函数工具，但是openmanus支持的是类工具，所以需要将类工具转换为函数工具，在这里就要定一个工具函数
-        async def tool_method(**kwargs):
+        async def tool_method(ctx: Context, **kwargs):
             logger.info(f"Executing {tool_name}: {kwargs}")
-            result = await tool.execute(**kwargs)
+            cache_key = None
+            if policy.cache_ttl:
+                cache_key = (tool_name,
+                             json.dumps(kwargs, sort_keys=True, default=str))
+                cached = self._cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Cached result of {tool_name}")
+                    return cached
+
+            async with self._limits[tool_name]:
+                self._in_flight[tool_name] += 1
+                try:
+                    result = await self._execute(tool, policy, ctx, kwargs)
+                finally:
+                    self._in_flight[tool_name] -= 1
 
             logger.info(f"Result of {tool_name}: {result}")
 
             # Handle different types of results (match original logic)
-            if hasattr(result, "model_dump"):
-                return json.dumps(result.model_dump())
+            if hasattr(result, "model_dump_json"):
+                result = result.model_dump_json()
             elif isinstance(result, dict):
-                return json.dumps(result)
+                result = json.dumps(result)
+            if cache_key is not None:
+                self._cache.put(cache_key, result, policy.cache_ttl)
             return result
 
         # Set method metadata
@@ -80,6 +184,75 @@ class MCPServer:
         self.server.tool()(tool_method)
         logger.info(f"Registered tool: {tool_name}")
 
+    async def _execute(self, tool: BaseTool, policy: ToolExecutionPolicy,
+                       ctx: Context, kwargs: Dict[str, Any]) -> Any:
+        """Runs a tool call under its policy, reporting progress while it runs."""
+        if not policy.offload:
+            call = asyncio.ensure_future(tool.execute(**kwargs))
+            return await self._watch(call, tool, policy, ctx)
+
+        # The worker runs the call on an event loop of its own
+        work = self._executor.submit(asyncio.run, tool.execute(**kwargs))
+        try:
+            return await self._watch(asyncio.wrap_future(work), tool, policy,
+                                     ctx)
+        except asyncio.CancelledError:
+            # A worker thread cannot be interrupted, so the call keeps its slot
+            # of the tool until the thread is done with it
+            await self._wait_for_worker(work)
+            raise
+
+    @staticmethod
+    async def _wait_for_worker(work: Future) -> None:
+        """Waits until a worker finished or dropped a call, even if cancelled."""
+        done = asyncio.wrap_future(work)
+        while not done.done():
+            try:
+                await asyncio.wait({done})
+            except asyncio.CancelledError:
+                continue
+
+    async def _watch(self, call: asyncio.Future, tool: BaseTool,
+                     policy: ToolExecutionPolicy, ctx: Context) -> Any:
+        """Awaits a running call, reporting its progress every interval."""
+        if not policy.progress_interval:
+            return await call
+
+        started = time.monotonic()
+        try:
+            while True:
+                done, _ = await asyncio.wait({call},
+                                             timeout=policy.progress_interval)
+                if done:
+                    return call.result()
+                elapsed = time.monotonic() - started
+                try:
+                    await ctx.report_progress(elapsed)
+                    await ctx.info(
+                        f"{tool.name} still running after {elapsed:.0f}s")
+                except Exception as e:
+                    logger.warning(f"Failed to report progress: {e}")
+        finally:
+            call.cancel()
+
+    def get_stats(self) -> Dict:
+        """Gets execution statistics.
+
+        Returns:
+            Dict: Result cache counters, and running calls and free call
+                slots per tool.
+        """
+        return {
+            "cache_hits": self._cache.hits,
+            "cache_misses": self._cache.misses,
+            "cache_entries": len(self._cache),
+            "in_flight": dict(self._in_flight),
+            "free_slots": {
+                name: self.policies[name].max_concurrency - running
+                for name, running in self._in_flight.items()
+            },
+        }
+
     def _build_docstring(self, tool_function: dict) -> str:
         """Build a formatted docstring from tool function metadata."""
         description = tool_function.get("description", "")
@@ -139,6 +312,11 @@ class MCPServer:
             )
             parameters.append(param)
 
+        # FastMCP passes the request context to the parameter typed Context
+        parameters.append(
+            Parameter(name="ctx",
+                      kind=Parameter.KEYWORD_ONLY,
+                      annotation=Context))
         return Signature(parameters=parameters)
 
     async def cleanup(self) -> None:
@@ -148,6 +326,8 @@ class MCPServer:
         if "browser" in self.tools and hasattr(self.tools["browser"],
                                                "cleanup"):
             await self.tools["browser"].cleanup()
+        await close_browser_pool()
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
     def register_all_tools(self) -> None:
         """Register all tools with the server."""
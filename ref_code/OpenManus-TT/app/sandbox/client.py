@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Protocol
+from typing import Dict, List, Optional, Protocol
 
 from app.config import SandboxSettings
 from app.sandbox.core.sandbox import DockerSandbox
@@ -46,6 +46,25 @@ class SandboxFileOperations(Protocol):
         """
         ...
 
+    async def read_files(self, paths: List[str]) -> Dict[str, str]:
+        """Reads several files from container in one round trip.
+
+        Args:
+            paths: File paths in container.
+
+        Returns:
+            Dict[str, str]: File contents keyed by path.
+        """
+        ...
+
+    async def write_files(self, files: Dict[str, str]) -> None:
+        """Writes several files to container in one round trip.
+
+        Args:
+            files: File contents keyed by path in container.
+        """
+        ...
+
 
 class BaseSandboxClient(ABC):
     """Base sandbox client interface."""
@@ -78,6 +97,24 @@ class BaseSandboxClient(ABC):
     async def write_file(self, path: str, content: str) -> None:
         """Writes file."""
 
+    @abstractmethod
+    async def read_files(self, paths: List[str]) -> Dict[str, str]:
+        """Reads files in one batch."""
+
+    @abstractmethod
+    async def write_files(self, files: Dict[str, str]) -> None:
+        """Writes files in one batch."""
+
+    @abstractmethod
+    async def sync_to(
+        self, local_dir: str, container_dir: str, delete: bool = False
+    ) -> Dict[str, int]:
+        """Syncs changed files of a local directory to container."""
+
+    @abstractmethod
+    async def sync_from(self, container_dir: str, local_dir: str) -> Dict[str, int]:
+        """Syncs changed files of a container directory to local."""
+
     @abstractmethod
     async def cleanup(self) -> None:
         """Cleans up resources."""
@@ -182,6 +219,72 @@ class LocalSandboxClient(BaseSandboxClient):
             raise RuntimeError("Sandbox not initialized")
         await self.sandbox.write_file(path, content)
 
+    async def read_files(self, paths: List[str]) -> Dict[str, str]:
+        """Reads several files from container in one round trip.
+
+        Args:
+            paths: File paths in container.
+
+        Returns:
+            File contents keyed by path.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        return await self.sandbox.read_files(paths)
+
+    async def write_files(self, files: Dict[str, str]) -> None:
+        """Writes several files to container in one round trip.
+
+        Args:
+            files: File contents keyed by path in container.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        await self.sandbox.write_files(files)
+
+    async def sync_to(
+        self, local_dir: str, container_dir: str, delete: bool = False
+    ) -> Dict[str, int]:
+        """Syncs a local directory to container, transferring only changed files.
+
+        Args:
+            local_dir: Local source directory.
+            container_dir: Destination directory in container.
+            delete: Whether to remove container files missing locally.
+
+        Returns:
+            Transfer statistics.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        return await self.sandbox.sync_to(local_dir, container_dir, delete)
+
+    async def sync_from(self, container_dir: str, local_dir: str) -> Dict[str, int]:
+        """Syncs a container directory to local, transferring only changed files.
+
+        Args:
+            container_dir: Source directory in container.
+            local_dir: Local destination directory.
+
+        Returns:
+            Transfer statistics.
+
+        Raises:
+            RuntimeError: If sandbox not initialized.
+        """
+        if not self.sandbox:
+            raise RuntimeError("Sandbox not initialized")
+        return await self.sandbox.sync_from(container_dir, local_dir)
+
     async def cleanup(self) -> None:
         """Cleans up resources."""
         if self.sandbox:
@@ -1,7 +1,7 @@
 import asyncio
 import uuid
 from contextlib import asynccontextmanager
-from typing import Dict, Optional, Set
+from typing import Callable, Dict, List, Optional, Set
 
 import docker
 from docker.errors import APIError, ImageNotFound
@@ -18,12 +18,19 @@ class SandboxManager:
     monitoring, and cleanup. Provides concurrent access control and automatic
     cleanup mechanisms for sandbox resources.
 
+    With a positive pool_size, started sandboxes are kept ready per sandbox
+    configuration, so create_sandbox can hand one out without waiting for a
+    container to start. The pool is refilled in the background after each use.
+
     Attributes:
         max_sandboxes: Maximum allowed number of sandboxes.
         idle_timeout: Sandbox idle timeout in seconds.
         cleanup_interval: Cleanup check interval in seconds.
+        pool_size: Number of ready sandboxes kept per configuration.
+        reset_command: Script that cleans a released sandbox for reuse.
         _sandboxes: Active sandbox instance mapping.
         _last_used: Last used time record for sandboxes.
+        _pools: Ready sandboxes by configuration key.
     """
 
     def __init__(
@@ -31,6 +38,10 @@ class SandboxManager:
         max_sandboxes: int = 100,
         idle_timeout: int = 3600,
         cleanup_interval: int = 300,
+        pool_size: int = 0,
+        reset_command: Optional[str] = None,
+        client: Optional[docker.DockerClient] = None,
+        sandbox_factory: Optional[Callable[..., DockerSandbox]] = None,
     ):
         """Initializes sandbox manager.
 
@@ -38,13 +49,23 @@ class SandboxManager:
             max_sandboxes: Maximum sandbox count limit.
             idle_timeout: Idle timeout in seconds.
             cleanup_interval: Cleanup check interval in seconds.
+            pool_size: Ready sandboxes kept per configuration, 0 disables the pool.
+            reset_command: Script run in a released sandbox to return it to the
+                pool, e.g. "rm -rf /workspace/* /tmp/*". If None, released
+                sandboxes are destroyed and replaced with new ones.
+            client: Docker client, created from the environment if None.
+            sandbox_factory: Callable building a sandbox from a configuration and
+                volume bindings, DockerSandbox if None.
         """
         self.max_sandboxes = max_sandboxes
         self.idle_timeout = idle_timeout
         self.cleanup_interval = cleanup_interval
+        self.pool_size = pool_size
+        self.reset_command = reset_command
 
         # Docker client
-        self._client = docker.from_env()
+        self._client = client or docker.from_env()
+        self._sandbox_factory = sandbox_factory or DockerSandbox
 
         # Resource mappings
         self._sandboxes: Dict[str, DockerSandbox] = {}
@@ -55,6 +76,16 @@ class SandboxManager:
         self._global_lock = asyncio.Lock()
         self._active_operations: Set[str] = set()
 
+        # Warm pool of ready sandboxes
+        self._pools: Dict[str, List[DockerSandbox]] = {}
+        self._pool_configs: Dict[str, SandboxSettings] = {}
+        self._pool_pending: Dict[str, int] = {}
+        self._pool_keys: Dict[str, str] = {}
+        self._refill_tasks: Set[asyncio.Task] = set()
+        self._pool_hits = 0
+        self._pool_misses = 0
+        self._pool_recycled = 0
+
         # Cleanup task
         self._cleanup_task: Optional[asyncio.Task] = None
         self._is_shutting_down = False
@@ -135,17 +166,24 @@ class SandboxManager:
                 )
 
             config = config or SandboxSettings()
+            sandbox_id = str(uuid.uuid4())
+
+            sandbox = self._acquire_warm(config, volume_bindings)
+            if sandbox:
+                self._register_sandbox(sandbox_id, sandbox, config)
+                logger.info(f"Acquired sandbox {sandbox_id} from the warm pool")
+                return sandbox_id
+
             if not await self.ensure_image(config.image):
                 raise RuntimeError(f"Failed to ensure Docker image: {config.image}")
 
-            sandbox_id = str(uuid.uuid4())
             try:
-                sandbox = DockerSandbox(config, volume_bindings)
+                sandbox = self._sandbox_factory(config, volume_bindings)
                 await sandbox.create()
 
-                self._sandboxes[sandbox_id] = sandbox
-                self._last_used[sandbox_id] = asyncio.get_event_loop().time()
-                self._locks[sandbox_id] = asyncio.Lock()
+                self._register_sandbox(
+                    sandbox_id, sandbox, config if not volume_bindings else None
+                )
 
                 logger.info(f"Created sandbox {sandbox_id}")
                 return sandbox_id
@@ -156,6 +194,134 @@ class SandboxManager:
                     await self.delete_sandbox(sandbox_id)
                 raise RuntimeError(f"Failed to create sandbox: {e}")
 
+    def _register_sandbox(
+        self,
+        sandbox_id: str,
+        sandbox: DockerSandbox,
+        pool_config: Optional[SandboxSettings] = None,
+    ) -> None:
+        """Records a sandbox as active.
+
+        Args:
+            sandbox_id: Sandbox ID.
+            sandbox: Sandbox instance.
+            pool_config: Configuration of the pool the sandbox may return to.
+        """
+        self._sandboxes[sandbox_id] = sandbox
+        self._last_used[sandbox_id] = asyncio.get_event_loop().time()
+        self._locks[sandbox_id] = asyncio.Lock()
+        if pool_config is not None and self.pool_size > 0:
+            self._pool_keys[sandbox_id] = self._pool_key(pool_config)
+
+    @staticmethod
+    def _pool_key(config: SandboxSettings) -> str:
+        """Returns the key of the pool serving a sandbox configuration."""
+        return config.model_dump_json()
+
+    async def warm_pool(self, config: Optional[SandboxSettings] = None) -> None:
+        """Fills the warm pool for a configuration ahead of the first request.
+
+        Args:
+            config: Sandbox configuration, default configuration used if None.
+
+        Raises:
+            RuntimeError: If the image is not available.
+        """
+        config = config or SandboxSettings()
+        if not await self.ensure_image(config.image):
+            raise RuntimeError(f"Failed to ensure Docker image: {config.image}")
+        await self._refill(self._register_pool(config))
+
+    def _register_pool(self, config: SandboxSettings) -> str:
+        """Starts tracking a pool for a configuration and returns its key."""
+        key = self._pool_key(config)
+        if key not in self._pool_configs:
+            self._pool_configs[key] = config
+            self._pools[key] = []
+            self._pool_pending[key] = 0
+        return key
+
+    def _acquire_warm(
+        self,
+        config: SandboxSettings,
+        volume_bindings: Optional[Dict[str, str]] = None,
+    ) -> Optional[DockerSandbox]:
+        """Takes a ready sandbox from the pool and schedules a refill.
+
+        Sandboxes with volume bindings are never pooled, since bindings are fixed
+        when the container is created.
+
+        Returns:
+            A ready sandbox, or None if the pool is disabled or empty.
+        """
+        if self.pool_size <= 0 or volume_bindings:
+            return None
+
+        key = self._register_pool(config)
+        pool = self._pools[key]
+        sandbox = pool.pop() if pool else None
+        if sandbox:
+            self._pool_hits += 1
+        else:
+            self._pool_misses += 1
+        self._schedule_refill(key)
+        return sandbox
+
+    def _schedule_refill(self, key: str) -> None:
+        """Refills a pool in the background."""
+        if self._is_shutting_down:
+            return
+        task = asyncio.create_task(self._refill(key))
+        self._refill_tasks.add(task)
+        task.add_done_callback(self._refill_tasks.discard)
+
+    async def _refill(self, key: str) -> None:
+        """Starts sandboxes until the pool, counting those starting, is full."""
+        config = self._pool_configs[key]
+        missing = self.pool_size - len(self._pools[key]) - self._pool_pending[key]
+        if missing <= 0:
+            return
+        self._pool_pending[key] += missing
+
+        async def start_one() -> None:
+            try:
+                sandbox = self._sandbox_factory(config)
+                await sandbox.create()
+            except Exception as e:
+                logger.error(f"Failed to start pooled sandbox: {e}")
+                return
+            finally:
+                self._pool_pending[key] -= 1
+            # The pool may have been topped up by a recycled sandbox meanwhile
+            if self._is_shutting_down or len(self._pools[key]) >= self.pool_size:
+                await sandbox.cleanup()
+                return
+            self._pools[key].append(sandbox)
+
+        await asyncio.gather(*(start_one() for _ in range(missing)))
+
+    async def _release(self, sandbox: DockerSandbox, pool_key: Optional[str]) -> None:
+        """Returns a used sandbox to its pool after a reset, or destroys it.
+
+        Args:
+            sandbox: Sandbox instance.
+            pool_key: Key of the pool the sandbox came from, None if not pooled.
+        """
+        if (
+            pool_key is not None
+            and self.reset_command
+            and not self._is_shutting_down
+            and len(self._pools[pool_key]) < self.pool_size
+        ):
+            try:
+                await sandbox.reset(self.reset_command)
+                self._pools[pool_key].append(sandbox)
+                self._pool_recycled += 1
+                return
+            except Exception as e:
+                logger.warning(f"Failed to reset sandbox, destroying it: {e}")
+        await sandbox.cleanup()
+
     async def get_sandbox(self, sandbox_id: str) -> DockerSandbox:
         """Gets a sandbox instance.
 
@@ -216,15 +382,25 @@ class SandboxManager:
             except (asyncio.CancelledError, asyncio.TimeoutError):
                 pass
 
+        # Stop refilling the warm pool
+        for task in list(self._refill_tasks):
+            task.cancel()
+        if self._refill_tasks:
+            await asyncio.wait(self._refill_tasks, timeout=1.0)
+
         # Get all sandbox IDs to clean up
         async with self._global_lock:
             sandbox_ids = list(self._sandboxes.keys())
+            pooled = [sandbox for pool in self._pools.values() for sandbox in pool]
+            self._pools.clear()
 
-        # Concurrently clean up all sandboxes
+        # Concurrently clean up all sandboxes, including the ready ones
         cleanup_tasks = []
         for sandbox_id in sandbox_ids:
             task = asyncio.create_task(self._safe_delete_sandbox(sandbox_id))
             cleanup_tasks.append(task)
+        for sandbox in pooled:
+            cleanup_tasks.append(asyncio.create_task(sandbox.cleanup()))
 
         if cleanup_tasks:
             # Wait for all cleanup tasks to complete, with timeout to avoid infinite waiting
@@ -238,6 +414,9 @@ class SandboxManager:
         self._last_used.clear()
         self._locks.clear()
         self._active_operations.clear()
+        self._pool_configs.clear()
+        self._pool_pending.clear()
+        self._pool_keys.clear()
 
         logger.info("Manager cleanup completed")
 
@@ -264,7 +443,7 @@ class SandboxManager:
             # Get reference to sandbox object
             sandbox = self._sandboxes.get(sandbox_id)
             if sandbox:
-                await sandbox.cleanup()
+                await self._release(sandbox, self._pool_keys.pop(sandbox_id, None))
 
                 # Remove sandbox record from manager
                 async with self._global_lock:
@@ -310,4 +489,22 @@ class SandboxManager:
             "idle_timeout": self.idle_timeout,
             "cleanup_interval": self.cleanup_interval,
             "is_shutting_down": self._is_shutting_down,
+            "pool": self.get_pool_stats(),
+        }
+
+    def get_pool_stats(self) -> Dict:
+        """Gets warm pool statistics.
+
+        Returns:
+            Dict: Pool size, ready sandbox count and hit/miss counters.
+        """
+        requests = self._pool_hits + self._pool_misses
+        return {
+            "pool_size": self.pool_size,
+            "ready": sum(len(pool) for pool in self._pools.values()),
+            "starting": sum(self._pool_pending.values()),
+            "hits": self._pool_hits,
+            "misses": self._pool_misses,
+            "hit_rate": self._pool_hits / requests if requests else 0.0,
+            "recycled": self._pool_recycled,
         }
@@ -1,10 +1,24 @@
 import asyncio
+import hashlib
 import io
 import os
+import shutil
 import tarfile
 import tempfile
+import time
 import uuid
-from typing import Dict, Optional
+from pathlib import Path
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import docker
 from docker.errors import NotFound
@@ -12,7 +26,99 @@ from docker.models.containers import Container
 
 from app.config import SandboxSettings
 from app.sandbox.core.exceptions import SandboxTimeoutError
-from app.sandbox.core.terminal import AsyncDockerizedTerminal
+from app.sandbox.core.terminal import AsyncDockerizedTerminal, OutputCallback
+
+
+# Bytes read or written at a time when streaming tar archives
+TAR_CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkReader(io.RawIOBase):
+    """Readable file object over an iterator of byte chunks.
+
+    Lets tarfile decode an archive in stream mode while it is being received.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _iter_tar(entries: Iterable[Tuple[str, Union[bytes, Path]]]) -> Iterator[bytes]:
+    """Generates a tar archive chunk by chunk.
+
+    Args:
+        entries: (archive name, content) pairs, where content is either the file
+            bytes or a host file path that is read in chunks.
+
+    Yields:
+        Successive pieces of the archive.
+    """
+    for name, source in entries:
+        info = tarfile.TarInfo(name)
+        if isinstance(source, bytes):
+            info.size = len(source)
+            info.mtime = int(time.time())
+            yield info.tobuf(tarfile.PAX_FORMAT)
+            yield source
+        else:
+            stat = os.stat(source)
+            info.size = stat.st_size
+            info.mtime = int(stat.st_mtime)
+            info.mode = stat.st_mode & 0o777
+            yield info.tobuf(tarfile.PAX_FORMAT)
+            written = 0
+            with open(source, "rb") as f:
+                while written < info.size:
+                    chunk = f.read(min(TAR_CHUNK_SIZE, info.size - written))
+                    if not chunk:
+                        raise RuntimeError(f"File changed while reading: {source}")
+                    written += len(chunk)
+                    yield chunk
+        padding = -info.size % tarfile.BLOCKSIZE
+        if padding:
+            yield tarfile.NUL * padding
+    # End-of-archive marker
+    yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+
+
+def _walk_files(directory: str) -> Iterator[Tuple[str, str]]:
+    """Yields (relative path, full path) of the regular files under a directory."""
+    for root, _, files in os.walk(directory):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if os.path.isfile(file_path):
+                yield os.path.relpath(file_path, directory), file_path
+
+
+def _hash_local_files(directory: str) -> Dict[str, str]:
+    """Computes SHA-256 digests of the files under a host directory.
+
+    Returns:
+        Digests keyed by path relative to the directory.
+    """
+    hashes = {}
+    for relative_path, file_path in _walk_files(directory):
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(TAR_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        hashes[relative_path.replace(os.sep, "/")] = digest.hexdigest()
+    return hashes
 
 
 class DockerSandbox:
@@ -88,13 +194,7 @@ class DockerSandbox:
             await asyncio.to_thread(self.container.start)
 
             # Initialize terminal
-            self.terminal = AsyncDockerizedTerminal(
-                container["Id"],
-                self.config.work_dir,
-                env_vars={"PYTHONUNBUFFERED": "1"}
-                # Ensure Python output is not buffered
-            )
-            await self.terminal.init()
+            await self._start_terminal()
 
             return self
 
@@ -102,6 +202,44 @@ class DockerSandbox:
             await self.cleanup()  # Ensure resources are cleaned up
             raise RuntimeError(f"Failed to create sandbox: {e}") from e
 
+    async def _start_terminal(self) -> None:
+        """Starts a fresh interactive terminal in the container."""
+        self.terminal = AsyncDockerizedTerminal(
+            self.container.id,
+            self.config.work_dir,
+            env_vars={"PYTHONUNBUFFERED": "1"}
+            # Ensure Python output is not buffered
+        )
+        await self.terminal.init()
+
+    async def reset(self, reset_command: str) -> None:
+        """Restores the sandbox to a clean state so it can be reused.
+
+        Runs the reset script in the container, then replaces the terminal so
+        shell state such as the working directory and variables is discarded.
+
+        Args:
+            reset_command: Shell script run with bash inside the container.
+
+        Raises:
+            RuntimeError: If sandbox not initialized or the reset script fails.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+
+        result = await asyncio.to_thread(
+            self.container.exec_run, ["bash", "-c", reset_command]
+        )
+        if result.exit_code != 0:
+            raise RuntimeError(
+                f"Reset command failed with exit code {result.exit_code}: "
+                f"{result.output.decode('utf-8', errors='replace')}"
+            )
+
+        if self.terminal:
+            await self.terminal.close()
+        await self._start_terminal()
+
     def _prepare_volume_bindings(self) -> Dict[str, Dict[str, str]]:
         """Prepares volume binding configuration.
 
@@ -137,12 +275,18 @@ class DockerSandbox:
         os.makedirs(host_path, exist_ok=True)
         return host_path
 
-    async def run_command(self, cmd: str, timeout: Optional[int] = None) -> str:
+    async def run_command(
+        self,
+        cmd: str,
+        timeout: Optional[int] = None,
+        on_output: Optional[OutputCallback] = None,
+    ) -> str:
         """Runs a command in the sandbox.
 
         Args:
             cmd: Command to execute.
             timeout: Timeout in seconds.
+            on_output: Optional callback receiving output chunks as they arrive.
 
         Returns:
             Command output as string.
@@ -156,7 +300,7 @@ class DockerSandbox:
 
         try:
             return await self.terminal.run_command(
-                cmd, timeout=timeout or self.config.timeout
+                cmd, timeout=timeout or self.config.timeout, on_output=on_output
             )
         except TimeoutError:
             raise SandboxTimeoutError(
@@ -187,7 +331,7 @@ class DockerSandbox:
             )
 
             # Read file content from tar stream
-            content = await self._read_from_tar(tar_stream)
+            content = await asyncio.to_thread(self._read_from_tar, tar_stream)
             return content.decode("utf-8")
 
         except NotFound:
@@ -195,6 +339,42 @@ class DockerSandbox:
         except Exception as e:
             raise RuntimeError(f"Failed to read file: {e}")
 
+    async def read_files(self, paths: List[str]) -> Dict[str, str]:
+        """Reads several files from the container in one round trip.
+
+        Args:
+            paths: File paths.
+
+        Returns:
+            File contents as strings, keyed by the given paths.
+
+        Raises:
+            FileNotFoundError: If any of the files does not exist.
+            RuntimeError: If read operation fails.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+        if not paths:
+            return {}
+
+        try:
+            resolved = {self._safe_resolve_path(path): path for path in paths}
+            contents: Dict[str, str] = {}
+
+            def collect(name: str, fileobj: BinaryIO) -> None:
+                path = resolved.get("/" + name)
+                if path is not None:
+                    contents[path] = fileobj.read().decode("utf-8")
+
+            await asyncio.to_thread(self._export_files, list(resolved), collect)
+        except Exception as e:
+            raise RuntimeError(f"Failed to read files: {e}")
+
+        missing = [path for path in paths if path not in contents]
+        if missing:
+            raise FileNotFoundError(f"Files not found: {', '.join(missing)}")
+        return contents
+
     async def write_file(self, path: str, content: str) -> None:
         """Writes content to a file in the container.
 
@@ -205,26 +385,34 @@ class DockerSandbox:
         Raises:
             RuntimeError: If write operation fails.
         """
-        if not self.container:
-            raise RuntimeError("Sandbox not initialized")
+        await self.write_files({path: content})
 
-        try:
-            resolved_path = self._safe_resolve_path(path)
-            parent_dir = os.path.dirname(resolved_path)
+    async def write_files(self, files: Dict[str, str]) -> None:
+        """Writes several files to the container in one round trip.
 
-            # Create parent directory
-            if parent_dir:
-                await self.run_command(f"mkdir -p {parent_dir}")
+        The tar archive is generated while it is uploaded, and missing parent
+        directories are created by the extraction.
 
-            # Prepare file data
-            tar_stream = await self._create_tar_stream(
-                os.path.basename(path), content.encode("utf-8")
-            )
+        Args:
+            files: File contents keyed by target path.
+
+        Raises:
+            RuntimeError: If write operation fails.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+        if not files:
+            return
 
-            # Write file
-            await asyncio.to_thread(
-                self.container.put_archive, parent_dir or "/", tar_stream
+        try:
+            entries = [
+                (self._safe_resolve_path(path).lstrip("/"), content)
+                for path, content in files.items()
+            ]
+            tar_stream = _iter_tar(
+                (name, content.encode("utf-8")) for name, content in entries
             )
+            await asyncio.to_thread(self.container.put_archive, "/", tar_stream)
 
         except Exception as e:
             raise RuntimeError(f"Failed to write file: {e}")
@@ -275,37 +463,29 @@ class DockerSandbox:
                 self.container.get_archive, resolved_src
             )
 
-            # Create temporary directory to extract file
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                # Write stream to temporary file
-                tar_path = os.path.join(tmp_dir, "temp.tar")
-                with open(tar_path, "wb") as f:
-                    for chunk in stream:
-                        f.write(chunk)
-
-                # Extract file
-                with tarfile.open(tar_path) as tar:
-                    members = tar.getmembers()
-                    if not members:
-                        raise FileNotFoundError(f"Source file is empty: {src_path}")
-
+            def extract() -> None:
+                # Decode the archive while it downloads, without a temporary copy
+                with tarfile.open(fileobj=_ChunkReader(stream), mode="r|") as tar:
                     # If destination is a directory, we should preserve relative path structure
                     if os.path.isdir(dst_path):
                         tar.extractall(dst_path)
-                    else:
-                        # If destination is a file, we only extract the source file's content
-                        if len(members) > 1:
-                            raise RuntimeError(
-                                f"Source path is a directory but destination is a file: {src_path}"
-                            )
-
-                        with open(dst_path, "wb") as dst:
-                            src_file = tar.extractfile(members[0])
-                            if src_file is None:
-                                raise RuntimeError(
-                                    f"Failed to extract file: {src_path}"
-                                )
-                            dst.write(src_file.read())
+                        return
+
+                    # If destination is a file, we only extract the source file's content
+                    member = tar.next()
+                    if member is None:
+                        raise FileNotFoundError(f"Source file is empty: {src_path}")
+                    if not member.isfile():
+                        raise RuntimeError(
+                            f"Source path is a directory but destination is a file: {src_path}"
+                        )
+                    src_file = tar.extractfile(member)
+                    if src_file is None:
+                        raise RuntimeError(f"Failed to extract file: {src_path}")
+                    with open(dst_path, "wb") as dst:
+                        shutil.copyfileobj(src_file, dst, TAR_CHUNK_SIZE)
+
+            await asyncio.to_thread(extract)
 
         except docker.errors.NotFound:
             raise FileNotFoundError(f"Source file not found: {src_path}")
@@ -327,78 +507,219 @@ class DockerSandbox:
             if not os.path.exists(src_path):
                 raise FileNotFoundError(f"Source file not found: {src_path}")
 
-            # Create destination directory in container
+            # Create tar entries to upload
             resolved_dst = self._safe_resolve_path(dst_path)
-            container_dir = os.path.dirname(resolved_dst)
-            if container_dir:
-                await self.run_command(f"mkdir -p {container_dir}")
-
-            # Create tar file to upload
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                tar_path = os.path.join(tmp_dir, "temp.tar")
-                with tarfile.open(tar_path, "w") as tar:
-                    # Handle directory source path
-                    if os.path.isdir(src_path):
-                        os.path.basename(src_path.rstrip("/"))
-                        for root, _, files in os.walk(src_path):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                arcname = os.path.join(
-                                    os.path.basename(dst_path),
-                                    os.path.relpath(file_path, src_path),
-                                )
-                                tar.add(file_path, arcname=arcname)
-                    else:
-                        # Add single file to tar
-                        tar.add(src_path, arcname=os.path.basename(dst_path))
-
-                # Read tar file content
-                with open(tar_path, "rb") as f:
-                    data = f.read()
-
-                # Upload to container
-                await asyncio.to_thread(
-                    self.container.put_archive,
-                    os.path.dirname(resolved_dst) or "/",
-                    data,
-                )
-
-                # Verify file was created successfully
-                try:
-                    await self.run_command(f"test -e {resolved_dst}")
-                except Exception:
-                    raise RuntimeError(f"Failed to verify file creation: {dst_path}")
+            dst_name = resolved_dst.lstrip("/")
+            if os.path.isdir(src_path):
+                entries = [
+                    (os.path.join(dst_name, relative_path), Path(file_path))
+                    for relative_path, file_path in _walk_files(src_path)
+                ]
+            else:
+                entries = [(dst_name, Path(src_path))]
+
+            # Upload to container, streaming files from disk; extraction
+            # creates the destination directories
+            await asyncio.to_thread(self.container.put_archive, "/", _iter_tar(entries))
+
+            # Verify file was created successfully
+            try:
+                await self.run_command(f"test -e {resolved_dst}")
+            except Exception:
+                raise RuntimeError(f"Failed to verify file creation: {dst_path}")
 
         except FileNotFoundError:
             raise
         except Exception as e:
             raise RuntimeError(f"Failed to copy file: {e}")
 
-    @staticmethod
-    async def _create_tar_stream(name: str, content: bytes) -> io.BytesIO:
-        """Creates a tar file stream.
+    async def sync_to(
+        self, src_dir: str, dst_dir: str, delete: bool = False
+    ) -> Dict[str, int]:
+        """Syncs a host directory into the container, uploading only changed files.
+
+        Files are compared by SHA-256, and all changed files are sent in one
+        streamed archive.
 
         Args:
-            name: Filename.
-            content: File content.
+            src_dir: Source directory (host).
+            dst_dir: Destination directory (container).
+            delete: Whether to remove container files missing on the host.
+
+        Returns:
+            Counts of uploaded, unchanged and deleted files.
+
+        Raises:
+            FileNotFoundError: If source directory does not exist.
+            RuntimeError: If sync operation fails.
+        """
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+        if not os.path.isdir(src_dir):
+            raise FileNotFoundError(f"Source directory not found: {src_dir}")
+
+        try:
+            resolved_dst = self._safe_resolve_path(dst_dir)
+            local_hashes, remote_hashes = await asyncio.gather(
+                asyncio.to_thread(_hash_local_files, src_dir),
+                self._hash_container_files(resolved_dst),
+            )
+
+            changed = [
+                relative_path
+                for relative_path, digest in local_hashes.items()
+                if remote_hashes.get(relative_path) != digest
+            ]
+            if changed:
+                entries = [
+                    (
+                        os.path.join(resolved_dst, relative_path).lstrip("/"),
+                        Path(src_dir, relative_path),
+                    )
+                    for relative_path in changed
+                ]
+                await asyncio.to_thread(
+                    self.container.put_archive, "/", _iter_tar(entries)
+                )
+
+            removed = [path for path in remote_hashes if path not in local_hashes]
+            if delete and removed:
+                result = await asyncio.to_thread(
+                    self.container.exec_run,
+                    ["rm", "-f", "--"]
+                    + [os.path.join(resolved_dst, path) for path in removed],
+                )
+                if result.exit_code != 0:
+                    raise RuntimeError(result.output.decode("utf-8", errors="replace"))
+
+            return {
+                "uploaded": len(changed),
+                "unchanged": len(local_hashes) - len(changed),
+                "deleted": len(removed) if delete else 0,
+            }
+
+        except Exception as e:
+            raise RuntimeError(f"Failed to sync directory: {e}")
+
+    async def sync_from(self, src_dir: str, dst_dir: str) -> Dict[str, int]:
+        """Syncs a container directory to the host, downloading only changed files.
+
+        Files are compared by SHA-256, and all changed files are fetched in one
+        streamed archive.
+
+        Args:
+            src_dir: Source directory (container).
+            dst_dir: Destination directory (host).
 
         Returns:
-            Tar file stream.
+            Counts of downloaded and unchanged files.
+
+        Raises:
+            RuntimeError: If sync operation fails.
         """
-        tar_stream = io.BytesIO()
-        with tarfile.open(fileobj=tar_stream, mode="w") as tar:
-            tarinfo = tarfile.TarInfo(name=name)
-            tarinfo.size = len(content)
-            tar.addfile(tarinfo, io.BytesIO(content))
-        tar_stream.seek(0)
-        return tar_stream
+        if not self.container:
+            raise RuntimeError("Sandbox not initialized")
+
+        try:
+            resolved_src = self._safe_resolve_path(src_dir)
+            os.makedirs(dst_dir, exist_ok=True)
+            local_hashes, remote_hashes = await asyncio.gather(
+                asyncio.to_thread(_hash_local_files, dst_dir),
+                self._hash_container_files(resolved_src),
+            )
+
+            changed = [
+                relative_path
+                for relative_path, digest in remote_hashes.items()
+                if local_hashes.get(relative_path) != digest
+            ]
+            prefix = resolved_src.strip("/") + "/"
+
+            def save(name: str, fileobj: BinaryIO) -> None:
+                relative_path = name[len(prefix) :]
+                local_path = os.path.join(dst_dir, relative_path)
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                with open(local_path, "wb") as dst:
+                    shutil.copyfileobj(fileobj, dst, TAR_CHUNK_SIZE)
+
+            if changed:
+                await asyncio.to_thread(
+                    self._export_files,
+                    [os.path.join(resolved_src, path) for path in changed],
+                    save,
+                )
+
+            return {
+                "downloaded": len(changed),
+                "unchanged": len(remote_hashes) - len(changed),
+            }
+
+        except Exception as e:
+            raise RuntimeError(f"Failed to sync directory: {e}")
+
+    async def _hash_container_files(self, directory: str) -> Dict[str, str]:
+        """Computes SHA-256 digests of the files under a container directory.
+
+        Args:
+            directory: Absolute container directory, missing directories are empty.
+
+        Returns:
+            Digests keyed by path relative to the directory.
+        """
+        result = await asyncio.to_thread(
+            self.container.exec_run,
+            [
+                "sh",
+                "-c",
+                'cd "$1" 2>/dev/null || exit 0; find . -type f -exec sha256sum {} +',
+                "sh",
+                directory,
+            ],
+        )
+        if result.exit_code != 0:
+            raise RuntimeError(result.output.decode("utf-8", errors="replace"))
+
+        hashes = {}
+        for line in result.output.decode("utf-8", errors="replace").splitlines():
+            digest, _, path = line.partition("  ")
+            if path.startswith("./"):
+                hashes[path[2:]] = digest
+        return hashes
+
+    def _export_files(
+        self, paths: List[str], handle: Callable[[str, BinaryIO], None]
+    ) -> None:
+        """Streams files out of the container in a single tar archive.
+
+        Runs tar inside the container and decodes its output as it arrives, so
+        only one chunk and the file being handled are in memory at a time.
+        Missing files are skipped.
+
+        Args:
+            paths: Absolute container file paths.
+            handle: Called with each file's archive name (its path without the
+                leading "/") and a readable file object.
+        """
+        _, output = self.container.exec_run(
+            ["tar", "cf", "-", "-C", "/", "--"] + [path.lstrip("/") for path in paths],
+            stream=True,
+            demux=True,
+        )
+        stdout = (chunk for chunk, _ in output if chunk)
+        with tarfile.open(fileobj=_ChunkReader(stdout), mode="r|") as tar:
+            for member in tar:
+                if member.isfile():
+                    handle(member.name, tar.extractfile(member))
+        # Drain anything after the end-of-archive marker
+        for _ in stdout:
+            pass
 
     @staticmethod
-    async def _read_from_tar(tar_stream) -> bytes:
-        """Reads file content from a tar stream.
+    def _read_from_tar(tar_stream: Iterable[bytes]) -> bytes:
+        """Reads the first file's content from a tar stream.
 
         Args:
-            tar_stream: Tar file stream.
+            tar_stream: Tar file stream, as chunks.
 
         Returns:
             File content.
@@ -406,21 +727,16 @@ class DockerSandbox:
         Raises:
             RuntimeError: If read operation fails.
         """
-        with tempfile.NamedTemporaryFile() as tmp:
-            for chunk in tar_stream:
-                tmp.write(chunk)
-            tmp.seek(0)
-
-            with tarfile.open(fileobj=tmp) as tar:
-                member = tar.next()
-                if not member:
-                    raise RuntimeError("Empty tar archive")
+        with tarfile.open(fileobj=_ChunkReader(tar_stream), mode="r|") as tar:
+            member = tar.next()
+            if not member:
+                raise RuntimeError("Empty tar archive")
 
-                file_content = tar.extractfile(member)
-                if not file_content:
-                    raise RuntimeError("Failed to extract file content")
+            file_content = tar.extractfile(member)
+            if not file_content:
+                raise RuntimeError("Failed to extract file content")
 
-                return file_content.read()
+            return file_content.read()
 
     async def cleanup(self) -> None:
         """Cleans up sandbox resources."""
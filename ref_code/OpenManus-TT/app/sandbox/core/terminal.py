@@ -6,9 +6,11 @@ allowing interactive command execution with timeout control.
 """
 
 import asyncio
-import re
+import codecs
+import inspect
 import socket
-from typing import Dict, Optional, Tuple, Union
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
 
 import docker
 from docker import APIClient
@@ -16,17 +18,28 @@ from docker.errors import APIError
 from docker.models.containers import Container
 
 
+OutputCallback = Callable[[str], Union[None, Awaitable[None]]]
+
+
 class DockerSession:
-    def __init__(self, container_id: str) -> None:
+    # Output is read in chunks of this many bytes
+    read_size: int = 65536
+
+    def __init__(self, container_id: str, api: Optional[APIClient] = None) -> None:
         """Initializes a Docker session.
 
         Args:
             container_id: ID of the Docker container.
+            api: Docker API client, a new one is created if not given.
         """
-        self.api = APIClient()
+        self.api = api or APIClient()
         self.container_id = container_id
         self.exec_id = None
         self.socket = None
+        # A prompt no command output is expected to contain, so the end of each
+        # command's output can be told apart from output that looks like "$ "
+        self.prompt = f"<<prompt-{uuid.uuid4().hex}>>"
+        self._buffer = bytearray()
 
     async def create(self, working_dir: str, env_vars: Dict[str, str]) -> None:
         """Creates an interactive session with the container.
@@ -42,12 +55,15 @@ class DockerSession:
             "bash",
             "-c",
             f"cd {working_dir} && "
+            "stty -echo 2>/dev/null; "
             "PROMPT_COMMAND='' "
-            "PS1='$ ' "
+            f"PS1='{self.prompt}' "
+            "PS2='' "
             "exec bash --norc --noprofile",
         ]
 
-        exec_data = self.api.exec_create(
+        exec_data = await asyncio.to_thread(
+            self.api.exec_create,
             self.container_id,
             startup_command,
             stdin=True,
@@ -56,12 +72,23 @@ class DockerSession:
             stderr=True,
             privileged=True,
             user="root",
-            environment={**env_vars, "TERM": "dumb", "PS1": "$ ", "PROMPT_COMMAND": ""},
+            environment={
+                **env_vars,
+                "TERM": "dumb",
+                "PS1": self.prompt,
+                "PS2": "",
+                "PROMPT_COMMAND": "",
+            },
         )
         self.exec_id = exec_data["Id"]
 
-        socket_data = self.api.exec_start(
-            self.exec_id, socket=True, tty=True, stream=True, demux=True
+        socket_data = await asyncio.to_thread(
+            self.api.exec_start,
+            self.exec_id,
+            socket=True,
+            tty=True,
+            stream=True,
+            demux=True,
         )
 
         if hasattr(socket_data, "_sock"):
@@ -83,9 +110,10 @@ class DockerSession:
             if self.socket:
                 # Send exit command to close bash session
                 try:
-                    self.socket.sendall(b"exit\n")
-                    # Allow time for command execution
-                    await asyncio.sleep(0.1)
+                    await asyncio.wait_for(
+                        asyncio.get_running_loop().sock_sendall(self.socket, b"exit\n"),
+                        timeout=1,
+                    )
                 except:
                     pass  # Ignore sending errors, continue cleanup
 
@@ -101,7 +129,9 @@ class DockerSession:
             if self.exec_id:
                 try:
                     # Check exec instance status
-                    exec_inspect = self.api.exec_inspect(self.exec_id)
+                    exec_inspect = await asyncio.to_thread(
+                        self.api.exec_inspect, self.exec_id
+                    )
                     if exec_inspect.get("Running", False):
                         # If still running, wait for it to complete
                         await asyncio.sleep(0.5)
@@ -114,34 +144,82 @@ class DockerSession:
             # Log error but don't raise, ensure cleanup continues
             print(f"Warning: Error during session cleanup: {e}")
 
-    async def _read_until_prompt(self) -> str:
+    async def _read_until_prompt(
+        self, on_output: Optional[OutputCallback] = None
+    ) -> str:
         """Reads output until prompt is found.
 
+        Waits on the event loop for data instead of polling, and only rescans the
+        bytes that may complete the prompt after each read.
+
+        Args:
+            on_output: Optional callback receiving output chunks as they arrive.
+
         Returns:
             String containing output up to the prompt.
 
         Raises:
-            socket.error: If socket communication fails.
+            ConnectionError: If the session closes before the prompt is seen.
         """
-        buffer = b""
-        while b"$ " not in buffer:
-            try:
-                chunk = self.socket.recv(4096)
-                if chunk:
-                    buffer += chunk
-            except socket.error as e:
-                if e.errno == socket.EWOULDBLOCK:
-                    await asyncio.sleep(0.1)
-                    continue
-                raise
-        return buffer.decode("utf-8")
-
-    async def execute(self, command: str, timeout: Optional[int] = None) -> str:
+        loop = asyncio.get_running_loop()
+        prompt = self.prompt.encode()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        emitted = 0  # bytes of the buffer already passed to on_output
+        searched = 0  # bytes of the buffer known not to start the prompt
+
+        while True:
+            index = self._buffer.find(prompt, searched)
+            if index != -1:
+                break
+            searched = max(0, len(self._buffer) - len(prompt) + 1)
+
+            # Stream everything except a tail that could be the start of the prompt
+            ready = len(self._buffer) - self._partial_prompt_length(prompt)
+            if on_output and ready > emitted:
+                await self._emit(
+                    on_output, decoder.decode(bytes(self._buffer[emitted:ready]))
+                )
+                emitted = ready
+
+            data = await loop.sock_recv(self.socket, self.read_size)
+            if not data:
+                raise ConnectionError("Session closed before the prompt was received")
+            self._buffer += data
+
+        output = bytes(self._buffer[:index])
+        if on_output:
+            await self._emit(on_output, decoder.decode(output[emitted:], final=True))
+        del self._buffer[: index + len(prompt)]
+        return output.decode("utf-8", errors="replace")
+
+    def _partial_prompt_length(self, prompt: bytes) -> int:
+        """Returns the length of the longest buffer suffix that is a prompt prefix."""
+        for length in range(min(len(self._buffer), len(prompt) - 1), 0, -1):
+            if self._buffer.endswith(prompt[:length]):
+                return length
+        return 0
+
+    @staticmethod
+    async def _emit(on_output: OutputCallback, chunk: str) -> None:
+        """Passes an output chunk to a sync or async callback."""
+        if chunk:
+            result = on_output(chunk)
+            if inspect.isawaitable(result):
+                await result
+
+    async def execute(
+        self,
+        command: str,
+        timeout: Optional[int] = None,
+        on_output: Optional[OutputCallback] = None,
+    ) -> str:
         """Executes a command and returns cleaned output.
 
         Args:
             command: Shell command to execute.
             timeout: Maximum execution time in seconds.
+            on_output: Optional callback receiving raw output chunks while the
+                command runs, sync or async.
 
         Returns:
             Command output as string with prompt markers removed.
@@ -153,68 +231,44 @@ class DockerSession:
         if not self.socket:
             raise RuntimeError("Session not initialized")
 
+        loop = asyncio.get_running_loop()
         try:
             # Sanitize command to prevent shell injection
             sanitized_command = self._sanitize_command(command)
-            full_command = f"{sanitized_command}\necho $?\n"
-            self.socket.sendall(full_command.encode())
-
-            async def read_output() -> str:
-                buffer = b""
-                result_lines = []
-                command_sent = False
-
-                while True:
-                    try:
-                        chunk = self.socket.recv(4096)
-                        if not chunk:
-                            break
-
-                        buffer += chunk
-                        lines = buffer.split(b"\n")
-
-                        buffer = lines[-1]
-                        lines = lines[:-1]
-
-                        for line in lines:
-                            line = line.rstrip(b"\r")
-
-                            if not command_sent:
-                                command_sent = True
-                                continue
-
-                            if line.strip() == b"echo $?" or line.strip().isdigit():
-                                continue
-
-                            if line.strip():
-                                result_lines.append(line)
-
-                        if buffer.endswith(b"$ "):
-                            break
-
-                    except socket.error as e:
-                        if e.errno == socket.EWOULDBLOCK:
-                            await asyncio.sleep(0.1)
-                            continue
-                        raise
-
-                output = b"\n".join(result_lines).decode("utf-8")
-                output = re.sub(r"\n\$ echo \$\$?.*$", "", output)
-
-                return output
+            await loop.sock_sendall(self.socket, f"{sanitized_command}\n".encode())
 
             if timeout:
-                result = await asyncio.wait_for(read_output(), timeout)
+                output = await asyncio.wait_for(
+                    self._read_until_prompt(on_output), timeout
+                )
             else:
-                result = await read_output()
+                output = await self._read_until_prompt(on_output)
 
-            return result.strip()
+            output = output.replace("\r\n", "\n")
+            # Drop the echoed command in case the terminal could not disable echo
+            if output.startswith(sanitized_command):
+                output = output[len(sanitized_command) :]
+            return output.strip()
 
         except asyncio.TimeoutError:
+            await self._interrupt()
             raise TimeoutError(f"Command execution timed out after {timeout} seconds")
         except Exception as e:
             raise RuntimeError(f"Failed to execute command: {e}")
 
+    async def _interrupt(self) -> None:
+        """Interrupts the running command and discards its remaining output.
+
+        Keeps the session usable after a timeout, otherwise the output of the
+        interrupted command would be returned for the next one.
+        """
+        try:
+            await asyncio.get_running_loop().sock_sendall(self.socket, b"\x03")
+            await asyncio.wait_for(self._read_until_prompt(), timeout=5)
+        except Exception:
+            pass  # The session may be unusable, later commands will report it
+        self._buffer.clear()
+
     def _sanitize_command(self, command: str) -> str:
         """Sanitizes the command string to prevent shell injection.
 
@@ -313,12 +367,18 @@ class AsyncDockerizedTerminal:
         )
         return result.exit_code, result.output.decode("utf-8")
 
-    async def run_command(self, cmd: str, timeout: Optional[int] = None) -> str:
+    async def run_command(
+        self,
+        cmd: str,
+        timeout: Optional[int] = None,
+        on_output: Optional[OutputCallback] = None,
+    ) -> str:
         """Runs a command in the container with timeout.
 
         Args:
             cmd: Shell command to execute.
             timeout: Maximum execution time in seconds.
+            on_output: Optional callback receiving output chunks as they arrive.
 
         Returns:
             Command output as string.
@@ -329,7 +389,9 @@ class AsyncDockerizedTerminal:
         if not self.session:
             raise RuntimeError("Terminal not initialized")
 
-        return await self.session.execute(cmd, timeout=timeout or self.default_timeout)
+        return await self.session.execute(
+            cmd, timeout=timeout or self.default_timeout, on_output=on_output
+        )
 
     async def close(self) -> None:
         """Closes the terminal session."""
@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Callable, Dict, Hashable, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class Role(str, Enum):
@@ -61,6 +61,30 @@ class Message(BaseModel):
     tool_call_id: Optional[str] = Field(default=None)
     base64_image: Optional[str] = Field(default=None)
 
+    # Values derived from the fields, such as the LLM's formatted dict and token count
+    _cache: Dict[Hashable, Any] = PrivateAttr(default_factory=dict)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self._cache.clear()
+
+    def __copy__(self) -> "Message":
+        copied = super().__copy__()
+        # A copy can be changed independently, so it does not share the cache
+        copied._cache = {}
+        return copied
+
+    def get_cached(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return a value derived from the message, computing it on first use.
+
+        Messages are sent again with every request, this lets the LLM format and
+        tokenize each of them once. Cached values are dropped when a field changes.
+        """
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
         if isinstance(other, list):
@@ -164,15 +188,18 @@ class Memory(BaseModel):
         """Add a message to memory"""
         self.messages.append(message)
         # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._trim()
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
         self.messages.extend(messages)
         # Optional: Implement message limit
+        self._trim()
+
+    def _trim(self) -> None:
+        """Drop the oldest messages over max_messages, in place."""
         if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+            del self.messages[: len(self.messages) - self.max_messages]
 
     def clear(self) -> None:
         """Clear all messages"""
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, ClassVar, Dict, Optional
 
 from pydantic import BaseModel, Field
 
@@ -9,6 +9,10 @@ class BaseTool(ABC, BaseModel):
     description: str
     parameters: Optional[dict] = None
 
+    # Whether calls may run concurrently with other calls of the same step. Only
+    # set for tools without side effects the other calls could depend on
+    concurrency_safe: ClassVar[bool] = False
+
     class Config:
         arbitrary_types_allowed = True
 
@@ -1,6 +1,10 @@
 import asyncio
+import codecs
+import inspect
 import os
-from typing import Optional
+import tempfile
+import uuid
+from typing import Awaitable, Callable, Optional, Union
 
 from app.exceptions import ToolError
 from app.tool.base import BaseTool, CLIResult
@@ -10,9 +14,103 @@ _BASH_DESCRIPTION = """Execute a bash command in the terminal.
 * Long running commands: For commands that may run indefinitely, it should be run in the background and the output should be redirected to a file, e.g. command = `python3 app.py > server.log 2>&1 &`.
 * Interactive: If a bash command returns exit code `-1`, this means the process is not yet finished. The assistant must then send a second call to terminal with an empty `command` (which will retrieve any additional logs), or it can send additional text (set `command` to the text) to STDIN of the running process, or it can send command=`ctrl+c` to interrupt the process.
 * Timeout: If a command execution result says "Command timed out. Sending SIGINT to the process", the assistant should retry running the command in the background.
+* Large outputs: Output beyond a size limit is truncated and the full output is saved to the log file named at the end of the result, which can be inspected with commands like `grep`, `head` or `tail`.
 """
 
 
+OutputCallback = Callable[[str], Union[None, Awaitable[None]]]
+
+
+class _StreamCapture:
+    """Collects one output stream of a command until its sentinel is seen.
+
+    Each read only rescans the bytes held back as a possible sentinel prefix, so
+    matching stays linear in the output size. Output beyond
+    `max_bytes` is spilled to a temporary file instead of being kept in memory.
+    """
+
+    def __init__(
+        self,
+        sentinel: bytes,
+        max_bytes: int,
+        on_output: Optional[OutputCallback] = None,
+    ):
+        self.sentinel = sentinel
+        self.max_bytes = max_bytes
+        self.on_output = on_output
+        self.buffer = bytearray()
+        self.total_bytes = 0
+        self.spill_path: Optional[str] = None
+        self._spill_file = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    async def read(self, stream: asyncio.StreamReader, chunk_size: int) -> None:
+        """Read from the stream until the sentinel or EOF."""
+        pending = bytearray()  # bytes that may still turn out to be the sentinel
+        while True:
+            chunk = await stream.read(chunk_size)
+            if not chunk:
+                await self._emit(bytes(pending))
+                break
+            pending += chunk
+            index = pending.find(self.sentinel)
+            if index != -1:
+                await self._emit(bytes(pending[:index]))
+                break
+            # hold back only a tail that could be the start of the sentinel
+            ready = len(pending) - self._partial_match(pending)
+            await self._emit(bytes(pending[:ready]))
+            del pending[:ready]
+        await self._emit(self._decoder.decode(b"", final=True), decoded=True)
+        if self._spill_file:
+            self._spill_file.close()
+
+    def _partial_match(self, data: bytearray) -> int:
+        """Length of the longest suffix of data that is a prefix of the sentinel."""
+        for length in range(min(len(data), len(self.sentinel) - 1), 0, -1):
+            if data.endswith(self.sentinel[:length]):
+                return length
+        return 0
+
+    async def _emit(self, data, decoded: bool = False) -> None:
+        if not data:
+            return
+        if not decoded:
+            self._store(data)
+            data = self._decoder.decode(data)
+        if self.on_output and data:
+            result = self.on_output(data)
+            if inspect.isawaitable(result):
+                await result
+
+    def _store(self, data: bytes) -> None:
+        self.total_bytes += len(data)
+        if self._spill_file is None and len(self.buffer) + len(data) > self.max_bytes:
+            self._spill_file = tempfile.NamedTemporaryFile(
+                prefix="bash_output_", suffix=".log", delete=False
+            )
+            self.spill_path = self._spill_file.name
+            self._spill_file.write(self.buffer)
+        if self._spill_file is None:
+            self.buffer += data
+            return
+        self._spill_file.write(data)
+        room = self.max_bytes - len(self.buffer)
+        if room > 0:
+            self.buffer += data[:room]
+
+    def text(self) -> str:
+        output = self.buffer.decode(errors="replace")
+        if output.endswith("\n"):
+            output = output[:-1]
+        if self.spill_path:
+            output += (
+                f"\n[output truncated: showing the first {self.max_bytes} of "
+                f"{self.total_bytes} bytes, full output saved to {self.spill_path}]"
+            )
+        return output
+
+
 class _BashSession:
     """A session of a bash shell."""
 
@@ -20,9 +118,10 @@ class _BashSession:
     _process: asyncio.subprocess.Process
 
     command: str = "/bin/bash"
-    _output_delay: float = 0.2  # seconds
     _timeout: float = 120.0  # seconds
     _sentinel: str = "<<exit>>"
+    _chunk_size: int = 64 * 1024  # bytes per read
+    _max_output_bytes: int = 256 * 1024  # kept in memory per stream, rest spills
 
     def __init__(self):
         self._started = False
@@ -40,6 +139,7 @@ class _BashSession:
             stdin=asyncio.subprocess.PIPE,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
+            limit=self._chunk_size,
         )
 
         self._started = True
@@ -52,8 +152,12 @@ class _BashSession:
             return
         self._process.terminate()
 
-    async def run(self, command: str):
-        """Execute a command in the bash shell."""
+    async def run(self, command: str, on_output: Optional[OutputCallback] = None):
+        """Execute a command in the bash shell.
+
+        If `on_output` is given, stdout is passed to it chunk by chunk as soon as
+        it is produced, before the command finishes.
+        """
         if not self._started:
             raise ToolError("Session has not started.")
         if self._process.returncode is not None:
@@ -71,46 +175,33 @@ class _BashSession:
         assert self._process.stdout
         assert self._process.stderr
 
-        # send command to the process
+        # a fresh sentinel per command, so output of an earlier command or one
+        # that prints the sentinel text itself cannot end this read early
+        sentinel = f"{self._sentinel[:-2]}-{uuid.uuid4().hex}>>"
+
+        # send command to the process, marking the end of both streams
         self._process.stdin.write(
-            command.encode() + f"; echo '{self._sentinel}'\n".encode()
+            command.encode() + f"; echo '{sentinel}'; echo '{sentinel}' >&2\n".encode()
         )
         await self._process.stdin.drain()
 
-        # read output from the process, until the sentinel is found
+        stdout = _StreamCapture(sentinel.encode(), self._max_output_bytes, on_output)
+        stderr = _StreamCapture(sentinel.encode(), self._max_output_bytes)
+
+        # read output from the process as it arrives, until the sentinel is found
         try:
             async with asyncio.timeout(self._timeout):
-                while True:
-                    await asyncio.sleep(self._output_delay)
-                    # if we read directly from stdout/stderr, it will wait forever for
-                    # EOF. use the StreamReader buffer directly instead.
-                    output = (
-                        self._process.stdout._buffer.decode()
-                    )  # pyright: ignore[reportAttributeAccessIssue]
-                    if self._sentinel in output:
-                        # strip the sentinel and break
-                        output = output[: output.index(self._sentinel)]
-                        break
+                await asyncio.gather(
+                    stdout.read(self._process.stdout, self._chunk_size),
+                    stderr.read(self._process.stderr, self._chunk_size),
+                )
         except asyncio.TimeoutError:
             self._timed_out = True
             raise ToolError(
                 f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
             ) from None
 
-        if output.endswith("\n"):
-            output = output[:-1]
-
-        error = (
-            self._process.stderr._buffer.decode()
-        )  # pyright: ignore[reportAttributeAccessIssue]
-        if error.endswith("\n"):
-            error = error[:-1]
-
-        # clear the buffers so that the next output can be read correctly
-        self._process.stdout._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
-        self._process.stderr._buffer.clear()  # pyright: ignore[reportAttributeAccessIssue]
-
-        return CLIResult(output=output, error=error)
+        return CLIResult(output=stdout.text(), error=stderr.text())
 
 
 class Bash(BaseTool):
@@ -132,7 +223,11 @@ class Bash(BaseTool):
     _session: Optional[_BashSession] = None
 
     async def execute(
-        self, command: str | None = None, restart: bool = False, **kwargs
+        self,
+        command: str | None = None,
+        restart: bool = False,
+        on_output: Optional[OutputCallback] = None,
+        **kwargs,
     ) -> CLIResult:
         if restart:
             if self._session:
@@ -147,7 +242,7 @@ class Bash(BaseTool):
             await self._session.start()
 
         if command is not None:
-            return await self._session.run(command)
+            return await self._session.run(command, on_output=on_output)
 
         raise ToolError("no command provided.")
 
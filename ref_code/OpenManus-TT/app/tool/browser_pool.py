@@ -0,0 +1,475 @@
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from browser_use import Browser as BrowserUseBrowser
+from browser_use import BrowserConfig
+from browser_use.browser.context import BrowserContext, BrowserContextConfig
+
+from app.config import BrowserPoolSettings, config
+from app.logger import logger
+
+
+# Sums the JS heap of a page, performance.memory only exists in Chromium
+_JS_HEAP_SCRIPT = "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+
+
+def build_browser_config() -> BrowserConfig:
+    """Builds the browser launch configuration from the browser settings."""
+    browser_config_kwargs = {"headless": False, "disable_security": True}
+
+    if config.browser_config:
+        from browser_use.browser.browser import ProxySettings
+
+        # handle proxy settings.
+        if config.browser_config.proxy and config.browser_config.proxy.server:
+            browser_config_kwargs["proxy"] = ProxySettings(
+                server=config.browser_config.proxy.server,
+                username=config.browser_config.proxy.username,
+                password=config.browser_config.proxy.password,
+            )
+
+        browser_attrs = [
+            "headless",
+            "disable_security",
+            "extra_chromium_args",
+            "chrome_instance_path",
+            "wss_url",
+            "cdp_url",
+        ]
+
+        for attr in browser_attrs:
+            value = getattr(config.browser_config, attr, None)
+            if value is not None:
+                if not isinstance(value, list) or value:
+                    browser_config_kwargs[attr] = value
+
+    return BrowserConfig(**browser_config_kwargs)
+
+
+def build_context_config() -> BrowserContextConfig:
+    """Returns the configured context settings, or the defaults."""
+    # if there is context config in the config, use it.
+    if (
+        config.browser_config
+        and hasattr(config.browser_config, "new_context_config")
+        and config.browser_config.new_context_config
+    ):
+        return config.browser_config.new_context_config
+    return BrowserContextConfig()
+
+
+class _PooledBrowser:
+    """A pooled browser process and its bookkeeping."""
+
+    def __init__(self, browser: BrowserUseBrowser):
+        self.browser = browser
+        # Contexts handed out or kept warm, counted against the per-browser limit
+        self.active = 0
+        # Contexts created over the browser's lifetime
+        self.uses = 0
+        # A retiring browser gets no new contexts and closes once the last ends
+        self.retiring = False
+        # A broken browser crashed or leaked, its warm contexts are discarded
+        self.broken = False
+
+
+class BrowserPool:
+    """Pool of long-lived browsers handing out isolated contexts.
+
+    Launching a browser takes seconds, while opening a context in a running one
+    takes milliseconds. The pool keeps up to max_browsers browsers alive and gives
+    each session its own context, so cookies and storage stay isolated between
+    sessions without paying for a browser launch per session. A context is closed
+    when released; its browser is recycled after max_uses contexts, or when a
+    context grew past the memory limit, so leaks in long-lived processes do not
+    accumulate.
+
+    With a positive warm_contexts, contexts are opened ahead of time with the
+    warm-up pages loaded, and refilled in the background after each acquire.
+
+    Attributes:
+        max_browsers: Maximum number of browser processes.
+        max_contexts_per_browser: Contexts open at the same time in one browser.
+        max_uses: Contexts a browser serves before it is recycled.
+        context_memory_limit_mb: JS heap of a released context above which its
+            browser is recycled.
+        warm_contexts: Number of contexts kept ready.
+        warmup_urls: Pages loaded into warm contexts.
+        _browsers: Running pooled browsers.
+        _warm: Ready contexts with the browser they belong to.
+        _owners: Pooled browser of each handed out context.
+    """
+
+    def __init__(
+        self,
+        max_browsers: int = 2,
+        max_contexts_per_browser: int = 4,
+        max_uses: int = 50,
+        context_memory_limit_mb: Optional[int] = None,
+        warm_contexts: int = 0,
+        warmup_urls: Optional[List[str]] = None,
+        browser_factory: Optional[Callable[[], BrowserUseBrowser]] = None,
+        context_config_factory: Optional[Callable[[], BrowserContextConfig]] = None,
+    ):
+        """Initializes the browser pool.
+
+        Args:
+            max_browsers: Maximum number of browser processes.
+            max_contexts_per_browser: Contexts open at the same time in one
+                browser, acquire waits when all browsers are full.
+            max_uses: Contexts a browser serves before it is recycled.
+            context_memory_limit_mb: JS heap of a released context above which
+                its browser is recycled, None disables the check.
+            warm_contexts: Contexts kept ready, 0 disables warming.
+            warmup_urls: Pages loaded into warm contexts before they are handed out.
+            browser_factory: Callable creating a browser, one launched from the
+                browser settings if None.
+            context_config_factory: Callable returning the configuration of new
+                contexts, the configured context settings if None.
+        """
+        self.max_browsers = max_browsers
+        self.max_contexts_per_browser = max_contexts_per_browser
+        self.max_uses = max_uses
+        self.context_memory_limit_mb = context_memory_limit_mb
+        self.warm_contexts = warm_contexts
+        self.warmup_urls = warmup_urls or []
+
+        self._browser_factory = browser_factory or (
+            lambda: BrowserUseBrowser(build_browser_config())
+        )
+        self._context_config_factory = context_config_factory or build_context_config
+
+        self._browsers: List[_PooledBrowser] = []
+        self._warm: Deque[Tuple[_PooledBrowser, BrowserContext]] = deque()
+        self._warm_pending = 0
+        self._owners: Dict[int, _PooledBrowser] = {}
+        self._condition = asyncio.Condition()
+        self._refill_tasks: Set[asyncio.Task] = set()
+        self._is_shutting_down = False
+
+        self._launched = 0
+        self._recycled = 0
+        self._warm_hits = 0
+        self._warm_misses = 0
+
+    @classmethod
+    def from_settings(cls, settings: BrowserPoolSettings) -> "BrowserPool":
+        """Creates a pool from the browser pool settings."""
+        return cls(
+            max_browsers=settings.max_browsers,
+            max_contexts_per_browser=settings.max_contexts_per_browser,
+            max_uses=settings.max_uses,
+            context_memory_limit_mb=settings.context_memory_limit_mb,
+            warm_contexts=settings.warm_contexts,
+            warmup_urls=settings.warmup_urls,
+        )
+
+    async def acquire(self) -> BrowserContext:
+        """Hands out an isolated browser context.
+
+        Takes a warm context if one is ready, otherwise opens a context in the
+        least loaded browser, launching a browser while below max_browsers.
+        Waits for a release when every browser is at its context limit.
+
+        Returns:
+            BrowserContext: A context owned by the caller until released.
+
+        Raises:
+            RuntimeError: If the pool is shut down.
+        """
+        async with self._condition:
+            while True:
+                if self._is_shutting_down:
+                    raise RuntimeError("Browser pool is shut down")
+
+                if self._warm:
+                    pooled, context = self._warm.popleft()
+                    self._warm_hits += 1
+                    self._owners[id(context)] = pooled
+                    self._schedule_refill()
+                    return context
+
+                pooled = self._reserve()
+                if pooled is not None:
+                    if self.warm_contexts > 0:
+                        self._warm_misses += 1
+                    break
+                await self._condition.wait()
+
+        try:
+            context = await self._open_context(pooled, warm=False)
+        except asyncio.CancelledError:
+            # The caller gave up, the browser is fine
+            await self._unreserve(pooled)
+            raise
+        except Exception:
+            # The browser most likely crashed, replace it
+            await self._retire(pooled)
+            await self._unreserve(pooled)
+            raise
+        self._owners[id(context)] = pooled
+        self._schedule_refill()
+        return context
+
+    async def release(self, context: BrowserContext) -> None:
+        """Closes a context handed out by acquire and frees its slot.
+
+        Args:
+            context: Context returned by acquire.
+        """
+        pooled = self._owners.pop(id(context), None)
+        if pooled is None:
+            logger.warning("Releasing a browser context the pool does not own")
+            await context.close()
+            return
+
+        if await self._exceeds_memory_limit(context):
+            logger.info("Browser context exceeded its memory limit, recycling browser")
+            await self._retire(pooled)
+        await self._close_context(pooled, context)
+        self._schedule_refill()
+
+    def _reserve(self) -> Optional[_PooledBrowser]:
+        """Takes a context slot in the least loaded browser, caller holds the lock.
+
+        Returns:
+            The browser to open the context in, or None if every browser is full.
+        """
+        candidates = [
+            pooled
+            for pooled in self._browsers
+            if not pooled.retiring and pooled.active < self.max_contexts_per_browser
+        ]
+        if candidates:
+            pooled = min(candidates, key=lambda pooled: pooled.active)
+        elif len(self._browsers) < self.max_browsers:
+            pooled = _PooledBrowser(self._browser_factory())
+            self._browsers.append(pooled)
+            self._launched += 1
+        else:
+            return None
+
+        pooled.active += 1
+        pooled.uses += 1
+        if pooled.uses >= self.max_uses:
+            pooled.retiring = True
+        return pooled
+
+    async def _retire(self, pooled: _PooledBrowser) -> None:
+        """Marks a browser broken and closes its warm contexts.
+
+        The browser itself closes once its handed out contexts are released.
+        """
+        async with self._condition:
+            pooled.retiring = True
+            pooled.broken = True
+            stale = [context for owner, context in self._warm if owner is pooled]
+            self._warm = deque(
+                (owner, context) for owner, context in self._warm if owner is not pooled
+            )
+        for context in stale:
+            await self._close_context(pooled, context)
+
+    async def _unreserve(self, pooled: _PooledBrowser) -> None:
+        """Frees a context slot and closes the browser if it retired and is idle."""
+        async with self._condition:
+            pooled.active -= 1
+            close_browser = (
+                pooled.retiring and pooled.active == 0 and pooled in self._browsers
+            )
+            if close_browser:
+                self._browsers.remove(pooled)
+            self._condition.notify_all()
+
+        if close_browser:
+            self._recycled += 1
+            try:
+                await pooled.browser.close()
+            except Exception as e:
+                logger.warning(f"Failed to close pooled browser: {e}")
+
+    async def _open_context(self, pooled: _PooledBrowser, warm: bool) -> BrowserContext:
+        """Opens a context in a pooled browser.
+
+        Args:
+            pooled: Browser with a reserved slot.
+            warm: Whether to start the context's session and load the warm-up
+                pages, otherwise the session starts on first use.
+        """
+        context = await pooled.browser.new_context(self._context_config_factory())
+        if warm:
+            try:
+                await context.get_current_page()
+                for url in self.warmup_urls:
+                    try:
+                        await context.navigate_to(url)
+                    except Exception as e:
+                        logger.warning(f"Failed to load warm-up page {url}: {e}")
+            except BaseException:
+                await self._close_quietly(context)
+                raise
+        return context
+
+    async def _close_context(
+        self, pooled: _PooledBrowser, context: BrowserContext
+    ) -> None:
+        await self._close_quietly(context)
+        await self._unreserve(pooled)
+
+    @staticmethod
+    async def _close_quietly(context: BrowserContext) -> None:
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"Failed to close browser context: {e}")
+
+    async def _exceeds_memory_limit(self, context: BrowserContext) -> bool:
+        """Checks whether the JS heap of a context's pages exceeds the limit."""
+        if not self.context_memory_limit_mb:
+            return False
+        session = getattr(context, "session", None)
+        if session is None:
+            return False
+        used = 0
+        for page in session.context.pages:
+            try:
+                used += await asyncio.wait_for(page.evaluate(_JS_HEAP_SCRIPT), 5)
+            except Exception:
+                # A hung or crashed page is reason enough to recycle
+                return True
+        return used > self.context_memory_limit_mb * 1024 * 1024
+
+    def _schedule_refill(self) -> None:
+        """Refills the warm contexts in the background."""
+        if self._is_shutting_down or self.warm_contexts <= 0:
+            return
+        task = asyncio.create_task(self._refill())
+        self._refill_tasks.add(task)
+        task.add_done_callback(self._refill_tasks.discard)
+
+    async def _refill(self) -> None:
+        """Opens contexts until the warm ones, counting those starting, suffice.
+
+        Warm contexts only use free slots, they never make acquire wait.
+        """
+        async with self._condition:
+            reserved = []
+            while len(self._warm) + self._warm_pending < self.warm_contexts:
+                pooled = self._reserve()
+                if pooled is None:
+                    break
+                reserved.append(pooled)
+                self._warm_pending += 1
+
+        async def open_one(pooled: _PooledBrowser) -> None:
+            try:
+                context = await self._open_context(pooled, warm=True)
+            except asyncio.CancelledError:
+                self._warm_pending -= 1
+                await self._unreserve(pooled)
+                raise
+            except Exception as e:
+                logger.error(f"Failed to open warm browser context: {e}")
+                self._warm_pending -= 1
+                await self._retire(pooled)
+                await self._unreserve(pooled)
+                return
+            async with self._condition:
+                self._warm_pending -= 1
+                keep = not self._is_shutting_down and not pooled.broken
+                if keep:
+                    self._warm.append((pooled, context))
+                    self._condition.notify_all()
+            if not keep:
+                await self._close_context(pooled, context)
+
+        await asyncio.gather(*(open_one(pooled) for pooled in reserved))
+
+    async def warm_up(self) -> None:
+        """Opens the warm contexts ahead of the first acquire."""
+        await self._refill()
+
+    async def close(self) -> None:
+        """Closes all warm contexts and browsers.
+
+        Contexts still handed out are closed along with their browsers.
+        """
+        self._is_shutting_down = True
+        for task in list(self._refill_tasks):
+            task.cancel()
+        if self._refill_tasks:
+            await asyncio.gather(*self._refill_tasks, return_exceptions=True)
+
+        async with self._condition:
+            warm = list(self._warm)
+            self._warm.clear()
+            browsers = list(self._browsers)
+            self._browsers.clear()
+            self._owners.clear()
+            self._condition.notify_all()
+
+        for _, context in warm:
+            await self._close_quietly(context)
+        for pooled in browsers:
+            try:
+                await pooled.browser.close()
+            except Exception as e:
+                logger.warning(f"Failed to close pooled browser: {e}")
+
+    def get_stats(self) -> Dict:
+        """Gets pool statistics.
+
+        Returns:
+            Dict: Browser and context counts, and launch/recycle/warm counters.
+        """
+        requests = self._warm_hits + self._warm_misses
+        return {
+            "browsers": len(self._browsers),
+            "max_browsers": self.max_browsers,
+            "contexts_in_use": len(self._owners),
+            "warm_contexts": len(self._warm),
+            "launched": self._launched,
+            "recycled": self._recycled,
+            "warm_hits": self._warm_hits,
+            "warm_misses": self._warm_misses,
+            "warm_hit_rate": self._warm_hits / requests if requests else 0.0,
+        }
+
+
+_BROWSER_POOL: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Returns the process-wide browser pool, created from the settings on first use."""
+    global _BROWSER_POOL
+    if _BROWSER_POOL is None:
+        settings = (
+            config.browser_config.pool
+            if config.browser_config
+            else BrowserPoolSettings()
+        )
+        _BROWSER_POOL = BrowserPool.from_settings(settings)
+    return _BROWSER_POOL
+
+
+async def warm_up_browser_pool() -> None:
+    """Opens the shared pool's warm contexts, if pooling and warming are configured.
+
+    Called at startup, so the first browser action does not wait for a launch.
+    """
+    settings = config.browser_config.pool if config.browser_config else None
+    if settings and settings.enabled and settings.warm_contexts > 0:
+        await get_browser_pool().warm_up()
+
+
+async def close_browser_pool() -> None:
+    """Closes the shared pool and its browsers, if it was created.
+
+    Tools only release their contexts on cleanup, so this is the shutdown path
+    of the pooled browsers. A later get_browser_pool creates a new pool.
+    """
+    global _BROWSER_POOL
+    pool, _BROWSER_POOL = _BROWSER_POOL, None
+    if pool is not None:
+        await pool.close()
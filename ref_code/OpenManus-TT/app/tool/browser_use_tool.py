@@ -1,18 +1,27 @@
 import asyncio
 import base64
+import hashlib
+import io
 import json
+from collections import OrderedDict
 from typing import Generic, Optional, TypeVar
 
 from browser_use import Browser as BrowserUseBrowser
-from browser_use import BrowserConfig
-from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from browser_use.browser.context import BrowserContext
 from browser_use.dom.service import DomService
-from pydantic import Field, field_validator
+from PIL import Image
+from pydantic import Field, PrivateAttr, field_validator
 from pydantic_core.core_schema import ValidationInfo
 
-from app.config import config
-from app.llm import LLM
+from app.config import ScreenshotSettings, config
+from app.llm import LLM, TokenCounter
 from app.tool.base import BaseTool, ToolResult
+from app.tool.browser_pool import (
+    BrowserPool,
+    build_browser_config,
+    build_context_config,
+    get_browser_pool,
+)
 from app.tool.web_search import WebSearch
 
 
@@ -33,9 +42,71 @@ Key capabilities include:
 Note: When using element indices, refer to the numbered elements shown in the current browser state.
 """
 
+# Hash of the page text, so that content changes outside interactive elements
+# also count as a new page state
+_PAGE_TEXT_HASH_SCRIPT = """() => {
+    const text = document.body ? document.body.innerText : "";
+    let hash = 0;
+    for (let i = 0; i < text.length; i++) {
+        hash = (hash * 31 + text.charCodeAt(i)) | 0;
+    }
+    return `${hash}:${text.length}`;
+}"""
+
 Context = TypeVar("Context")
 
 
+def encode_screenshot(screenshot: bytes, settings: ScreenshotSettings) -> str:
+    """Fit a screenshot to the token budget and encode it as base64 JPEG.
+
+    The screenshot is downscaled until its estimated image tokens fit the budget,
+    then the JPEG quality is lowered while the encoded image exceeds max_bytes.
+    A JPEG that already fits is returned without re-encoding.
+    """
+    image = Image.open(io.BytesIO(screenshot))
+    width, height = image.size
+
+    # The model downscales to these limits itself, larger sizes only cost bytes
+    scale = min(
+        1.0,
+        TokenCounter.MAX_SIZE / max(width, height),
+        TokenCounter.HIGH_DETAIL_TARGET_SHORT_SIDE / min(width, height),
+    )
+    while (
+        scale > 0.1
+        and TokenCounter.high_detail_tokens(
+            max(1, int(width * scale)), max(1, int(height * scale))
+        )
+        > settings.token_budget
+    ):
+        scale *= 0.9
+
+    if (
+        scale == 1.0
+        and image.format == "JPEG"
+        and len(screenshot) <= settings.max_bytes
+    ):
+        return base64.b64encode(screenshot).decode("utf-8")
+
+    image = image.convert("RGB")
+    if scale < 1.0:
+        image = image.resize(
+            (max(1, int(width * scale)), max(1, int(height * scale))),
+            Image.Resampling.LANCZOS,
+            reducing_gap=2.0,
+        )
+
+    quality = settings.quality
+    while True:
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality)
+        if buffer.tell() <= settings.max_bytes or quality <= settings.min_quality:
+            break
+        quality = max(settings.min_quality, quality - 15)
+
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
 class BrowserUseTool(BaseTool, Generic[Context]):
     name: str = "browser_use"
     description: str = _BROWSER_DESCRIPTION
@@ -132,6 +203,14 @@ class BrowserUseTool(BaseTool, Generic[Context]):
 
     llm: Optional[LLM] = Field(default_factory=LLM)
 
+    # Hash of the page state returned last, and encoded screenshots by state hash
+    _last_state_hash: Optional[str] = PrivateAttr(default=None)
+    _screenshot_cache: "OrderedDict[str, str]" = PrivateAttr(
+        default_factory=OrderedDict
+    )
+    # Pool the context was acquired from, None if this tool launched the browser
+    _pool: Optional[BrowserPool] = PrivateAttr(default=None)
+
     @field_validator("parameters", mode="before")
     def validate_parameters(cls, v: dict, info: ValidationInfo) -> dict:
         if not v:
@@ -139,50 +218,29 @@ class BrowserUseTool(BaseTool, Generic[Context]):
         return v
 
     async def _ensure_browser_initialized(self) -> BrowserContext:
-        """Ensure browser and context are initialized."""
-        if self.browser is None:
-            browser_config_kwargs = {"headless": False, "disable_security": True}
+        """Ensure browser and context are initialized.
 
-            if config.browser_config:
-                from browser_use.browser.browser import ProxySettings
-
-                # handle proxy settings.
-                if config.browser_config.proxy and config.browser_config.proxy.server:
-                    browser_config_kwargs["proxy"] = ProxySettings(
-                        server=config.browser_config.proxy.server,
-                        username=config.browser_config.proxy.username,
-                        password=config.browser_config.proxy.password,
-                    )
-
-                browser_attrs = [
-                    "headless",
-                    "disable_security",
-                    "extra_chromium_args",
-                    "chrome_instance_path",
-                    "wss_url",
-                    "cdp_url",
-                ]
-
-                for attr in browser_attrs:
-                    value = getattr(config.browser_config, attr, None)
-                    if value is not None:
-                        if not isinstance(value, list) or value:
-                            browser_config_kwargs[attr] = value
+        With the browser pool enabled, the context comes from a shared pooled
+        browser instead of a browser launched for this tool.
+        """
+        if self._pool is not None:
+            return self.context
+
+        if (
+            self.context is None
+            and config.browser_config
+            and config.browser_config.pool.enabled
+        ):
+            self._pool = get_browser_pool()
+            self.context = await self._pool.acquire()
+            self.dom_service = DomService(await self.context.get_current_page())
+            return self.context
 
-            self.browser = BrowserUseBrowser(BrowserConfig(**browser_config_kwargs))
+        if self.browser is None:
+            self.browser = BrowserUseBrowser(build_browser_config())
 
         if self.context is None:
-            context_config = BrowserContextConfig()
-
-            # if there is context config in the config, use it.
-            if (
-                config.browser_config
-                and hasattr(config.browser_config, "new_context_config")
-                and config.browser_config.new_context_config
-            ):
-                context_config = config.browser_config.new_context_config
-
-            self.context = await self.browser.new_context(context_config)
+            self.context = await self.browser.new_context(build_context_config())
             self.dom_service = DomService(await self.context.get_current_page())
 
         return self.context
@@ -498,18 +556,11 @@ Page content:
             elif hasattr(ctx, "config") and hasattr(ctx.config, "browser_window_size"):
                 viewport_height = ctx.config.browser_window_size.get("height", 0)
 
-            # Take a screenshot for the state
             page = await ctx.get_current_page()
 
             await page.bring_to_front()
             await page.wait_for_load_state()
 
-            screenshot = await page.screenshot(
-                full_page=True, animations="disabled", type="jpeg", quality=100
-            )
-
-            screenshot = base64.b64encode(screenshot).decode("utf-8")
-
             # Build the state info with all required fields
             state_info = {
                 "url": state.url,
@@ -531,23 +582,79 @@ Page content:
                 "viewport_height": viewport_height,
             }
 
+            # Take a screenshot for the state, unless the page did not change
+            settings = self._get_screenshot_settings()
+            state_hash = await self._get_state_hash(page, state_info)
+            screenshot = None
+            if not (settings.skip_unchanged and state_hash == self._last_state_hash):
+                screenshot = await self._get_screenshot(
+                    page, state, state_hash, settings
+                )
+            self._last_state_hash = state_hash
+
             return ToolResult(
-                output=json.dumps(state_info, indent=4, ensure_ascii=False),
+                output=json.dumps(state_info, ensure_ascii=False),
                 base64_image=screenshot,
             )
         except Exception as e:
             return ToolResult(error=f"Failed to get browser state: {str(e)}")
 
+    @staticmethod
+    def _get_screenshot_settings() -> ScreenshotSettings:
+        if config.browser_config:
+            return config.browser_config.screenshot
+        return ScreenshotSettings()
+
+    @staticmethod
+    async def _get_state_hash(page, state_info: dict) -> str:
+        """Hash the page state, the URL, tabs, elements, scroll position and text."""
+        digest = hashlib.sha256(json.dumps(state_info, sort_keys=True).encode())
+        digest.update((await page.evaluate(_PAGE_TEXT_HASH_SCRIPT)).encode())
+        return digest.hexdigest()
+
+    async def _get_screenshot(
+        self, page, state, state_hash: str, settings: ScreenshotSettings
+    ) -> str:
+        """Capture and encode a screenshot, or reuse the one cached for the state."""
+        screenshot = self._screenshot_cache.get(state_hash)
+        if screenshot is not None:
+            self._screenshot_cache.move_to_end(state_hash)
+            return screenshot
+
+        # The state usually carries a viewport screenshot already
+        if not settings.full_page and getattr(state, "screenshot", None):
+            raw = base64.b64decode(state.screenshot)
+        else:
+            raw = await page.screenshot(
+                full_page=settings.full_page,
+                animations="disabled",
+                type="jpeg",
+                quality=settings.quality,
+                scale="css",
+            )
+        screenshot = await asyncio.to_thread(encode_screenshot, raw, settings)
+
+        self._screenshot_cache[state_hash] = screenshot
+        while len(self._screenshot_cache) > settings.cache_size:
+            self._screenshot_cache.popitem(last=False)
+        return screenshot
+
     async def cleanup(self):
         """Clean up browser resources."""
         async with self.lock:
             if self.context is not None:
-                await self.context.close()
+                if self._pool is not None:
+                    await self._pool.release(self.context)
+                    self._pool = None
+                else:
+                    await self.context.close()
                 self.context = None
                 self.dom_service = None
             if self.browser is not None:
                 await self.browser.close()
                 self.browser = None
+            self._last_state_hash = None
+            self._screenshot_cache.clear()
 
     def __del__(self):
         """Ensure cleanup when object is destroyed."""
@@ -1,17 +1,20 @@
 import asyncio
+import heapq
+import itertools
 import json
+import math
 import re
 import time
-from typing import List, Optional, Set
+from typing import Any, Dict, List, Optional, Set
 
-from pydantic import BaseModel, ConfigDict, Field, model_validator
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
 
 from app.exceptions import ToolError
 from app.llm import LLM
 from app.logger import logger
 from app.schema import ToolChoice
 from app.tool.base import BaseTool, ToolResult
-from app.tool.web_search import SearchResult, WebSearch
+from app.tool.web_search import SearchResult, WebSearch, normalize_url
 
 
 # Prompts for LLM interactions
@@ -38,6 +41,20 @@ Extract up to 3 most important insights from this content. For each insight:
 2. Provide relevance score (0.0-1.0)
 """
 
+EXTRACT_INSIGHTS_BATCH_PROMPT = """
+Analyze each of the following sources and extract key insights related to the research query.
+For each insight, assess its relevance to the query on a scale of 0.0 to 1.0.
+
+Research query: {query}
+Sources to analyze:
+{sources}
+
+Extract up to 3 most important insights from each source and report them under that source's id.
+For each insight:
+1. Provide the insight content
+2. Provide relevance score (0.0-1.0)
+"""
+
 GENERATE_FOLLOW_UPS_PROMPT = """
 Based on the insights discovered so far, generate follow-up research queries to explore gaps or related areas.
 These should help deepen our understanding of the topic.
@@ -51,6 +68,29 @@ Generate up to 3 specific follow-up queries that would help address gaps in our
 Each query should be concise and focused on a specific aspect of the research topic.
 """
 
+# Structured output schema of the insights extracted from one source
+INSIGHTS_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "content": {
+                "type": "string",
+                "description": "The insight content",
+            },
+            "relevance_score": {
+                "type": "number",
+                "description": "Relevance score between 0.0 and 1.0",
+                "minimum": 0.0,
+                "maximum": 1.0,
+            },
+        },
+        "required": ["content", "relevance_score"],
+    },
+    "description": "List of key insights extracted from the content",
+    "maxItems": 3,
+}
+
 # Constants for insight parsing
 DEFAULT_RELEVANCE_SCORE = 1.0
 FALLBACK_RELEVANCE_SCORE = 0.7
@@ -60,6 +100,18 @@ INSIGHT_MARKER_PATTERN = re.compile(r"^\s*(?:\d+\.|-|\*|•)\s*(.*)")
 # Pattern to detect relevance score, capturing the number (case-insensitive)
 RELEVANCE_SCORE_PATTERN = re.compile(r"relevance.*?:.*?(\d\.?\d*)", re.IGNORECASE)
 
+# Constants for batched insight extraction
+PAGE_CONTENT_LIMIT = 5000  # Characters of each page sent for analysis
+BATCH_TOKEN_BUDGET = 12000  # Page content tokens packed into one request
+MAX_BATCH_PAGES = 8
+# Seconds; batches grow when faster than half of it and shrink when slower
+TARGET_BATCH_LATENCY = 20.0
+
+# Constants for the research frontier
+MAX_BRANCHING = 2  # Follow-up queries explored per research step
+# Jaccard similarity above which queries are duplicates
+QUERY_SIMILARITY_THRESHOLD = 0.8
+
 
 class ResearchInsight(BaseModel):
     """A single insight discovered during research."""
@@ -100,6 +152,68 @@ class ResearchContext(BaseModel):
     )
 
 
+class ResearchTask(BaseModel):
+    """A query waiting in the research frontier."""
+
+    query: str = Field(description="Search query to research")
+    depth: int = Field(
+        default=0, description="Depth of this query in the research tree"
+    )
+    priority: float = Field(default=1.0, description="Higher priority runs first")
+    results_count: int = Field(description="Number of search results to analyze")
+    deadline: float = Field(description="Time budget of this branch (epoch seconds)")
+
+
+class ResearchFrontier:
+    """Priority queue of research queries with query and URL deduplication.
+
+    Queries are compared by their word sets, so reordered or near-identical
+    follow-ups are dropped; URLs are compared after normalization, so a page
+    found by several branches is analyzed only once.
+    """
+
+    def __init__(self, similarity_threshold: float = QUERY_SIMILARITY_THRESHOLD):
+        self.similarity_threshold = similarity_threshold
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._seen_queries: List[frozenset] = []
+        self._seen_urls: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @staticmethod
+    def _query_terms(query: str) -> frozenset:
+        return frozenset(re.findall(r"\w+", query.lower()))
+
+    def push(self, task: ResearchTask) -> bool:
+        """Queue a task unless an equivalent query was already queued."""
+        terms = self._query_terms(task.query)
+        if not terms:
+            return False
+        for seen in self._seen_queries:
+            if len(terms & seen) / len(terms | seen) >= self.similarity_threshold:
+                logger.info(f"Skipping duplicate research query: '{task.query}'")
+                return False
+        self._seen_queries.append(terms)
+        heapq.heappush(self._heap, (-task.priority, next(self._counter), task))
+        return True
+
+    def pop(self) -> Optional[ResearchTask]:
+        """Return the highest priority task, or None if the frontier is empty."""
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[2]
+
+    def claim_url(self, url: str) -> bool:
+        """Mark a URL as taken; False if another branch already claimed it."""
+        key = normalize_url(url)
+        if key in self._seen_urls:
+            return False
+        self._seen_urls.add(key)
+        return True
+
+
 class ResearchSummary(ToolResult):
     """Comprehensive summary of deep research results."""
 
@@ -190,10 +304,15 @@ class DeepResearch(BaseTool):
         },
         "required": ["query"],
     }
+    concurrency_safe = True
 
     # Dependency injection for easier testing
     search_tool: WebSearch = Field(default_factory=WebSearch)
     llm: LLM = Field(default_factory=LLM)
+    max_concurrency: int = Field(
+        default=3, description="Maximum number of research steps running at once"
+    )
+    _batch_size: int = PrivateAttr(default=4)
 
     async def execute(
         self,
@@ -290,54 +409,113 @@ class DeepResearch(BaseTool):
         results_count: int,
         deadline: float,
     ) -> None:
-        """Run a complete research cycle (search, analyze, generate follow-ups)."""
-        # Check termination conditions
-        if time.time() >= deadline or context.current_depth >= context.max_depth:
-            return
+        """Explore the research tree from a priority frontier of queries.
+
+        Up to max_concurrency research steps (search, analyze, generate
+        follow-ups) run at once; each step pushes its follow-ups back into the
+        frontier, which drops duplicate queries and already analyzed URLs.
+        """
+        frontier = ResearchFrontier()
+        frontier.push(
+            ResearchTask(query=query, results_count=results_count, deadline=deadline)
+        )
+        running: Set[asyncio.Task] = set()
 
-        # Log current research step
-        logger.info(f"Research cycle at depth {context.current_depth + 1}")
+        try:
+            while time.time() < deadline:
+                while frontier and len(running) < self.max_concurrency:
+                    task = frontier.pop()
+                    if time.time() >= task.deadline:
+                        logger.info(f"Branch budget exhausted for '{task.query}'")
+                        continue
+                    running.add(
+                        asyncio.create_task(
+                            self._research_step(context, frontier, task, deadline)
+                        )
+                    )
+                if not running:
+                    break
 
-        # 1. Web search
-        search_results = await self._search_web(query, results_count)
+                done, running = await asyncio.wait(
+                    running,
+                    timeout=deadline - time.time(),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for finished in done:
+                    if finished.exception():
+                        logger.error(f"Research step failed: {finished.exception()}")
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _research_step(
+        self,
+        context: ResearchContext,
+        frontier: ResearchFrontier,
+        task: ResearchTask,
+        deadline: float,
+    ) -> None:
+        """Run one research cycle (search, analyze, generate follow-ups)."""
+        logger.info(f"Research cycle at depth {task.depth + 1}: '{task.query}'")
+
+        # 1. Web search, keeping only pages no other branch has taken
+        search_results = [
+            result
+            for result in await self._search_web(task.query, task.results_count)
+            if frontier.claim_url(result.url)
+        ]
         if not search_results:
             return
 
         # 2. Extract insights
         new_insights = await self._extract_insights(
-            context, search_results, context.query, deadline
+            context, search_results, context.query, task.deadline
         )
         if not new_insights:
             return
+        context.current_depth = max(context.current_depth, task.depth + 1)
+
+        # No follow-ups are needed at the last level
+        if task.depth + 1 >= context.max_depth or time.time() >= task.deadline:
+            return
 
         # 3. Generate follow-up queries
         follow_up_queries = await self._generate_follow_ups(
-            new_insights, query, context.query
+            new_insights, task.query, context.query
         )
         context.follow_up_queries.extend(follow_up_queries)
 
-        # Update depth and proceed to next level
-        context.current_depth += 1
-
-        # 4. Continue research with follow-up queries
-        if follow_up_queries and context.current_depth < context.max_depth:
-            tasks = []  # Create a list to hold the tasks
-            for follow_up in follow_up_queries[:2]:  # Limit branching factor
-                if time.time() >= deadline:
-                    break
-
-                # Create a coroutine for the recursive research call
-                task = self._research_graph(
-                    context=context,
+        # 4. Queue follow-ups, ranked by how relevant this branch turned out to be
+        relevance = sum(i.relevance_score for i in new_insights) / len(new_insights)
+        child_deadline = self._allocate_deadline(
+            task.depth + 1, context.max_depth, deadline
+        )
+        queued = 0
+        for follow_up in follow_up_queries:
+            if queued >= MAX_BRANCHING:  # Limit branching factor
+                break
+            queued += frontier.push(
+                ResearchTask(
                     query=follow_up,
-                    results_count=max(1, results_count - 1),  # Reduce result count
-                    deadline=deadline,
+                    depth=task.depth + 1,
+                    priority=task.priority * relevance * (1 - 0.1 * queued),
+                    results_count=max(1, task.results_count - 1),  # Reduce result count
+                    deadline=child_deadline,
                 )
-                tasks.append(task)  # Add the task to the list
+            )
 
-            # Run all the created tasks concurrently
-            if tasks:
-                await asyncio.gather(*tasks)
+    @staticmethod
+    def _allocate_deadline(child_depth: int, max_depth: int, deadline: float) -> float:
+        """Split the remaining time evenly across the remaining levels.
+
+        A branch at depth d must finish within 1/(max_depth - d) of what is
+        left, so deeper levels keep their share instead of one wide level
+        using it all.
+        """
+        now = time.time()
+        remaining = max(0.0, deadline - now)
+        return now + remaining / max(1, max_depth - child_depth)
 
     async def _search_web(self, query: str, results_count: int) -> List[SearchResult]:
         """Perform web search for the given query."""
@@ -353,9 +531,8 @@ class DeepResearch(BaseTool):
         original_query: str,
         deadline: float,
     ) -> List[ResearchInsight]:
-        """Extract insights from search results."""
-        all_insights = []
-
+        """Extract insights from search results, several pages per LLM request."""
+        pages = []
         for rst in results:
             # Skip if URL already visited or time exceeded
             if rst.url in context.visited_urls or time.time() >= deadline:
@@ -364,25 +541,195 @@ class DeepResearch(BaseTool):
             context.visited_urls.add(rst.url)
 
             # Skip if no content available
-            if not rst.raw_content:
-                continue
-
-            # Extract insights using LLM
-            insights = await self._analyze_content(
-                content=rst.raw_content[:10000],  # Limit content size
-                url=rst.url,
-                title=rst.title,
-                query=original_query,
-            )
+            if rst.raw_content:
+                pages.append(rst)
 
+        all_insights = []
+        batch_results = await asyncio.gather(
+            *[
+                self._analyze_batch(batch, original_query)
+                for batch in self._make_batches(pages)
+            ]
+        )
+        for insights in batch_results:
             all_insights.extend(insights)
             context.insights.extend(insights)
 
-            # Log discovered insights
-            logger.info(f"Extracted {len(insights)} insights from {rst.url}")
-
         return all_insights
 
+    def _make_batches(self, pages: List[SearchResult]) -> List[List[SearchResult]]:
+        """Pack pages into batches of at most _batch_size pages and BATCH_TOKEN_BUDGET tokens."""
+        batches: List[List[SearchResult]] = []
+        batch: List[SearchResult] = []
+        batch_tokens = 0
+        for page in pages:
+            page_tokens = self.llm.count_tokens(page.raw_content[:PAGE_CONTENT_LIMIT])
+            if batch and (
+                len(batch) >= self._batch_size
+                or batch_tokens + page_tokens > BATCH_TOKEN_BUDGET
+            ):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(page)
+            batch_tokens += page_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _record_batch_latency(self, latency: float) -> None:
+        """Adapt the batch size to the measured latency (additive increase, multiplicative decrease)."""
+        if latency > TARGET_BATCH_LATENCY:
+            self._batch_size = max(1, self._batch_size // 2)
+        elif latency < TARGET_BATCH_LATENCY / 2:
+            self._batch_size = min(MAX_BATCH_PAGES, self._batch_size + 1)
+
+    async def _analyze_batch(
+        self, pages: List[SearchResult], query: str
+    ) -> List[ResearchInsight]:
+        """Extract insights from several pages in one request and split them per source.
+
+        Pages the model skipped, or a whole failed batch, fall back to one
+        request per page.
+        """
+        if len(pages) == 1:
+            page = pages[0]
+            return await self._analyze_content(
+                content=page.raw_content, url=page.url, title=page.title, query=query
+            )
+
+        sources = "\n\n".join(
+            f"[Source {source_id}] {page.title} ({page.url})\n"
+            f"{page.raw_content[:PAGE_CONTENT_LIMIT]}"
+            for source_id, page in enumerate(pages)
+        )
+        prompt = EXTRACT_INSIGHTS_BATCH_PROMPT.format(query=query, sources=sources)
+
+        extracted: Dict[int, List[dict]] = {}
+        start = time.time()
+        try:
+            response = await self.llm.ask_tool(
+                [{"role": "user", "content": prompt}],
+                tools=[
+                    {
+                        "type": "function",
+                        "function": {
+                            "name": "extract_insights_batch",
+                            "description": "Extract key insights with relevance scores from each source",
+                            "parameters": {
+                                "type": "object",
+                                "properties": {
+                                    "sources": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "properties": {
+                                                "source_id": {
+                                                    "type": "integer",
+                                                    "description": "Id of the source the insights come from",
+                                                },
+                                                "insights": INSIGHTS_SCHEMA,
+                                            },
+                                            "required": ["source_id", "insights"],
+                                        },
+                                        "description": "Insights grouped by source",
+                                    }
+                                },
+                                "required": ["sources"],
+                            },
+                        },
+                    }
+                ],
+                tool_choice=ToolChoice.REQUIRED,
+                stream=False,
+            )
+            self._record_batch_latency(time.time() - start)
+
+            if response and response.tool_calls:
+                arguments = json.loads(response.tool_calls[0].function.arguments)
+                for source in arguments.get("sources", []):
+                    if not isinstance(source, dict):
+                        continue
+                    source_id = source.get("source_id")
+                    source_insights = source.get("insights")
+                    if (
+                        isinstance(source_id, int)
+                        and 0 <= source_id < len(pages)
+                        and isinstance(source_insights, list)
+                    ):
+                        extracted.setdefault(source_id, []).extend(source_insights)
+        except Exception as e:
+            logger.warning(
+                f"Batch insight extraction failed, analyzing pages one by one: {e}"
+            )
+
+        insights = []
+        fallback_pages = []
+        for source_id, page in enumerate(pages):
+            page_insights = self._parse_insights(
+                extracted.get(source_id, []), page.url, page.title
+            )
+            if not page_insights:
+                fallback_pages.append(page)
+                continue
+            insights.extend(page_insights)
+            logger.info(f"Extracted {len(page_insights)} insights from {page.url}")
+
+        for page_insights in await asyncio.gather(
+            *[
+                self._analyze_content(
+                    content=page.raw_content,
+                    url=page.url,
+                    title=page.title,
+                    query=query,
+                )
+                for page in fallback_pages
+            ]
+        ):
+            insights.extend(page_insights)
+
+        return insights
+
+    @staticmethod
+    def _parse_insights(
+        extracted_insights: Any, url: str, title: str
+    ) -> List[ResearchInsight]:
+        """Convert structured insight data from the LLM into ResearchInsight objects.
+
+        Items that are not insights with text content are skipped, and a relevance
+        score that is not a number falls back to the default, so one malformed
+        item does not discard the others.
+        """
+        if not isinstance(extracted_insights, list):
+            return []
+
+        insights = []
+        for insight_data in extracted_insights:
+            if not isinstance(insight_data, dict):
+                continue
+            content = insight_data.get("content")
+            if not content or not isinstance(content, str):
+                continue
+            try:
+                relevance_score = float(
+                    insight_data.get("relevance_score", FALLBACK_RELEVANCE_SCORE)
+                )
+            except (TypeError, ValueError):
+                relevance_score = FALLBACK_RELEVANCE_SCORE
+            if math.isnan(relevance_score):
+                relevance_score = FALLBACK_RELEVANCE_SCORE
+
+            insights.append(
+                ResearchInsight(
+                    content=content,
+                    source_url=url,
+                    source_title=title,
+                    relevance_score=min(1.0, max(0.0, relevance_score)),
+                )
+            )
+            if len(insights) == 3:
+                break
+        return insights
+
     async def _generate_follow_ups(
         self, insights: List[ResearchInsight], current_query: str, original_query: str
     ) -> List[str]:
@@ -443,7 +790,7 @@ class DeepResearch(BaseTool):
     ) -> List[ResearchInsight]:
         """Extract insights from content based on relevance to query."""
         prompt = EXTRACT_INSIGHTS_PROMPT.format(
-            query=query, content=content[:5000]  # Limit content size
+            query=query, content=content[:PAGE_CONTENT_LIMIT]
         )
 
         response = await self.llm.ask_tool(
@@ -456,29 +803,7 @@ class DeepResearch(BaseTool):
                         "description": "Extract key insights from content with relevance scores",
                         "parameters": {
                             "type": "object",
-                            "properties": {
-                                "insights": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "object",
-                                        "properties": {
-                                            "content": {
-                                                "type": "string",
-                                                "description": "The insight content",
-                                            },
-                                            "relevance_score": {
-                                                "type": "number",
-                                                "description": "Relevance score between 0.0 and 1.0",
-                                                "minimum": 0.0,
-                                                "maximum": 1.0,
-                                            },
-                                        },
-                                        "required": ["content", "relevance_score"],
-                                    },
-                                    "description": "List of key insights extracted from the content",
-                                    "maxItems": 3,
-                                }
-                            },
+                            "properties": {"insights": INSIGHTS_SCHEMA},
                             "required": ["insights"],
                         },
                     },
@@ -494,19 +819,7 @@ class DeepResearch(BaseTool):
         if response and response.tool_calls and len(response.tool_calls) > 0:
             tool_call = response.tool_calls[0]
             arguments = json.loads(tool_call.function.arguments)
-            extracted_insights = arguments.get("insights", [])
-
-            for insight_data in extracted_insights:
-                insights.append(
-                    ResearchInsight(
-                        content=insight_data.get("content", ""),
-                        source_url=url,
-                        source_title=title,
-                        relevance_score=insight_data.get(
-                            "relevance_score", FALLBACK_RELEVANCE_SCORE
-                        ),
-                    )
-                )
+            insights = self._parse_insights(arguments.get("insights", []), url, title)
 
         # Fallback: if no structured insights found, use fallback approach
         if not insights:
@@ -524,6 +837,7 @@ class DeepResearch(BaseTool):
                 )
             )
 
+        logger.info(f"Extracted {len(insights)} insights from {url}")
         return insights
 
 
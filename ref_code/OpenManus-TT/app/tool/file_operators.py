@@ -1,8 +1,9 @@
 """File operation interfaces and implementations for local and sandbox environments."""
 
 import asyncio
+import shlex
 from pathlib import Path
-from typing import Optional, Protocol, Tuple, Union, runtime_checkable
+from typing import Dict, List, Optional, Protocol, Tuple, Union, runtime_checkable
 
 from app.config import SandboxSettings
 from app.exceptions import ToolError
@@ -24,6 +25,14 @@ class FileOperator(Protocol):
         """Write content to a file."""
         ...
 
+    async def read_files(self, paths: List[PathLike]) -> Dict[str, str]:
+        """Read content from several files, keyed by path."""
+        ...
+
+    async def write_files(self, files: Dict[PathLike, str]) -> None:
+        """Write content to several files."""
+        ...
+
     async def is_directory(self, path: PathLike) -> bool:
         """Check if path points to a directory."""
         ...
@@ -32,6 +41,10 @@ class FileOperator(Protocol):
         """Check if path exists."""
         ...
 
+    async def get_version(self, path: PathLike) -> Optional[str]:
+        """Return a token that changes whenever the file changes, None if unknown."""
+        ...
+
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
@@ -58,6 +71,15 @@ class LocalFileOperator(FileOperator):
         except Exception as e:
             raise ToolError(f"Failed to write to {path}: {str(e)}") from None
 
+    async def read_files(self, paths: List[PathLike]) -> Dict[str, str]:
+        """Read content from several local files."""
+        return {str(path): await self.read_file(path) for path in paths}
+
+    async def write_files(self, files: Dict[PathLike, str]) -> None:
+        """Write content to several local files."""
+        for path, content in files.items():
+            await self.write_file(path, content)
+
     async def is_directory(self, path: PathLike) -> bool:
         """Check if path points to a directory."""
         return Path(path).is_dir()
@@ -66,6 +88,14 @@ class LocalFileOperator(FileOperator):
         """Check if path exists."""
         return Path(path).exists()
 
+    async def get_version(self, path: PathLike) -> Optional[str]:
+        """Return the modification time and size of a local file."""
+        try:
+            stat = Path(path).stat()
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
@@ -120,11 +150,29 @@ class SandboxFileOperator(FileOperator):
         except Exception as e:
             raise ToolError(f"Failed to write to {path} in sandbox: {str(e)}") from None
 
+    async def read_files(self, paths: List[PathLike]) -> Dict[str, str]:
+        """Read content from several files in sandbox in one round trip."""
+        await self._ensure_sandbox_initialized()
+        try:
+            return await self.sandbox_client.read_files([str(path) for path in paths])
+        except Exception as e:
+            raise ToolError(f"Failed to read files in sandbox: {str(e)}") from None
+
+    async def write_files(self, files: Dict[PathLike, str]) -> None:
+        """Write content to several files in sandbox in one round trip."""
+        await self._ensure_sandbox_initialized()
+        try:
+            await self.sandbox_client.write_files(
+                {str(path): content for path, content in files.items()}
+            )
+        except Exception as e:
+            raise ToolError(f"Failed to write files in sandbox: {str(e)}") from None
+
     async def is_directory(self, path: PathLike) -> bool:
         """Check if path points to a directory in sandbox."""
         await self._ensure_sandbox_initialized()
         result = await self.sandbox_client.run_command(
-            f"test -d {path} && echo 'true' || echo 'false'"
+            f"test -d {shlex.quote(str(path))} && echo 'true' || echo 'false'"
         )
         return result.strip() == "true"
 
@@ -132,10 +180,19 @@ class SandboxFileOperator(FileOperator):
         """Check if path exists in sandbox."""
         await self._ensure_sandbox_initialized()
         result = await self.sandbox_client.run_command(
-            f"test -e {path} && echo 'true' || echo 'false'"
+            f"test -e {shlex.quote(str(path))} && echo 'true' || echo 'false'"
         )
         return result.strip() == "true"
 
+    async def get_version(self, path: PathLike) -> Optional[str]:
+        """Return None, so files in sandbox are not cached.
+
+        Checking a version costs a terminal round trip, as much as reading the
+        file, which would make every cache hit as slow as a read and every miss
+        and write slower.
+        """
+        return None
+
     async def run_command(
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
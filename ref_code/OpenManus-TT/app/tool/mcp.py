@@ -1,100 +1,464 @@
+import asyncio
+import hashlib
+import json
+from collections import deque
 from contextlib import AsyncExitStack
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
 
 from mcp import ClientSession, StdioServerParameters
+from mcp import types
 from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
-from mcp.types import TextContent
+from mcp.types import CallToolResult, TextContent
+from pydantic import TypeAdapter
 
+from app.config import MCPSettings
 from app.logger import logger
 from app.tool.base import BaseTool, ToolResult
 from app.tool.tool_collection import ToolCollection
 
 
+# Validates client notifications from their wire format, which unlike the
+# types that hold them is the same in every mcp version
+_CLIENT_NOTIFICATION = TypeAdapter(types.ClientNotification)
+
+
+class MCPCallMetrics(NamedTuple):
+    """Timing of one tool call made through a multiplexer"""
+
+    tool: str
+    queue_time: float  # seconds waiting for a free in-flight slot
+    server_time: float  # seconds from sending the request to its outcome
+    outcome: str  # ok, error, timeout or cancelled
+
+
+class MCPRequestMultiplexer:
+    """Multiplexes tool calls over one MCP session.
+
+    At most max_in_flight calls are sent to the server at a time, further calls
+    queue. A call past its deadline, or cancelled by its caller, is abandoned
+    and the server is sent a cancellation notification so it can stop working
+    on it. With coalesce_calls, concurrent calls of a tool with equal arguments
+    share one request, which only suits tools without side effects.
+    """
+
+    # Per-call metrics kept for inspection
+    MAX_RECENT_CALLS = 100
+
+    def __init__(self,
+                 session: ClientSession,
+                 max_in_flight: int = 8,
+                 call_timeout: Optional[float] = None,
+                 coalesce_calls: bool = False):
+        self.session = session
+        self.max_in_flight = max_in_flight
+        self.call_timeout = call_timeout
+        self.coalesce_calls = coalesce_calls
+        self.recent_calls: Deque[MCPCallMetrics] = deque(
+            maxlen=self.MAX_RECENT_CALLS)
+
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._shared: Dict[str, asyncio.Future] = {}
+        self._queued = 0
+        self._in_flight = 0
+        self._counts = {
+            "ok": 0,
+            "error": 0,
+            "timeout": 0,
+            "cancelled": 0,
+            "coalesced": 0
+        }
+        self._queue_time = 0.0
+        self._server_time = 0.0
+        self._max_queue_time = 0.0
+        self._max_server_time = 0.0
+
+    async def call_tool(self,
+                        name: str,
+                        arguments: Optional[Dict[str, Any]] = None,
+                        timeout: Optional[float] = None) -> CallToolResult:
+        """Calls a tool on the server.
+
+        Args:
+            name: Name of the tool on the server.
+            arguments: Arguments of the call.
+            timeout: Seconds the call may take including time queued, defaults
+                to call_timeout.
+
+        Raises:
+            asyncio.TimeoutError: If the deadline passed.
+        """
+        timeout = self.call_timeout if timeout is None else timeout
+        if not self.coalesce_calls:
+            return await self._call(name, arguments, timeout)
+
+        key = json.dumps([name, arguments], sort_keys=True, default=str)
+        shared = self._shared.get(key)
+        if shared is not None:
+            self._counts["coalesced"] += 1
+        else:
+            shared = asyncio.ensure_future(self._call(name, arguments, timeout))
+            self._shared[key] = shared
+            shared.add_done_callback(lambda f: self._forget(key, f))
+        # A caller giving up leaves the request to the other callers
+        return await asyncio.shield(shared)
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if self._shared.get(key) is future:
+            del self._shared[key]
+        if not future.cancelled():
+            future.exception()  # Retrieved even if every caller gave up
+
+    async def _call(self, name: str, arguments: Optional[Dict[str, Any]],
+                    timeout: Optional[float]) -> CallToolResult:
+        loop = asyncio.get_running_loop()
+        queued_at = loop.time()
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._record(name, loop.time() - queued_at, 0.0, "timeout")
+            raise
+        finally:
+            self._queued -= 1
+
+        sent_at = loop.time()
+        remaining = None if timeout is None else max(
+            timeout - (sent_at - queued_at), 0.0)
+        request_id = None
+
+        async def send() -> CallToolResult:
+            nonlocal request_id
+            # The session takes the next id before its first await, so this is
+            # the id of the request sent below
+            request_id = self._next_request_id()
+            return await self.session.call_tool(name, arguments)
+
+        self._in_flight += 1
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(send(), remaining)
+            outcome = "ok"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            await self._cancel(request_id,
+                               f"Call timed out after {timeout} seconds")
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            await self._cancel(request_id, "Call cancelled by the client")
+            raise
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+            self._record(name, sent_at - queued_at,
+                         loop.time() - sent_at, outcome)
+
+    def _next_request_id(self) -> Optional[int]:
+        """Gets the id the session gives its next request.
+
+        ClientSession has no public API for the ids of its requests, so this
+        reads its private counter, None if the session does not have one.
+        """
+        request_id = getattr(self.session, "_request_id", None)
+        return request_id if isinstance(request_id, int) else None
+
+    async def _cancel(self, request_id: Optional[int], reason: str) -> None:
+        """Tells the server to stop working on an abandoned request."""
+        if request_id is None:
+            logger.warning(
+                f"Not cancelling abandoned MCP request, its id is unknown: {reason}"
+            )
+            return
+        try:
+            await self.session.send_notification(
+                _CLIENT_NOTIFICATION.validate_python({
+                    "method": "notifications/cancelled",
+                    "params": {
+                        "requestId": request_id,
+                        "reason": reason
+                    },
+                }))
+        except Exception as e:
+            logger.warning(f"Failed to cancel MCP request {request_id}: {e}")
+
+    def _record(self, name: str, queue_time: float, server_time: float,
+                outcome: str) -> None:
+        self._counts[outcome] += 1
+        self._queue_time += queue_time
+        self._server_time += server_time
+        self._max_queue_time = max(self._max_queue_time, queue_time)
+        self._max_server_time = max(self._max_server_time, server_time)
+        self.recent_calls.append(
+            MCPCallMetrics(name, queue_time, server_time, outcome))
+        logger.debug(
+            f"MCP call {name} {outcome}: queued {queue_time:.3f}s, server {server_time:.3f}s"
+        )
+
+    def get_stats(self) -> Dict:
+        """Gets call statistics.
+
+        Returns:
+            Dict: Queued and in-flight calls, outcome counters, and average and
+                maximum queue and server times in seconds.
+        """
+        calls = sum(count for outcome, count in self._counts.items()
+                    if outcome != "coalesced")
+        return {
+            "queued": self._queued,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "calls": calls,
+            **self._counts,
+            "avg_queue_time": self._queue_time / calls if calls else 0.0,
+            "max_queue_time": self._max_queue_time,
+            "avg_server_time": self._server_time / calls if calls else 0.0,
+            "max_server_time": self._max_server_time,
+        }
+
+
 class MCPClientTool(BaseTool):
     """Represents a tool proxy that can be called on the MCP server from the client side."""
 
     session: Optional[ClientSession] = None
+    # Calls go through the session's multiplexer once connected
+    multiplexer: Optional[MCPRequestMultiplexer] = None
     server_id: str = ""  # Add server identifier
     original_name: str = ""
+    # Handshake of the server while it is still connecting, tools known from the
+    # catalog cache wait for it before calling
+    connection: Optional[asyncio.Future] = None
+    connect_timeout: float = 30.0
 
     async def execute(self, **kwargs) -> ToolResult:
         """Execute the tool by making a remote call to the MCP server."""
+        if not self.session and self.connection is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self.connection),
+                                       self.connect_timeout)
+            except asyncio.TimeoutError:
+                return ToolResult(
+                    error=f"MCP server {self.server_id} is still connecting")
+            except Exception:
+                pass
         if not self.session:
             return ToolResult(error="Not connected to MCP server")
 
         try:
             logger.info(f"Executing tool: {self.original_name}")
-            result = await self.session.call_tool(self.original_name, kwargs)
+            if self.multiplexer:
+                result = await self.multiplexer.call_tool(
+                    self.original_name, kwargs)
+            else:
+                result = await self.session.call_tool(
+                    self.original_name, kwargs)
             content_str = ", ".join(item.text for item in result.content
                                     if isinstance(item, TextContent))
             return ToolResult(output=content_str or "No output returned.")
+        except asyncio.TimeoutError:
+            return ToolResult(
+                error=f"Tool {self.original_name} timed out, the call was cancelled"
+            )
         except Exception as e:
             return ToolResult(error=f"Error executing tool: {str(e)}")
 
 
+class MCPToolCatalogCache:
+    """Tool catalogs of MCP servers cached on disk, keyed by server config hash.
+
+    An agent can offer a server's tools from the cache before the live handshake
+    finishes; the handshake then refreshes the cached catalog.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    @staticmethod
+    def config_key(server_config: Dict[str, Any]) -> str:
+        """Hash of a server's connection config."""
+        return hashlib.sha256(
+            json.dumps(server_config, sort_keys=True).encode()).hexdigest()[:32]
+
+    def _path(self, server_config: Dict[str, Any]) -> Path:
+        return self.cache_dir / f"{self.config_key(server_config)}.json"
+
+    def load(self, server_config: Dict[str, Any]) -> Optional[List[Dict]]:
+        """Returns the cached tools of a server, None if there are none."""
+        try:
+            return json.loads(
+                self._path(server_config).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, server_config: Dict[str, Any], tools: List[Dict]) -> None:
+        """Caches the tools of a server, written atomically."""
+        path = self._path(server_config)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(tools), encoding="utf-8")
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning(f"Failed to cache MCP tool catalog: {e}")
+
+
 class MCPClients(ToolCollection):
     """
     A collection of tools that connects to multiple MCP servers and manages available tools through the Model Context Protocol.
+
+    Each connection is owned by its own task, which enters the transport and
+    session contexts, keeps them open and closes them again on disconnect, so
+    servers connect concurrently and a slow server never delays the others.
     """
 
     sessions: Dict[str, ClientSession] = {}
-    exit_stacks: Dict[str, AsyncExitStack] = {}
     description: str = "MCP client tools for server interaction"
 
-    def __init__(self):
+    def __init__(self,
+                 catalog_cache: Optional[MCPToolCatalogCache] = None,
+                 max_in_flight: int = 8,
+                 call_timeout: Optional[float] = None,
+                 coalesce_calls: bool = False):
         super().__init__()  # Initialize with empty tools list
         self.name = "mcp"  # Keep name for backward compatibility
+        self.sessions = {}
+        self.multiplexers: Dict[str, MCPRequestMultiplexer] = {}
+        self.catalog_cache = catalog_cache
+        self.max_in_flight = max_in_flight
+        self.call_timeout = call_timeout
+        self.coalesce_calls = coalesce_calls
+        # Incremented whenever tools are added or removed
+        self.tools_version = 0
+        self._connections: Dict[str, asyncio.Task] = {}
+        self._ready: Dict[str, asyncio.Future] = {}
+        self._stop_events: Dict[str, asyncio.Event] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Optional[MCPSettings]) -> "MCPClients":
+        """Creates the clients from the MCP settings."""
+        settings = settings or MCPSettings()
+        return cls(
+            catalog_cache=MCPToolCatalogCache(settings.catalog_cache_dir)
+            if settings.catalog_cache_dir else None,
+            max_in_flight=settings.max_in_flight,
+            call_timeout=settings.call_timeout,
+            coalesce_calls=settings.coalesce_calls,
+        )
+
+    async def connect_sse(self,
+                          server_url: str,
+                          server_id: str = "",
+                          timeout: Optional[float] = None) -> None:
+        """Connect to an MCP server using SSE transport.
 
-    async def connect_sse(self, server_url: str, server_id: str = "") -> None:
-        """Connect to an MCP server using SSE transport."""
+        Raises asyncio.TimeoutError if the handshake takes longer than timeout,
+        the connection then continues in the background.
+        """
         if not server_url:
             raise ValueError("Server URL is required.")
 
         server_id = server_id or server_url
-
-        # Always ensure clean disconnection before new connection
-        if server_id in self.sessions:
-            await self.disconnect(server_id)
-
-        exit_stack = AsyncExitStack()
-        self.exit_stacks[server_id] = exit_stack
-
-        streams_context = sse_client(url=server_url)
-        streams = await exit_stack.enter_async_context(streams_context)
-        session = await exit_stack.enter_async_context(ClientSession(*streams))
-        self.sessions[server_id] = session
-
-        await self._initialize_and_list_tools(server_id)
+        await self._connect(server_id, {
+            "type": "sse",
+            "url": server_url
+        }, lambda: sse_client(url=server_url), timeout)
 
     async def connect_stdio(self,
                             command: str,
                             args: List[str],
-                            server_id: str = "") -> None:
-        """Connect to an MCP server using stdio transport."""
+                            server_id: str = "",
+                            timeout: Optional[float] = None) -> None:
+        """Connect to an MCP server using stdio transport.
+
+        Raises asyncio.TimeoutError if the handshake takes longer than timeout,
+        the connection then continues in the background.
+        """
         if not command:
             raise ValueError("Server command is required.")
 
         server_id = server_id or command
-
+        server_params = StdioServerParameters(command=command, args=args)
+        await self._connect(server_id, {
+            "type": "stdio",
+            "command": command,
+            "args": args
+        }, lambda: stdio_client(server_params), timeout)
+
+    async def _connect(self, server_id: str, server_config: Dict[str, Any],
+                       open_transport: Callable,
+                       timeout: Optional[float]) -> None:
+        """Starts a server's connection task and waits for its handshake."""
         # Always ensure clean disconnection before new connection
-        if server_id in self.sessions:
+        if server_id in self._connections:
             await self.disconnect(server_id)
 
-        exit_stack = AsyncExitStack()
-        self.exit_stacks[server_id] = exit_stack
-
-        server_params = StdioServerParameters(command=command, args=args)
-        stdio_transport = await exit_stack.enter_async_context(
-            stdio_client(server_params))
-        read, write = stdio_transport
-        session = await exit_stack.enter_async_context(
-            ClientSession(read, write))
-        self.sessions[server_id] = session
-
-        await self._initialize_and_list_tools(server_id)
-
-    async def _initialize_and_list_tools(self, server_id: str) -> None:
+        ready = asyncio.get_running_loop().create_future()
+        # A failed handshake is reported by the connect call, or not at all
+        ready.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._ready[server_id] = ready
+        self._stop_events[server_id] = asyncio.Event()
+
+        if self.catalog_cache:
+            cached_tools = self.catalog_cache.load(server_config)
+            if cached_tools:
+                self._register_tools(server_id, None, cached_tools)
+                logger.info(
+                    f"Using cached tools of MCP server {server_id} while it connects"
+                )
+
+        self._connections[server_id] = asyncio.create_task(
+            self._run_connection(server_id, server_config, open_transport))
+        await asyncio.wait_for(asyncio.shield(ready), timeout)
+
+    async def _run_connection(self, server_id: str,
+                              server_config: Dict[str, Any],
+                              open_transport: Callable) -> None:
+        """Holds a server connection open until disconnect."""
+        ready = self._ready[server_id]
+        try:
+            async with AsyncExitStack() as exit_stack:
+                streams = await exit_stack.enter_async_context(
+                    open_transport())
+                session = await exit_stack.enter_async_context(
+                    ClientSession(*streams))
+                self.sessions[server_id] = session
+                self.multiplexers[server_id] = MCPRequestMultiplexer(
+                    session,
+                    max_in_flight=self.max_in_flight,
+                    call_timeout=self.call_timeout,
+                    coalesce_calls=self.coalesce_calls,
+                )
+
+                await self._initialize_and_list_tools(server_id,
+                                                      server_config)
+                ready.set_result(None)
+                await self._stop_events[server_id].wait()
+        except Exception as e:
+            # Report the transport's error rather than its task group
+            while isinstance(e, ExceptionGroup) and len(e.exceptions) == 1:
+                e = e.exceptions[0]
+            if not ready.done():
+                ready.set_exception(e)
+                self._remove_tools(server_id)
+            else:
+                logger.error(f"Connection to MCP server {server_id} lost: {e}")
+        finally:
+            if not ready.done():
+                ready.cancel()
+            if self._ready.get(server_id) is ready:
+                self.sessions.pop(server_id, None)
+                self.multiplexers.pop(server_id, None)
+                for tool in self.tool_map.values():
+                    if tool.server_id == server_id:
+                        tool.session = None
+                        tool.multiplexer = None
+
+    async def _initialize_and_list_tools(
+            self,
+            server_id: str,
+            server_config: Optional[Dict[str, Any]] = None) -> None:
         """Initialize session and populate tool map."""
         session = self.sessions.get(server_id)
         if not session:
@@ -104,66 +468,121 @@ class MCPClients(ToolCollection):
         await session.initialize()
         response = await session.list_tools()
 
-        # Create proper tool objects for each server tool
-        for tool in response.tools:
-            original_name = tool.name
+        tools = [{
+            "name": tool.name,
+            "description": tool.description,
+            "inputSchema": tool.inputSchema,
+        } for tool in response.tools]
+        self._register_tools(server_id, session, tools)
+        if self.catalog_cache and server_config:
+            self.catalog_cache.save(server_config, tools)
+        logger.info(
+            f"Connected to server {server_id} with tools: {[tool.name for tool in response.tools]}"
+        )
+
+    def _register_tools(self, server_id: str,
+                        session: Optional[ClientSession],
+                        tools: List[Dict]) -> None:
+        """Creates or updates the tool proxies of a server.
+
+        Proxies are updated in place, so collections holding them, such as an
+        agent's available tools, see the live session once it is connected.
+        """
+        multiplexer = self.multiplexers.get(server_id) if session else None
+        names = set()
+        for tool in tools:
+            original_name = tool["name"]
             # Always prefix with server_id to ensure uniqueness
             tool_name = f"mcp_{server_id}_{original_name}"
-
-            server_tool = MCPClientTool(
+            names.add(tool_name)
+
+            server_tool = self.tool_map.get(tool_name)
+            if isinstance(server_tool, MCPClientTool):
+                server_tool.description = tool["description"]
+                server_tool.parameters = tool["inputSchema"]
+                server_tool.session = session
+                server_tool.multiplexer = multiplexer
+                continue
+
+            # Create proper tool objects for each server tool
+            self.tool_map[tool_name] = MCPClientTool(
                 name=tool_name,
-                description=tool.description,
-                parameters=tool.inputSchema,  # 还是要把MCP协议的参数解析出来
+                description=tool["description"],
+                parameters=tool["inputSchema"],  # 还是要把MCP协议的参数解析出来
                 session=session,
+                multiplexer=multiplexer,
                 server_id=server_id,
                 original_name=original_name,
+                connection=self._ready.get(server_id),
             )
-            self.tool_map[tool_name] = server_tool
 
+        # Tools the live server no longer offers
+        self.tool_map = {
+            k: v
+            for k, v in self.tool_map.items()
+            if v.server_id != server_id or k in names
+        }
         # Update tools tuple
         self.tools = tuple(self.tool_map.values())
-        logger.info(
-            f"Connected to server {server_id} with tools: {[tool.name for tool in response.tools]}"
-        )
+        self.tools_version += 1
+
+    def _remove_tools(self, server_id: str) -> None:
+        """Remove tools associated with a server."""
+        self.tool_map = {
+            k: v
+            for k, v in self.tool_map.items() if v.server_id != server_id
+        }
+        self.tools = tuple(self.tool_map.values())
+        self.tools_version += 1
+
+    def is_connected(self, server_id: str) -> bool:
+        """Whether a server finished its handshake and is still connected."""
+        ready = self._ready.get(server_id)
+        return server_id in self.sessions and ready is not None and ready.done()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Gets the call statistics of each connected server."""
+        return {
+            server_id: multiplexer.get_stats()
+            for server_id, multiplexer in self.multiplexers.items()
+        }
 
     async def disconnect(self, server_id: str = "") -> None:
         """Disconnect from a specific MCP server or all servers if no server_id provided."""
         if server_id:
-            if server_id in self.sessions:
+            if server_id in self._connections:
                 try:
-                    exit_stack = self.exit_stacks.get(server_id)
-
-                    # Close the exit stack which will handle session cleanup
-                    if exit_stack:
-                        try:
-                            await exit_stack.aclose()
-                        except RuntimeError as e:
-                            if "cancel scope" in str(e).lower():
-                                logger.warning(
-                                    f"Cancel scope error during disconnect from {server_id}, continuing with cleanup: {e}"
-                                )
-                            else:
-                                raise
+                    task = self._connections.pop(server_id)
+                    ready = self._ready.get(server_id)
+                    if ready is not None and ready.done():
+                        # The connection task closes its own contexts
+                        self._stop_events[server_id].set()
+                    else:
+                        task.cancel()
+                    try:
+                        await task
+                    except (asyncio.CancelledError, Exception) as e:
+                        if not isinstance(e, asyncio.CancelledError):
+                            logger.warning(
+                                f"Error closing connection to {server_id}, continuing with cleanup: {e}"
+                            )
 
                     # Clean up references
                     self.sessions.pop(server_id, None)
-                    self.exit_stacks.pop(server_id, None)
-
-                    # Remove tools associated with this server
-                    self.tool_map = {
-                        k: v
-                        for k, v in self.tool_map.items()
-                        if v.server_id != server_id
-                    }
-                    self.tools = tuple(self.tool_map.values())
+                    self.multiplexers.pop(server_id, None)
+                    self._ready.pop(server_id, None)
+                    self._stop_events.pop(server_id, None)
+
+                    self._remove_tools(server_id)
                     logger.info(f"Disconnected from MCP server {server_id}")
                 except Exception as e:
                     logger.error(
                         f"Error disconnecting from server {server_id}: {e}")
         else:
             # Disconnect from all servers in a deterministic order
-            for sid in sorted(list(self.sessions.keys())):
+            for sid in sorted(list(self._connections.keys())):
                 await self.disconnect(sid)
             self.tool_map = {}
             self.tools = tuple()
+            self.tools_version += 1
             logger.info("Disconnected from all MCP servers")
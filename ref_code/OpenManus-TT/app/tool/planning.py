@@ -48,6 +48,13 @@ class PlanningTool(BaseTool):
                 "type": "array",
                 "items": {"type": "string"},
             },
+            "dependencies": {
+                "description": "Dependencies of each step, dependencies[i] lists the indices of earlier steps that must be completed before step i starts. "
+                "Steps without dependencies on each other can run in parallel. Optional for create and update commands, "
+                "if omitted each step depends on the previous one.",
+                "type": "array",
+                "items": {"type": "array", "items": {"type": "integer"}},
+            },
             "step_index": {
                 "description": "Index of the step to update (0-based). Required for mark_step command.",
                 "type": "integer",
@@ -78,6 +85,7 @@ class PlanningTool(BaseTool):
         plan_id: Optional[str] = None,
         title: Optional[str] = None,
         steps: Optional[List[str]] = None,
+        dependencies: Optional[List[List[int]]] = None,
         step_index: Optional[int] = None,
         step_status: Optional[
             Literal["not_started", "in_progress", "completed", "blocked"]
@@ -93,15 +101,16 @@ class PlanningTool(BaseTool):
         - plan_id: Unique identifier for the plan
         - title: Title for the plan (used with create command)
         - steps: List of steps for the plan (used with create command)
+        - dependencies: Indices of the steps each step depends on (used with create and update commands)
         - step_index: Index of the step to update (used with mark_step command)
         - step_status: Status to set for a step (used with mark_step command)
         - step_notes: Additional notes for a step (used with mark_step command)
         """
 
         if command == "create":
-            return self._create_plan(plan_id, title, steps)
+            return self._create_plan(plan_id, title, steps, dependencies)
         elif command == "update":
-            return self._update_plan(plan_id, title, steps)
+            return self._update_plan(plan_id, title, steps, dependencies)
         elif command == "list":
             return self._list_plans()
         elif command == "get":
@@ -118,9 +127,13 @@ class PlanningTool(BaseTool):
             )
 
     def _create_plan(
-        self, plan_id: Optional[str], title: Optional[str], steps: Optional[List[str]]
+        self,
+        plan_id: Optional[str],
+        title: Optional[str],
+        steps: Optional[List[str]],
+        dependencies: Optional[List[List[int]]] = None,
     ) -> ToolResult:
-        """Create a new plan with the given ID, title, and steps."""
+        """Create a new plan with the given ID, title, steps and step dependencies."""
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: create")
 
@@ -141,6 +154,9 @@ class PlanningTool(BaseTool):
                 "Parameter `steps` must be a non-empty list of strings for command: create"
             )
 
+        if dependencies is not None:
+            self._validate_dependencies(dependencies, len(steps))
+
         # Create a new plan with initialized step statuses
         plan = {
             "plan_id": plan_id,
@@ -148,6 +164,7 @@ class PlanningTool(BaseTool):
             "steps": steps,
             "step_statuses": ["not_started"] * len(steps),
             "step_notes": [""] * len(steps),
+            "step_dependencies": dependencies,
         }
 
         self.plans[plan_id] = plan
@@ -158,9 +175,13 @@ class PlanningTool(BaseTool):
         )
 
     def _update_plan(
-        self, plan_id: Optional[str], title: Optional[str], steps: Optional[List[str]]
+        self,
+        plan_id: Optional[str],
+        title: Optional[str],
+        steps: Optional[List[str]],
+        dependencies: Optional[List[List[int]]] = None,
     ) -> ToolResult:
-        """Update an existing plan with new title or steps."""
+        """Update an existing plan with new title, steps or step dependencies."""
         if not plan_id:
             raise ToolError("Parameter `plan_id` is required for command: update")
 
@@ -201,11 +222,35 @@ class PlanningTool(BaseTool):
             plan["steps"] = steps
             plan["step_statuses"] = new_statuses
             plan["step_notes"] = new_notes
+            # Dependencies given for the old steps may not fit the new ones
+            if dependencies is None:
+                plan["step_dependencies"] = None
+
+        if dependencies is not None:
+            self._validate_dependencies(dependencies, len(plan["steps"]))
+            plan["step_dependencies"] = dependencies
 
         return ToolResult(
             output=f"Plan updated successfully: {plan_id}\n\n{self._format_plan(plan)}"
         )
 
+    @staticmethod
+    def _validate_dependencies(dependencies: List[List[int]], step_count: int) -> None:
+        """Check that there is one dependency list per step and that every step
+        only depends on earlier steps, which also rules out cycles."""
+        if not isinstance(dependencies, list) or len(dependencies) != step_count:
+            raise ToolError(
+                f"Parameter `dependencies` must be a list with one list of step indices per step ({step_count} steps)"
+            )
+
+        for i, step_dependencies in enumerate(dependencies):
+            if not isinstance(step_dependencies, list) or not all(
+                isinstance(index, int) and 0 <= index < i for index in step_dependencies
+            ):
+                raise ToolError(
+                    f"Invalid dependencies for step {i}: {step_dependencies}. A step can only depend on earlier steps (indices 0 to {i-1})."
+                )
+
     def _list_plans(self) -> ToolResult:
         """List all available plans."""
         if not self.plans:
@@ -345,7 +390,8 @@ class PlanningTool(BaseTool):
         output += f"Status: {completed} completed, {in_progress} in progress, {blocked} blocked, {not_started} not started\n\n"
         output += "Steps:\n"
 
-        # Add each step with its status and notes
+        # Add each step with its status, notes and dependencies
+        dependencies = plan.get("step_dependencies")
         for i, (step, status, notes) in enumerate(
             zip(plan["steps"], plan["step_statuses"], plan["step_notes"])
         ):
@@ -357,6 +403,8 @@ class PlanningTool(BaseTool):
             }.get(status, "[ ]")
 
             output += f"{i}. {status_symbol} {step}\n"
+            if dependencies and dependencies[i]:
+                output += f"   Depends on: {', '.join(map(str, dependencies[i]))}\n"
             if notes:
                 output += f"   Notes: {notes}\n"
 
@@ -1,16 +1,257 @@
-import multiprocessing
+import asyncio
+import json
+import signal
 import sys
-from io import StringIO
-from typing import Dict
+import uuid
+from collections import OrderedDict
+from typing import ClassVar, Dict, List, Optional
 
+from pydantic import Field, PrivateAttr
+
+from app.logger import logger
 from app.tool.base import BaseTool
 
 
+# Source of the kernel process. It applies the memory limit, imports the warm
+# modules, then executes one request per stdin line in a namespace that lives as
+# long as the process; the CPU limit applies to each request on its own. User
+# output goes straight to the stdout/stderr pipes; after each request both
+# streams get the request's end marker, and stdout also gets a JSON status line.
+_KERNEL_SOURCE = """
+import builtins, importlib, io, json, math, os, signal, sys, traceback
+
+settings = json.loads(sys.argv[1])
+try:
+    import resource
+except ImportError:
+    resource = None
+if resource is not None and settings["memory_limit"]:
+    resource.setrlimit(resource.RLIMIT_AS, (settings["memory_limit"],) * 2)
+cpu_limit = settings["cpu_limit"] if resource is not None else None
+
+
+class CPULimitExceeded(BaseException):
+    pass
+
+
+executing = False
+
+
+def on_cpu_limit(signum, frame):
+    # Only the request's code is stopped, a late signal after it finished is ignored
+    if executing:
+        raise CPULimitExceeded()
+
+
+def limit_cpu(seconds):
+    # RLIMIT_CPU counts the whole process, so each request gets its limit on top
+    # of the CPU time used so far; None lifts the limit between requests
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    soft = hard
+    if seconds is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime) + seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+if cpu_limit:
+    signal.signal(signal.SIGXCPU, on_cpu_limit)
+for module in settings["warm_modules"]:
+    try:
+        importlib.import_module(module)
+    except Exception as e:
+        print(f"Failed to import warm module {module}: {e}", file=sys.stderr)
+
+requests = sys.stdin
+namespace = {"__name__": "__main__", "__builtins__": builtins}
+
+while True:
+    try:
+        line = requests.readline()
+        if not line:
+            break
+        request = json.loads(line)
+        # Code reading stdin gets EOF instead of the next request
+        sys.stdin = io.StringIO()
+        if cpu_limit:
+            limit_cpu(cpu_limit)
+        executing = True
+        try:
+            exec(compile(request["code"], "<python_execute>", "exec"), namespace)
+            executing = False
+            status = {"success": True}
+        except KeyboardInterrupt:
+            status = {"success": False, "error": "Execution interrupted"}
+        except CPULimitExceeded:
+            status = {
+                "success": False,
+                "error": f"CPU time limit of {cpu_limit} seconds exceeded",
+            }
+        except BaseException as e:
+            status = {
+                "success": False,
+                "error": "".join(traceback.format_exception_only(type(e), e)).strip(),
+            }
+        finally:
+            executing = False
+            if cpu_limit:
+                limit_cpu(None)
+        sys.stdout.flush()
+        sys.stderr.write(request["marker"])
+        sys.stderr.flush()
+        sys.stdout.write(request["marker"] + json.dumps(status) + "\\n")
+        sys.stdout.flush()
+    except KeyboardInterrupt:
+        # An interrupt that arrived between requests, nothing to cancel
+        continue
+"""
+
+
+class _PythonKernel:
+    """A persistent Python process keeping its globals between executions."""
+
+    def __init__(
+        self,
+        warm_modules: List[str],
+        memory_limit: Optional[int] = None,
+        cpu_limit: Optional[int] = None,
+    ):
+        self.warm_modules = warm_modules
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self) -> None:
+        settings = {
+            "warm_modules": self.warm_modules,
+            "memory_limit": self.memory_limit,
+            "cpu_limit": self.cpu_limit,
+        }
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-u",
+            "-c",
+            _KERNEL_SOURCE,
+            json.dumps(settings),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+    async def execute(self, code: str, timeout: float, interrupt_grace: float) -> Dict:
+        """Runs code in the kernel, interrupting and then killing it on timeout."""
+        async with self._lock:
+            if not self.alive:
+                await self.start()
+
+            marker = f"<<done-{uuid.uuid4().hex}>>"
+            self._process.stdin.write(
+                (json.dumps({"code": code, "marker": marker}) + "\n").encode()
+            )
+            await self._process.stdin.drain()
+
+            stdout = bytearray()
+            stderr = bytearray()
+            reads = asyncio.gather(
+                self._read_until(self._process.stdout, marker, stdout, status=True),
+                self._read_until(self._process.stderr, marker, stderr),
+            )
+            timed_out = False
+            try:
+                status, _ = await asyncio.wait_for(asyncio.shield(reads), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                # Interrupt first so the kernel and its state survive the timeout
+                self._process.send_signal(signal.SIGINT)
+                try:
+                    await asyncio.wait_for(reads, interrupt_grace)
+                except (asyncio.TimeoutError, ConnectionError):
+                    reads.cancel()
+                    await self.kill()
+                    return {
+                        "observation": f"Execution timeout after {timeout} seconds, "
+                        "the Python session was restarted and its state was lost",
+                        "success": False,
+                    }
+            except ConnectionError:
+                reads.cancel()
+                await self.kill()
+                output = self._format_output(stdout, stderr)
+                return {
+                    "observation": f"{output}Python process exited unexpectedly, "
+                    "the Python session was restarted and its state was lost",
+                    "success": False,
+                }
+
+        output = self._format_output(stdout, stderr)
+        if timed_out:
+            return {
+                "observation": f"{output}Execution timeout after {timeout} seconds",
+                "success": False,
+            }
+        if status["success"]:
+            return {"observation": output, "success": True}
+        return {"observation": output + status["error"], "success": False}
+
+    @staticmethod
+    async def _read_until(
+        stream: asyncio.StreamReader,
+        marker: str,
+        buffer: bytearray,
+        status: bool = False,
+    ) -> Optional[Dict]:
+        """Collects stream output into buffer until the marker.
+
+        If status is set, also parses the JSON status line that follows the marker.
+        """
+        marker = marker.encode()
+        searched = 0
+        while True:
+            index = buffer.find(marker, searched)
+            if index != -1:
+                end = buffer.find(b"\n", index) if status else index
+                if end != -1:
+                    break
+            else:
+                searched = max(0, len(buffer) - len(marker) + 1)
+            chunk = await stream.read(65536)
+            if not chunk:
+                raise ConnectionError("Python process exited")
+            buffer += chunk
+
+        result = json.loads(buffer[index + len(marker) : end]) if status else None
+        del buffer[index:]
+        return result
+
+    @staticmethod
+    def _format_output(stdout: bytearray, stderr: bytearray) -> str:
+        output = stdout.decode("utf-8", errors="replace")
+        error = stderr.decode("utf-8", errors="replace")
+        return output + error
+
+    async def kill(self) -> None:
+        if self.alive:
+            self._process.kill()
+            await self._process.wait()
+        self._process = None
+
+
 class PythonExecute(BaseTool):
-    """A tool for executing Python code with timeout and safety restrictions."""
+    """A tool for executing Python code with timeout and safety restrictions.
+
+    Code runs in persistent kernel processes, one per session, so variables,
+    imports and loaded data are kept between calls.
+    """
 
     name: str = "python_execute"
-    description: str = "Executes Python code string. Note: Only print outputs are visible, function return values are not captured. Use print statements to see results."
+    description: str = "Executes Python code string. Note: Only print outputs are visible, function return values are not captured. Use print statements to see results. Variables, imports and loaded data persist between calls."
     parameters: dict = {
         "type": "object",
         "properties": {
@@ -22,24 +263,46 @@ class PythonExecute(BaseTool):
         "required": ["code"],
     }
 
-    def _run_code(self, code: str, result_dict: dict, safe_globals: dict) -> None:
-        original_stdout = sys.stdout
-        try:
-            output_buffer = StringIO()
-            sys.stdout = output_buffer
-            exec(code, safe_globals, safe_globals)
-            result_dict["observation"] = output_buffer.getvalue()
-            result_dict["success"] = True
-        except Exception as e:
-            result_dict["observation"] = str(e)
-            result_dict["success"] = False
-        finally:
-            sys.stdout = original_stdout
+    warm_modules: List[str] = Field(
+        default_factory=list,
+        description="Modules imported when a kernel starts, so the first import in code is instant",
+    )
+    memory_limit: Optional[int] = Field(
+        default=None, description="Address space limit of each kernel in bytes"
+    )
+    cpu_limit: Optional[int] = Field(
+        default=None, description="CPU time limit of each execution in seconds"
+    )
+    max_kernels: int = Field(
+        default=4, description="Kernels kept alive, the least recently used is stopped"
+    )
+
+    # Seconds to wait after interrupting a timed out execution before killing it
+    interrupt_grace: ClassVar[float] = 2.0
+
+    _kernels: "OrderedDict[str, _PythonKernel]" = PrivateAttr(
+        default_factory=OrderedDict
+    )
+
+    async def _get_kernel(self, session_id: str) -> _PythonKernel:
+        kernel = self._kernels.get(session_id)
+        if kernel is None:
+            kernel = _PythonKernel(self.warm_modules, self.memory_limit, self.cpu_limit)
+            await kernel.start()
+            self._kernels[session_id] = kernel
+            while len(self._kernels) > self.max_kernels:
+                evicted_id, evicted = self._kernels.popitem(last=False)
+                logger.info(f"Stopping idle Python kernel for session {evicted_id}")
+                await evicted.kill()
+        self._kernels.move_to_end(session_id)
+        return kernel
 
     async def execute(
         self,
         code: str,
         timeout: int = 5,
+        session_id: str = "default",
+        restart: bool = False,
     ) -> Dict:
         """
         Executes the provided Python code with a timeout.
@@ -47,29 +310,25 @@ class PythonExecute(BaseTool):
         Args:
             code (str): The Python code to execute.
             timeout (int): Execution timeout in seconds.
+            session_id (str): Kernel to run in, each session has its own globals.
+            restart (bool): Whether to discard the session's state first.
 
         Returns:
             Dict: Contains 'output' with execution output or error message and 'success' status.
         """
+        if restart:
+            await self.restart(session_id)
+        kernel = await self._get_kernel(session_id)
+        return await kernel.execute(code, timeout, self.interrupt_grace)
 
-        with multiprocessing.Manager() as manager:
-            result = manager.dict({"observation": "", "success": False})
-            if isinstance(__builtins__, dict):
-                safe_globals = {"__builtins__": __builtins__}
-            else:
-                safe_globals = {"__builtins__": __builtins__.__dict__.copy()}
-            proc = multiprocessing.Process(
-                target=self._run_code, args=(code, result, safe_globals)
-            )
-            proc.start()
-            proc.join(timeout)
+    async def restart(self, session_id: str = "default") -> None:
+        """Stops the session's kernel, the next execution starts a fresh one."""
+        kernel = self._kernels.pop(session_id, None)
+        if kernel:
+            await kernel.kill()
 
-            # timeout process
-            if proc.is_alive():
-                proc.terminate()
-                proc.join(1)
-                return {
-                    "observation": f"Execution timeout after {timeout} seconds",
-                    "success": False,
-                }
-            return dict(result)
+    async def cleanup(self) -> None:
+        """Stops all kernels."""
+        while self._kernels:
+            _, kernel = self._kernels.popitem()
+            await kernel.kill()
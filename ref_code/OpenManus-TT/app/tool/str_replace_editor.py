@@ -1,8 +1,19 @@
 """File and directory manipulation tool with sandbox support."""
 
-from collections import defaultdict
+import hashlib
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
 from pathlib import Path
-from typing import Any, DefaultDict, List, Literal, Optional, get_args
+from typing import (
+    Any,
+    DefaultDict,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Tuple,
+    get_args,
+)
 
 from app.config import config
 from app.exceptions import ToolError
@@ -27,6 +38,7 @@ Command = Literal[
 # Constants
 SNIPPET_LINES: int = 4
 MAX_RESPONSE_LEN: int = 16000
+FILE_CACHE_CHARS: int = 32 * 1024 * 1024  # Total size of the cached file contents
 TRUNCATED_MESSAGE: str = (
     "<response clipped><NOTE>To save on context only part of this file has been shown to you. "
     "You should retry this tool after you have searched inside the file with `grep -n` "
@@ -57,6 +69,79 @@ def maybe_truncate(
     return content[:truncate_after] + TRUNCATED_MESSAGE
 
 
+def _checksum(content: str) -> str:
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+class _CachedFile:
+    """File content with the offsets of its line starts, built on first use."""
+
+    def __init__(self, content: str, version: Optional[str]):
+        self.content = content
+        self.version = version
+        self._line_starts: Optional[List[int]] = None
+
+    @staticmethod
+    def _find_line_starts(text: str, offset: int = 0) -> List[int]:
+        """Offsets (shifted by offset) of the lines starting after a newline in text."""
+        starts = []
+        index = text.find("\n")
+        while index != -1:
+            starts.append(offset + index + 1)
+            index = text.find("\n", index + 1)
+        return starts
+
+    @property
+    def line_starts(self) -> List[int]:
+        if self._line_starts is None:
+            self._line_starts = [0] + self._find_line_starts(self.content)
+        return self._line_starts
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_starts)
+
+    def line_of(self, offset: int) -> int:
+        """Return the 0-based line containing the character at offset."""
+        return bisect_right(self.line_starts, offset) - 1
+
+    def get_lines(self, start: int, end: int = -1) -> str:
+        """Return 1-based lines start to end inclusive, end -1 meaning the last line."""
+        line_starts = self.line_starts
+        begin = line_starts[start - 1]
+        if end == -1 or end >= len(line_starts):
+            return self.content[begin:]
+        return self.content[begin : line_starts[end] - 1]
+
+    def replace(self, start: int, end: int, text: str) -> None:
+        """Replace content[start:end] with text, updating the line index in place."""
+        self.content = self.content[:start] + text + self.content[end:]
+        if self._line_starts is None:
+            return
+
+        # Line starts inside the replaced range are dropped, later ones are shifted
+        line_starts = self._line_starts
+        first = bisect_right(line_starts, start)
+        last = bisect_right(line_starts, end)
+        shift = len(text) - (end - start)
+        line_starts[first:] = self._find_line_starts(text, start) + [
+            line_start + shift for line_start in line_starts[last:]
+        ]
+
+
+class _ReverseEdit(NamedTuple):
+    """Undoes an edit by replacing content[start:end] with text.
+
+    checksum is the checksum of the content the edit produced, the reverse edit
+    only applies to that content.
+    """
+
+    start: int
+    end: int
+    text: str
+    checksum: str
+
+
 class StrReplaceEditor(BaseTool):
     """A tool for viewing, creating, and editing files with sandbox support."""
 
@@ -98,7 +183,8 @@ class StrReplaceEditor(BaseTool):
         },
         "required": ["command", "path"],
     }
-    _file_history: DefaultDict[PathLike, List[str]] = defaultdict(list)
+    _file_history: DefaultDict[PathLike, List[_ReverseEdit]] = defaultdict(list)
+    _file_cache: "OrderedDict[str, _CachedFile]" = OrderedDict()
     _local_operator: LocalFileOperator = LocalFileOperator()
     _sandbox_operator: SandboxFileOperator = SandboxFileOperator()
 
@@ -136,8 +222,11 @@ class StrReplaceEditor(BaseTool):
         elif command == "create":
             if file_text is None:
                 raise ToolError("Parameter `file_text` is required for command: create")
-            await operator.write_file(path, file_text)
-            self._file_history[path].append(file_text)
+            await self._write_file(path, _CachedFile(file_text, None), operator)
+            # Undoing the creation restores the created content, as before any edit
+            self._file_history[path].append(
+                _ReverseEdit(0, 0, "", _checksum(file_text))
+            )
             result = ToolResult(output=f"File created successfully at: {path}")
         elif command == "str_replace":
             if old_str is None:
@@ -239,7 +328,8 @@ class StrReplaceEditor(BaseTool):
     ) -> CLIResult:
         """Display file content, optionally within a specified line range."""
         # Read file content
-        file_content = await operator.read_file(path)
+        cached = await self._read_file(path, operator)
+        file_content = cached.content
         init_line = 1
 
         # Apply view range if specified
@@ -249,8 +339,7 @@ class StrReplaceEditor(BaseTool):
                     "Invalid `view_range`. It should be a list of two integers."
                 )
 
-            file_lines = file_content.split("\n")
-            n_lines_file = len(file_lines)
+            n_lines_file = cached.line_count
             init_line, final_line = view_range
 
             # Validate view range
@@ -270,11 +359,8 @@ class StrReplaceEditor(BaseTool):
                     f"larger or equal than its first `{init_line}`"
                 )
 
-            # Apply range
-            if final_line == -1:
-                file_content = "\n".join(file_lines[init_line - 1 :])
-            else:
-                file_content = "\n".join(file_lines[init_line - 1 : final_line])
+            # Apply range using the line index
+            file_content = cached.get_lines(init_line, final_line)
 
         # Format and return result
         return CLIResult(
@@ -290,17 +376,18 @@ class StrReplaceEditor(BaseTool):
     ) -> CLIResult:
         """Replace a unique string in a file with a new string."""
         # Read file content and expand tabs
-        file_content = (await operator.read_file(path)).expandtabs()
+        cached, original = await self._read_expanded(path, operator)
+        file_content = cached.content
         old_str = old_str.expandtabs()
         new_str = new_str.expandtabs() if new_str is not None else ""
 
         # Check if old_str is unique in the file
-        occurrences = file_content.count(old_str)
-        if occurrences == 0:
+        index = file_content.find(old_str)
+        if index == -1:
             raise ToolError(
                 f"No replacement was performed, old_str `{old_str}` did not appear verbatim in {path}."
             )
-        elif occurrences > 1:
+        elif file_content.find(old_str, index + max(len(old_str), 1)) != -1:
             # Find line numbers of occurrences
             file_content_lines = file_content.split("\n")
             lines = [
@@ -313,20 +400,18 @@ class StrReplaceEditor(BaseTool):
                 f"in lines {lines}. Please ensure it is unique"
             )
 
-        # Replace old_str with new_str
-        new_file_content = file_content.replace(old_str, new_str)
+        # Replace old_str with new_str and write the new content to the file
+        replacement_line = cached.line_of(index)
+        cached.replace(index, index + len(old_str), new_str)
+        await self._write_file(path, cached, operator)
 
-        # Write the new content to the file
-        await operator.write_file(path, new_file_content)
-
-        # Save the original content to history
-        self._file_history[path].append(file_content)
+        # Save the reverse of the edit to history
+        self._record_edit(path, cached, index, index + len(new_str), old_str, original)
 
         # Create a snippet of the edited section
-        replacement_line = file_content.split(old_str)[0].count("\n")
         start_line = max(0, replacement_line - SNIPPET_LINES)
         end_line = replacement_line + SNIPPET_LINES + new_str.count("\n")
-        snippet = "\n".join(new_file_content.split("\n")[start_line : end_line + 1])
+        snippet = cached.get_lines(start_line + 1, end_line + 1)
 
         # Prepare the success message
         success_msg = f"The file {path} has been edited. "
@@ -346,10 +431,9 @@ class StrReplaceEditor(BaseTool):
     ) -> CLIResult:
         """Insert text at a specific line in a file."""
         # Read and prepare content
-        file_text = (await operator.read_file(path)).expandtabs()
+        cached, original = await self._read_expanded(path, operator)
         new_str = new_str.expandtabs()
-        file_text_lines = file_text.split("\n")
-        n_lines_file = len(file_text_lines)
+        n_lines_file = cached.line_count
 
         # Validate insert_line
         if insert_line < 0 or insert_line > n_lines_file:
@@ -358,27 +442,26 @@ class StrReplaceEditor(BaseTool):
                 f"the range of lines of the file: {[0, n_lines_file]}"
             )
 
-        # Perform insertion
-        new_str_lines = new_str.split("\n")
-        new_file_text_lines = (
-            file_text_lines[:insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line:]
-        )
+        # Perform insertion, before the line after insert_line or after the last line
+        if insert_line < n_lines_file:
+            offset = cached.line_starts[insert_line]
+            inserted = new_str + "\n"
+        else:
+            offset = len(cached.content)
+            inserted = "\n" + new_str
+        cached.replace(offset, offset, inserted)
 
         # Create a snippet for preview
-        snippet_lines = (
-            file_text_lines[max(0, insert_line - SNIPPET_LINES) : insert_line]
-            + new_str_lines
-            + file_text_lines[insert_line : insert_line + SNIPPET_LINES]
+        snippet = cached.get_lines(
+            max(0, insert_line - SNIPPET_LINES) + 1,
+            min(
+                insert_line + new_str.count("\n") + 1 + SNIPPET_LINES,
+                cached.line_count,
+            ),
         )
 
-        # Join lines and write to file
-        new_file_text = "\n".join(new_file_text_lines)
-        snippet = "\n".join(snippet_lines)
-
-        await operator.write_file(path, new_file_text)
-        self._file_history[path].append(file_text)
+        await self._write_file(path, cached, operator)
+        self._record_edit(path, cached, offset, offset + len(inserted), "", original)
 
         # Prepare success message
         success_msg = f"The file {path} has been edited. "
@@ -398,13 +481,89 @@ class StrReplaceEditor(BaseTool):
         if not self._file_history[path]:
             raise ToolError(f"No edit history found for {path}.")
 
-        old_text = self._file_history[path].pop()
-        await operator.write_file(path, old_text)
+        cached = await self._read_file(path, operator)
+        reverse_edit = self._file_history[path][-1]
+        if _checksum(cached.content) != reverse_edit.checksum:
+            raise ToolError(
+                f"{path} was modified since the last edit, so the edit cannot be undone."
+            )
+
+        self._file_history[path].pop()
+        cached.replace(reverse_edit.start, reverse_edit.end, reverse_edit.text)
+        await self._write_file(path, cached, operator)
+        old_text = cached.content
 
         return CLIResult(
             output=f"Last edit to {path} undone successfully. {self._make_output(old_text, str(path))}"
         )
 
+    async def _read_file(self, path: PathLike, operator: FileOperator) -> _CachedFile:
+        """Read a file through the cache, re-reading it only if its version changed."""
+        key = str(path)
+        version = await operator.get_version(path)
+        if version is None:
+            # Changes cannot be detected, so the file is not cached
+            self._file_cache.pop(key, None)
+            return _CachedFile(await operator.read_file(path), None)
+        cached = self._file_cache.get(key)
+        if cached is None or cached.version != version:
+            cached = _CachedFile(await operator.read_file(path), version)
+            self._cache_file(key, cached)
+        else:
+            self._file_cache.move_to_end(key)
+        return cached
+
+    async def _read_expanded(
+        self, path: PathLike, operator: FileOperator
+    ) -> Tuple[_CachedFile, Optional[str]]:
+        """Read a file through the cache with its tabs expanded, as edits write it.
+
+        Returns the content and, if expanding tabs changed it, the original content.
+        An expanded copy differs from the file, so it is only cached once written.
+        """
+        cached = await self._read_file(path, operator)
+        if "\t" in cached.content:
+            return _CachedFile(cached.content.expandtabs(), None), cached.content
+        return cached, None
+
+    def _record_edit(
+        self,
+        path: PathLike,
+        cached: _CachedFile,
+        start: int,
+        end: int,
+        text: str,
+        original: Optional[str],
+    ) -> None:
+        """Save the reverse of an edit that replaced cached.content[start:end]."""
+        if original is not None:
+            # Tabs were expanded all over the file, restore the whole original
+            start, end, text = 0, len(cached.content), original
+        self._file_history[path].append(
+            _ReverseEdit(start, end, text, _checksum(cached.content))
+        )
+
+    async def _write_file(
+        self, path: PathLike, cached: _CachedFile, operator: FileOperator
+    ) -> None:
+        """Write a file's content and keep it in the cache under its new version."""
+        key = str(path)
+        # Dropped first so a failed write does not leave unwritten content cached
+        self._file_cache.pop(key, None)
+        await operator.write_file(path, cached.content)
+        cached.version = await operator.get_version(path)
+        if cached.version is not None:
+            self._cache_file(key, cached)
+
+    def _cache_file(self, key: str, cached: _CachedFile) -> None:
+        """Add a file to the cache, evicting the least recently used files over the limit."""
+        self._file_cache[key] = cached
+        self._file_cache.move_to_end(key)
+        total = sum(len(entry.content) for entry in self._file_cache.values())
+        while total > FILE_CACHE_CHARS and len(self._file_cache) > 1:
+            _, evicted = self._file_cache.popitem(last=False)
+            total -= len(evicted.content)
+
     def _make_output(
         self,
         file_content: str,
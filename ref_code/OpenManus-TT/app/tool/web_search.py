@@ -1,7 +1,11 @@
 import asyncio
-from typing import Any, Dict, List, Optional
+import re
+import time
+from collections import OrderedDict
+from typing import Any, ClassVar, Dict, List, Optional
+from urllib.parse import urlsplit
 
-import requests
+import httpx
 from bs4 import BeautifulSoup
 from pydantic import BaseModel, ConfigDict, Field, model_validator
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -19,6 +23,16 @@ from app.tool.search import (
 from app.tool.search.base import SearchItem
 
 
+def normalize_url(url: str) -> str:
+    """Normalize a URL for deduplication (scheme, case of host, trailing slash, fragment)."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    return f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+
+
 class SearchResult(BaseModel):
     """Represents a single search result returned by a search engine."""
 
@@ -103,11 +117,178 @@ class SearchResponse(ToolResult):
         return self
 
 
+class EngineHealth(BaseModel):
+    """Rolling health score and circuit breaker for a single search engine."""
+
+    consecutive_failures: int = Field(default=0)
+    open_until: float = Field(
+        default=0.0, description="Monotonic time until which the breaker is open"
+    )
+    success_rate: float = Field(
+        default=1.0, description="Exponentially weighted success rate"
+    )
+    latency: float = Field(
+        default=0.0, description="Exponentially weighted latency of successful searches"
+    )
+
+    # Weight of the newest observation in the moving averages
+    alpha: ClassVar[float] = 0.3
+
+    def is_available(self, now: Optional[float] = None) -> bool:
+        """An engine is available unless its breaker is open."""
+        return (now or time.monotonic()) >= self.open_until
+
+    @property
+    def score(self) -> float:
+        """Higher is better: reliable engines first, then fast ones."""
+        return self.success_rate / (1.0 + self.latency)
+
+    def record_success(self, latency: float) -> None:
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.success_rate = (1 - self.alpha) * self.success_rate + self.alpha
+        self.latency = (1 - self.alpha) * self.latency + self.alpha * latency
+
+    def record_failure(self, threshold: int, cooldown: float) -> None:
+        self.consecutive_failures += 1
+        self.success_rate = (1 - self.alpha) * self.success_rate
+        if self.consecutive_failures >= threshold:
+            # Half-open after the cooldown: the next failure reopens it at once
+            self.open_until = time.monotonic() + cooldown
+
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Elements that never hold the main content of a page
+BOILERPLATE_TAGS = [
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "iframe",
+    "form",
+    "header",
+    "footer",
+    "nav",
+    "aside",
+]
+# class/id fragments of navigation, ads, cookie banners and similar page chrome
+BOILERPLATE_PATTERN = re.compile(
+    r"(^|[\s_-])(nav|menu|sidebar|footer|header|banner|cookie|advert|ads?|promo|"
+    r"share|social|subscribe|newsletter|comments?|related|breadcrumbs?)($|[\s_-])",
+    re.IGNORECASE,
+)
+# Share of the page's text from which an element counts as the main content
+MAIN_CONTENT_SHARE = 0.5
+
+
+class CachedContent(BaseModel):
+    """Extracted page content together with its HTTP validators."""
+
+    content: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = Field(default_factory=time.monotonic)
+
+
 class WebContentFetcher:
-    """Utility class for fetching web content."""
+    """Async web content fetcher shared by WebSearch and DeepResearch.
+
+    All instances share one pooled HTTP client per event loop, a per-host
+    concurrency limit and a URL-keyed content cache. Cached pages are served
+    directly for cache_ttl seconds and revalidated with ETag/Last-Modified after
+    that. Bodies are streamed and reading stops at max_bytes, since only the
+    first max_chars characters of extracted text are kept anyway.
+    """
+
+    headers: ClassVar[Dict[str, str]] = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    }
+    max_bytes: ClassVar[int] = 2 * 1024 * 1024
+    max_chars: ClassVar[int] = 10000
+    per_host_limit: ClassVar[int] = 4
+    cache_size: ClassVar[int] = 256
+    cache_ttl: ClassVar[float] = 600.0
+
+    _clients: ClassVar[Dict[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+    _host_semaphores: ClassVar[Dict[tuple, asyncio.Semaphore]] = {}
+    _cache: ClassVar["OrderedDict[str, CachedContent]"] = OrderedDict()
+
+    @classmethod
+    def _get_client(cls) -> httpx.AsyncClient:
+        """Pooled client for the running loop; connections cannot cross loops."""
+        loop = asyncio.get_running_loop()
+        for other_loop in [l for l in cls._clients if l.is_closed()]:
+            cls._clients.pop(other_loop)
+        if loop not in cls._clients:
+            cls._clients[loop] = httpx.AsyncClient(
+                headers=cls.headers,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return cls._clients[loop]
+
+    @classmethod
+    def _get_host_semaphore(cls, host: str) -> asyncio.Semaphore:
+        key = (asyncio.get_running_loop(), host)
+        if key not in cls._host_semaphores:
+            cls._host_semaphores[key] = asyncio.Semaphore(cls.per_host_limit)
+        return cls._host_semaphores[key]
+
+    @classmethod
+    def _cache_put(cls, url: str, entry: CachedContent) -> None:
+        cls._cache[url] = entry
+        cls._cache.move_to_end(url)
+        while len(cls._cache) > cls.cache_size:
+            cls._cache.popitem(last=False)
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the pooled client of the running loop."""
+        client = cls._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
 
     @staticmethod
-    async def fetch_content(url: str, timeout: int = 10) -> Optional[str]:
+    def extract_text(html: str, max_chars: int = 10000) -> Optional[str]:
+        """Extract the main readable text of an HTML page.
+
+        Page chrome (scripts, navigation, footers, ad and cookie blocks) is
+        dropped first; if the page marks its main content with <article> or
+        <main>, only that part is kept. An element whose class or id looks like
+        chrome is kept if it wraps the main content, i.e. contains <article> or
+        <main> or most of the page's text.
+        """
+        soup = BeautifulSoup(html, HTML_PARSER)
+        for element in soup(BOILERPLATE_TAGS):
+            element.decompose()
+        page_chars = len(soup.get_text(strip=True))
+        for element in soup.find_all(
+            lambda tag: tag.name not in ("html", "body", "main", "article")
+            and BOILERPLATE_PATTERN.search(
+                " ".join(tag.get("class") or []) + " " + (tag.get("id") or "")
+            )
+        ):
+            if element.decomposed or element.find(("article", "main")):
+                continue
+            if len(element.get_text(strip=True)) > MAIN_CONTENT_SHARE * page_chars:
+                continue
+            element.decompose()
+
+        root = soup.find("article") or soup.find("main") or soup.body or soup
+        text = " ".join(root.get_text(separator=" ", strip=True).split())
+        if len(text) < 200 and root is not soup:
+            # Too little text in the marked region, fall back to the whole page
+            text = " ".join(soup.get_text(separator=" ", strip=True).split())
+        return text[:max_chars] if text else None
+
+    async def fetch_content(self, url: str, timeout: int = 10) -> Optional[str]:
         """
         Fetch and extract the main content from a webpage.
 
@@ -118,35 +299,67 @@ class WebContentFetcher:
         Returns:
             Extracted text content or None if fetching fails
         """
-        headers = {
-            "WebSearch": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        cached = self._cache.get(url)
+        if cached and time.monotonic() - cached.fetched_at < self.cache_ttl:
+            self._cache.move_to_end(url)
+            return cached.content
 
-        try:
-            # Use asyncio to run requests in a thread pool
-            response = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: requests.get(url, headers=headers, timeout=timeout)
-            )
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
 
-            if response.status_code != 200:
-                logger.warning(
-                    f"Failed to fetch content from {url}: HTTP {response.status_code}"
+        try:
+            async with self._get_host_semaphore(urlsplit(url).netloc):
+                async with self._get_client().stream(
+                    "GET", url, headers=headers, timeout=timeout
+                ) as response:
+                    if response.status_code == 304 and cached:
+                        cached.fetched_at = time.monotonic()
+                        self._cache_put(url, cached)
+                        return cached.content
+
+                    if response.status_code != 200:
+                        logger.warning(
+                            f"Failed to fetch content from {url}: HTTP {response.status_code}"
+                        )
+                        return None
+
+                    content_type = response.headers.get("content-type", "")
+                    if content_type and not content_type.startswith(
+                        ("text/", "application/xhtml")
+                    ):
+                        logger.warning(
+                            f"Skipping non-text content from {url}: {content_type}"
+                        )
+                        return None
+
+                    # Stop reading once the byte cap is reached
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) >= self.max_bytes:
+                            break
+                    text = bytes(body[: self.max_bytes]).decode(
+                        response.charset_encoding or "utf-8", errors="replace"
+                    )
+                    etag = response.headers.get("etag")
+                    last_modified = response.headers.get("last-modified")
+
+            if content_type.startswith("text/plain"):
+                content = " ".join(text.split())[: self.max_chars] or None
+            else:
+                # Parsing is CPU bound, keep it off the event loop
+                content = await asyncio.get_running_loop().run_in_executor(
+                    None, self.extract_text, text, self.max_chars
                 )
-                return None
-
-            # Parse HTML with BeautifulSoup
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Remove script and style elements
-            for script in soup(["script", "style", "header", "footer", "nav"]):
-                script.extract()
 
-            # Get text content
-            text = soup.get_text(separator="\n", strip=True)
-
-            # Clean up whitespace and limit size (100KB max)
-            text = " ".join(text.split())
-            return text[:10000] if text else None
+            self._cache_put(
+                url,
+                CachedContent(content=content, etag=etag, last_modified=last_modified),
+            )
+            return content
 
         except Exception as e:
             logger.warning(f"Error fetching content from {url}: {e}")
@@ -190,12 +403,15 @@ class WebSearch(BaseTool):
         },
         "required": ["query"],
     }
+    concurrency_safe = True
+
     _search_engine: dict[str, WebSearchEngine] = {
         "google": GoogleSearchEngine(),
         "baidu": BaiduSearchEngine(),
         "duckduckgo": DuckDuckGoSearchEngine(),
         "bing": BingSearchEngine(),
     }
+    _engine_health: dict[str, EngineHealth] = {}
     content_fetcher: WebContentFetcher = WebContentFetcher()
 
     async def execute(
@@ -270,11 +486,12 @@ class WebSearch(BaseTool):
                 )
 
             if retry_count < max_retries:
-                # All engines failed, wait and retry
+                # All engines failed, wait for the first breaker to close and retry
+                wait = self._get_retry_wait(retry_count, retry_delay)
                 logger.warning(
-                    f"All search engines failed. Waiting {retry_delay} seconds before retry {retry_count + 1}/{max_retries}..."
+                    f"All search engines failed. Waiting {wait:.1f} seconds before retry {retry_count + 1}/{max_retries}..."
                 )
-                await asyncio.sleep(retry_delay)
+                await asyncio.sleep(wait)
             else:
                 logger.error(
                     f"All search engines failed after {max_retries} retries. Giving up."
@@ -287,45 +504,195 @@ class WebSearch(BaseTool):
             results=[],
         )
 
+    def _get_search_setting(self, name: str, default: Any) -> Any:
+        return (
+            getattr(config.search_config, name, default)
+            if config.search_config
+            else default
+        )
+
+    def _get_health(self, engine_name: str) -> EngineHealth:
+        return self._engine_health.setdefault(engine_name, EngineHealth())
+
+    def _get_retry_wait(self, retry_count: int, retry_delay: float) -> float:
+        """Wait for the earliest open breaker instead of a fixed delay.
+
+        When some engine is still in rotation, back off exponentially; otherwise
+        wait until the first breaker half-opens. Never wait longer than retry_delay.
+        """
+        now = time.monotonic()
+        healths = [self._get_health(name) for name in self._search_engine]
+        if any(health.is_available(now) for health in healths):
+            wait = 2.0**retry_count
+        else:
+            wait = min(health.open_until for health in healths) - now
+        return max(0.0, min(wait, retry_delay))
+
+    async def _search_engine_results(
+        self,
+        engine_name: str,
+        query: str,
+        num_results: int,
+        search_params: Dict[str, Any],
+    ) -> List[SearchResult]:
+        """Search with one engine, record its health and convert the results."""
+        engine = self._search_engine[engine_name]
+        health = self._get_health(engine_name)
+        logger.info(f"🔎 Attempting search with {engine_name.capitalize()}...")
+        start = time.monotonic()
+        try:
+            search_items = await self._perform_search_with_engine(
+                engine, query, num_results, search_params
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Search with {engine_name.capitalize()} failed: {e}")
+            search_items = []
+
+        if not search_items:
+            health.record_failure(
+                self._get_search_setting("breaker_failure_threshold", 3),
+                self._get_search_setting("breaker_cooldown", 30.0),
+            )
+            return []
+
+        health.record_success(time.monotonic() - start)
+        # Transform search items into structured results
+        return [
+            SearchResult(
+                position=i + 1,
+                url=item.url,
+                title=item.title or f"Result {i+1}",  # Ensure we always have a title
+                description=item.description or "",
+                source=engine_name,
+            )
+            for i, item in enumerate(search_items)
+        ]
+
     async def _try_all_engines(
         self, query: str, num_results: int, search_params: Dict[str, Any]
     ) -> List[SearchResult]:
-        """Try all search engines in the configured order."""
+        """Try the available search engines, either one by one or racing the top-k."""
         engine_order = self._get_engine_order()
-        failed_engines = []
+        race_engines = self._get_search_setting("race_engines", 1)
+        if race_engines > 1:
+            return await self._race_engines(
+                engine_order, race_engines, query, num_results, search_params
+            )
 
+        failed_engines = []
         for engine_name in engine_order:
-            engine = self._search_engine[engine_name]
-            logger.info(f"🔎 Attempting search with {engine_name.capitalize()}...")
-            search_items = await self._perform_search_with_engine(
-                engine, query, num_results, search_params
+            results = await self._search_engine_results(
+                engine_name, query, num_results, search_params
             )
 
-            if not search_items:
+            if not results:
+                failed_engines.append(engine_name)
                 continue
 
             if failed_engines:
                 logger.info(
                     f"Search successful with {engine_name.capitalize()} after trying: {', '.join(failed_engines)}"
                 )
-
-            # Transform search items into structured results
-            return [
-                SearchResult(
-                    position=i + 1,
-                    url=item.url,
-                    title=item.title
-                    or f"Result {i+1}",  # Ensure we always have a title
-                    description=item.description or "",
-                    source=engine_name,
-                )
-                for i, item in enumerate(search_items)
-            ]
+            return results
 
         if failed_engines:
             logger.error(f"All search engines failed: {', '.join(failed_engines)}")
         return []
 
+    async def _race_engines(
+        self,
+        engine_order: List[str],
+        race_engines: int,
+        query: str,
+        num_results: int,
+        search_params: Dict[str, Any],
+    ) -> List[SearchResult]:
+        """Query up to race_engines engines at once within a deadline.
+
+        A failed engine is replaced by the next one in order. Without race_merge the
+        first non-empty result wins; with it, every result that arrives before the
+        deadline is merged. Stragglers are cancelled either way (the blocking search
+        call keeps running in its worker thread, but nobody waits for it).
+        """
+        deadline = time.monotonic() + self._get_search_setting("race_deadline", 15.0)
+        merge = self._get_search_setting("race_merge", False)
+        pending_engines = list(engine_order)
+        running: Dict[asyncio.Task, str] = {}
+        collected: List[List[SearchResult]] = []
+
+        def launch() -> None:
+            while pending_engines and len(running) < race_engines:
+                engine_name = pending_engines.pop(0)
+                task = asyncio.create_task(
+                    self._search_engine_results(
+                        engine_name, query, num_results, search_params
+                    )
+                )
+                running[task] = engine_name
+
+        launch()
+        try:
+            while running:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    engine_name = running.pop(task)
+                    results = task.result()
+                    if results:
+                        logger.info(
+                            f"Search successful with {engine_name.capitalize()}"
+                        )
+                        collected.append(results)
+                if collected and not merge:
+                    break
+                launch()
+        finally:
+            for task in running:
+                task.cancel()
+
+        # Engines still running at the deadline count as failed; engines that
+        # merely lost the race to a faster one do not
+        if running and time.monotonic() >= deadline:
+            for engine_name in running.values():
+                self._get_health(engine_name).record_failure(
+                    self._get_search_setting("breaker_failure_threshold", 3),
+                    self._get_search_setting("breaker_cooldown", 30.0),
+                )
+
+        if not collected:
+            logger.error("All racing search engines failed or timed out")
+            return []
+        if not merge:
+            return collected[0]
+        return self._merge_results(collected, num_results)
+
+    @staticmethod
+    def _merge_results(
+        collected: List[List[SearchResult]], num_results: int
+    ) -> List[SearchResult]:
+        """Interleave results from several engines, dropping duplicate URLs."""
+        merged: List[SearchResult] = []
+        seen_urls = set()
+        for rank in range(max(len(results) for results in collected)):
+            for results in collected:
+                if rank >= len(results):
+                    continue
+                result = results[rank]
+                key = normalize_url(result.url)
+                if key in seen_urls:
+                    continue
+                seen_urls.add(key)
+                merged.append(result.model_copy(update={"position": len(merged) + 1}))
+        return merged[:num_results]
+
     async def _fetch_content_for_results(
         self, results: List[SearchResult]
     ) -> List[SearchResult]:
@@ -382,7 +749,15 @@ class WebSearch(BaseTool):
         )
         engine_order.extend([e for e in self._search_engine if e not in engine_order])
 
-        return engine_order
+        # Engines with an open breaker sit out; the rest keep the configured order,
+        # except that an engine whose health score dropped below half of the best
+        # one's moves behind the healthy ones
+        now = time.monotonic()
+        available = [e for e in engine_order if self._get_health(e).is_available(now)]
+        if available:
+            best = max(self._get_health(e).score for e in available)
+            available.sort(key=lambda e: self._get_health(e).score < best / 2)
+        return available
 
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10)
@@ -2,12 +2,14 @@ import asyncio
 
 from app.agent.manus import Manus
 from app.logger import logger
+from app.tool.browser_pool import close_browser_pool, warm_up_browser_pool
 
 
 async def main():
     # Create and initialize Manus agent
     agent = await Manus.create()
     try:
+        await warm_up_browser_pool()
         prompt = input("Enter your prompt: ")
         if not prompt.strip():
             logger.warning("Empty prompt provided.")
@@ -21,6 +23,7 @@ async def main():
     finally:
         # Ensure agent resources are cleaned up before exiting
         await agent.cleanup()
+        await close_browser_pool()
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ import time
 from app.agent.manus import Manus
 from app.flow.flow_factory import FlowFactory, FlowType
 from app.logger import logger
+from app.tool.browser_pool import close_browser_pool, warm_up_browser_pool
 
 
 async def run_flow():
@@ -12,6 +13,7 @@ async def run_flow():
     }
 
     try:
+        await warm_up_browser_pool()
         prompt = input("Enter your prompt: ")
 
         if prompt.strip().isspace() or not prompt:
@@ -43,6 +45,8 @@ async def run_flow():
         logger.info("Operation cancelled by user.")
     except Exception as e:
         logger.error(f"Error: {str(e)}")
+    finally:
+        await close_browser_pool()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+import itertools
+import json
+from typing import List, Optional
+
+import pytest
+
+from app.agent.loop_detector import LoopBreakAction, LoopDetector, LoopReason
+from app.schema import Function, Message, ToolCall
+
+
+THRESHOLD = 2
+
+_call_ids = itertools.count()
+
+
+def response(text: str) -> List[Message]:
+    return [Message.assistant_message(text)]
+
+
+def tool_call(name: str, arguments: dict, result: str) -> List[Message]:
+    """An assistant message calling a tool, followed by the tool's result."""
+    call = ToolCall(
+        id=f"call_{next(_call_ids)}",
+        function=Function(name=name, arguments=json.dumps(arguments)),
+    )
+    return [
+        Message.from_tool_calls([call]),
+        Message.tool_message(result, name=name, tool_call_id=call.id),
+    ]
+
+
+def observe(
+    detector: LoopDetector, memory: List[Message], messages: List[Message]
+) -> Optional[LoopBreakAction]:
+    """Adds the messages of an agent step to the memory and checks it."""
+    memory.extend(messages)
+    return detector.check(memory, THRESHOLD)
+
+
+@pytest.fixture
+def memory() -> List[Message]:
+    return [Message.user_message("Summarize the page")]
+
+
+def test_exact_repeat(memory):
+    """Tests that a response repeated beyond the threshold is a loop."""
+    detector = LoopDetector()
+    text = "I will open the page and read it."
+
+    assert observe(detector, memory, response(text)) is None
+    assert observe(detector, memory, response(text.upper())) is None
+    action = observe(detector, memory, response(text))
+
+    assert action.reason == LoopReason.REPEATED_RESPONSE
+    assert action.occurrences == 2
+    assert not action.stop
+
+
+def test_near_duplicate(memory):
+    """Tests that responses differing in a word are near-duplicates."""
+    detector = LoopDetector()
+    words = "the page has no summary yet so I will look at the next section now"
+
+    for variant in ("first", "second"):
+        assert observe(detector, memory, response(f"{words} {variant}")) is None
+    action = observe(detector, memory, response(f"{words} third"))
+
+    assert action.reason == LoopReason.SIMILAR_RESPONSE
+    assert action.occurrences == 2
+
+
+def test_repeated_tool_call_with_same_result(memory):
+    """Tests that a call returning the same result again is a loop."""
+    detector = LoopDetector()
+    for _ in range(THRESHOLD):
+        assert (
+            observe(detector, memory, tool_call("bash", {"command": "ls"}, "a.txt"))
+            is None
+        )
+    action = observe(detector, memory, tool_call("bash", {"command": "ls"}, "a.txt"))
+
+    assert action.reason == LoopReason.REPEATED_TOOL_CALL
+    assert action.tool_call == 'bash({"command":"ls"})'
+
+
+def test_repeated_tool_call_with_new_results_is_progress(memory):
+    """Tests that scrolling through a long page never counts as a loop."""
+    detector = LoopDetector()
+    for page in range(10):
+        action = observe(
+            detector,
+            memory,
+            tool_call("browser_use", {"action": "scroll_down"}, f"Page part {page}"),
+        )
+        assert action is None
+
+
+def test_window_eviction(memory):
+    """Tests that messages evicted from the window no longer count."""
+    detector = LoopDetector(window_size=2)
+    text = "I will open the page and read it."
+    observe(detector, memory, response(text))
+    observe(detector, memory, response(text))
+    observe(detector, memory, response("Something else entirely."))
+    observe(detector, memory, response("And another thought."))
+
+    assert observe(detector, memory, response(text)) is None
+
+
+def test_attempts_escalate_and_reset(memory):
+    """Tests that consecutive detections stop the agent and progress resets them."""
+    detector = LoopDetector(max_attempts=2)
+    text = "I will open the page and read it."
+    observe(detector, memory, response(text))
+    observe(detector, memory, response(text))
+
+    actions = [observe(detector, memory, response(text)) for _ in range(3)]
+    assert [action.attempt for action in actions] == [1, 2, 3]
+    assert [action.stop for action in actions] == [False, False, True]
+
+    detector.reset()
+    memory.clear()
+    observe(detector, memory, response(text))
+    observe(detector, memory, response(text))
+    assert observe(detector, memory, response(text)).attempt == 1
+    assert observe(detector, memory, response("A new idea.")) is None
+    assert observe(detector, memory, response(text)).attempt == 1
+
+
+def test_clone_has_settings_but_no_state(memory):
+    """Tests that a clone starts without the observed messages."""
+    detector = LoopDetector(window_size=5, max_attempts=1)
+    text = "I will open the page and read it."
+    for _ in range(THRESHOLD):
+        observe(detector, memory, response(text))
+
+    clone = detector.clone()
+
+    assert clone.window_size == 5 and clone.max_attempts == 1
+    assert clone.check([Message.assistant_message(text)], THRESHOLD) is None
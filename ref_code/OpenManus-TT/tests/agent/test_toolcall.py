@@ -0,0 +1,174 @@
+import asyncio
+import itertools
+import json
+from typing import ClassVar, List
+
+import pytest
+
+from app.agent.toolcall import ToolCallAgent
+from app.llm import LLM
+from app.schema import Function, ToolCall
+from app.tool import ToolCollection
+from app.tool.base import BaseTool, ToolResult
+
+
+_call_ids = itertools.count()
+
+
+class EchoTool(BaseTool):
+    """Returns the text it is given."""
+
+    name: str = "echo"
+    description: str = "Returns the text."
+
+    async def execute(self, text: str) -> ToolResult:
+        return ToolResult(output=text)
+
+
+class Recorder:
+    """Records the order in which tool calls start and end."""
+
+    def __init__(self):
+        self.events: List[str] = []
+        self.running = 0
+        self.max_running = 0
+
+
+class SleepTool(BaseTool):
+    """Sleeps for the given delay, returning its tag and an image of it."""
+
+    name: str = "sleep"
+    description: str = "Sleeps."
+    concurrency_safe: ClassVar[bool] = True
+    recorder: Recorder
+
+    async def execute(self, tag: str, delay: float = 0.05) -> ToolResult:
+        self.recorder.events.append(f"start {tag}")
+        self.recorder.running += 1
+        self.recorder.max_running = max(
+            self.recorder.max_running, self.recorder.running
+        )
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.recorder.running -= 1
+            self.recorder.events.append(f"end {tag}")
+        return ToolResult(output=tag, base64_image=f"image of {tag}")
+
+
+class UnsafeSleepTool(SleepTool):
+    """A sleep tool whose calls must not overlap other calls."""
+
+    name: str = "unsafe_sleep"
+    concurrency_safe: ClassVar[bool] = False
+
+
+def call(name: str, **arguments) -> ToolCall:
+    return ToolCall(
+        id=f"call_{next(_call_ids)}",
+        function=Function(name=name, arguments=json.dumps(arguments)),
+    )
+
+
+def make_agent(*tools: BaseTool, **kwargs) -> ToolCallAgent:
+    """Creates an agent with the tools and an LLM it never calls."""
+    return ToolCallAgent(
+        llm=object.__new__(LLM), available_tools=ToolCollection(*tools), **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_observation_is_truncated_once_to_max_observe():
+    """Tests that the observation, prefix included, is cut to max_observe."""
+    agent = make_agent(EchoTool(), max_observe=100)
+    agent.tool_calls = [call("echo", text="x" * 1000)]
+
+    result = await agent.act()
+
+    prefix = "Observed output of cmd `echo` executed:\n"
+    assert result == prefix + "x" * (100 - len(prefix))
+    assert agent.memory.messages[-1].content == result
+
+
+@pytest.fixture
+def recorder() -> Recorder:
+    return Recorder()
+
+
+@pytest.mark.asyncio
+async def test_safe_calls_overlap_up_to_max_concurrent_tools(recorder):
+    """Tests that concurrency-safe calls run at once, at most max_concurrent_tools."""
+    agent = make_agent(SleepTool(recorder=recorder), max_concurrent_tools=2)
+    agent.tool_calls = [call("sleep", tag=str(i)) for i in range(5)]
+
+    await agent.act()
+
+    assert recorder.max_running == 2
+    assert len(recorder.events) == 10
+
+
+@pytest.mark.asyncio
+async def test_unsafe_call_is_a_barrier(recorder):
+    """Tests that an unsafe call runs after the calls before it and before the rest."""
+    agent = make_agent(SleepTool(recorder=recorder), UnsafeSleepTool(recorder=recorder))
+    agent.tool_calls = [
+        call("sleep", tag="a"),
+        call("sleep", tag="b"),
+        call("unsafe_sleep", tag="barrier"),
+        call("sleep", tag="c"),
+        call("sleep", tag="d"),
+    ]
+
+    await agent.act()
+
+    events = recorder.events
+    assert set(events[:4]) == {"start a", "start b", "end a", "end b"}
+    assert events[4:6] == ["start barrier", "end barrier"]
+    assert set(events[6:]) == {"start c", "start d", "end c", "end d"}
+    assert recorder.max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_results_enter_memory_in_call_order(recorder):
+    """Tests that results finishing out of order are added in call order."""
+    agent = make_agent(SleepTool(recorder=recorder))
+    calls = [call("sleep", tag=str(i), delay=0.05 * (3 - i)) for i in range(3)]
+    agent.tool_calls = calls
+
+    await agent.act()
+
+    assert [event for event in recorder.events if event.startswith("end")] == [
+        "end 2",
+        "end 1",
+        "end 0",
+    ]
+    messages = agent.memory.messages
+    assert [message.tool_call_id for message in messages] == [c.id for c in calls]
+    assert [message.content.split("\n")[-1] for message in messages] == [
+        "0",
+        "1",
+        "2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_each_call_keeps_its_image(recorder):
+    """Tests that every tool message carries the image of its own call."""
+    agent = make_agent(SleepTool(recorder=recorder), UnsafeSleepTool(recorder=recorder))
+    agent.tool_calls = [
+        call("sleep", tag="a", delay=0.1),
+        call("sleep", tag="b"),
+        call("unsafe_sleep", tag="c"),
+        call("echo", text="no image"),
+    ]
+    agent.available_tools.add_tool(EchoTool())
+
+    await agent.act()
+
+    assert [message.base64_image for message in agent.memory.messages] == [
+        "image of a",
+        "image of b",
+        "image of c",
+        None,
+    ]
+    assert not agent._tool_call_images
@@ -0,0 +1,178 @@
+import asyncio
+import re
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from app.agent.base import BaseAgent
+from app.flow.planning import PlanningFlow, PlanStepStatus
+from app.llm import LLM
+from app.tool import PlanningTool
+
+
+class Recorder:
+    """Records the order in which steps start and end across agent instances."""
+
+    def __init__(self):
+        self.events: List[str] = []
+        self.agents: set = set()
+        self.running = 0
+        self.max_running = 0
+
+
+class StubAgent(BaseAgent):
+    """Runs a plan step by sleeping, failing steps whose text asks for it."""
+
+    name: str = "stub"
+    max_steps: int = 1
+    delay: float = 0.05
+    recorder: Recorder
+
+    async def step(self) -> str:
+        request = self.memory.messages[-1].content
+        step = re.search(r'working on step \d+: "(.*)"', request).group(1)
+        self.recorder.agents.add(id(self))
+        self.recorder.events.append(f"start {step}")
+        self.recorder.running += 1
+        self.recorder.max_running = max(
+            self.recorder.max_running, self.recorder.running
+        )
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.recorder.running -= 1
+            self.recorder.events.append(f"end {step}")
+        if "fail" in step:
+            raise RuntimeError(f"{step} failed")
+        return f"{step} done"
+
+
+class UnspawnableAgent(StubAgent):
+    """Stands for an agent whose tools cannot be shared by concurrent runs."""
+
+    def spawn(self) -> Optional[BaseAgent]:
+        return None
+
+
+async def run_plan(
+    agent: BaseAgent, steps: List[str], dependencies: List[List[int]], **kwargs
+) -> Tuple[PlanningFlow, Dict[int, str], bool]:
+    """Runs the steps of a plan with the given dependencies on the agent.
+
+    Returns the flow, the results by step index and whether the flow terminated.
+    """
+    planning_tool = PlanningTool()
+    await planning_tool.execute(
+        command="create",
+        plan_id="plan",
+        title="Test plan",
+        steps=steps,
+        dependencies=dependencies,
+    )
+    flow = PlanningFlow(
+        agent,
+        llm=agent.llm,
+        planning_tool=planning_tool,
+        plan_id="plan",
+        **kwargs,
+    )
+    flow._build_step_index()
+    results, terminated = await flow._run_steps()
+    return flow, results, terminated
+
+
+@pytest.fixture
+def recorder() -> Recorder:
+    return Recorder()
+
+
+@pytest.fixture
+def llm() -> LLM:
+    """Creates an LLM without a client, which the stub agents never call."""
+    return object.__new__(LLM)
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_overlap(recorder, llm):
+    """Tests that independent steps run at once, each on its own agent."""
+    agent = StubAgent(llm=llm, recorder=recorder)
+    flow, results, _ = await run_plan(agent, ["a", "b", "c"], [[], [], []])
+
+    assert recorder.max_running == 3
+    assert len(recorder.agents) == 3
+    assert id(agent) in recorder.agents
+    assert all(step.status == PlanStepStatus.COMPLETED for step in flow.steps)
+    assert [results[index].split("\n")[0] for index in range(3)] == [
+        "Step 1: a done",
+        "Step 1: b done",
+        "Step 1: c done",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dependent_step_waits(recorder, llm):
+    """Tests that a step starts only after all its dependencies completed."""
+    agent = StubAgent(llm=llm, recorder=recorder)
+    await run_plan(agent, ["a", "b", "c"], [[], [], [0, 1]])
+
+    start_c = recorder.events.index("start c")
+    assert recorder.events.index("end a") < start_c
+    assert recorder.events.index("end b") < start_c
+
+
+@pytest.mark.asyncio
+async def test_failed_step_blocks_dependents(recorder, llm):
+    """Tests that steps depending on a failed step never start."""
+    agent = StubAgent(llm=llm, recorder=recorder)
+    flow, results, terminated = await run_plan(
+        agent, ["fail", "after fail", "other"], [[], [0], []]
+    )
+
+    assert [step.status for step in flow.steps] == [
+        PlanStepStatus.BLOCKED,
+        PlanStepStatus.NOT_STARTED,
+        PlanStepStatus.COMPLETED,
+    ]
+    assert "start after fail" not in recorder.events
+    assert set(results) == {0, 2}
+    assert not terminated
+
+
+@pytest.mark.asyncio
+async def test_max_parallel_steps(recorder, llm):
+    """Tests that no more than max_parallel_steps steps run at once."""
+    agent = StubAgent(llm=llm, recorder=recorder)
+    flow, _, _ = await run_plan(
+        agent, [f"s{i}" for i in range(5)], [[]] * 5, max_parallel_steps=2
+    )
+
+    assert recorder.max_running == 2
+    assert all(step.status == PlanStepStatus.COMPLETED for step in flow.steps)
+
+
+@pytest.mark.asyncio
+async def test_unspawnable_agent_runs_steps_in_turn(recorder, llm):
+    """Tests that steps wait for an agent which cannot be spawned."""
+    agent = UnspawnableAgent(llm=llm, recorder=recorder)
+    flow, _, _ = await run_plan(agent, ["a", "b", "c"], [[], [], []])
+
+    assert recorder.max_running == 1
+    assert recorder.agents == {id(agent)}
+    assert all(step.status == PlanStepStatus.COMPLETED for step in flow.steps)
+
+
+def test_spawn_creates_fresh_agent(recorder, llm):
+    """Tests that a spawned agent keeps the configuration but not the run state."""
+    agent = StubAgent(llm=llm, recorder=recorder, delay=0.5)
+    agent.update_memory("user", "hello")
+    agent.current_step = 3
+
+    spawned = agent.spawn()
+
+    assert type(spawned) is StubAgent
+    assert spawned.delay == 0.5
+    assert spawned.recorder is recorder
+    assert spawned.llm is llm
+    assert spawned.memory.messages == []
+    assert spawned.current_step == 0
+    assert spawned.loop_detector is not agent.loop_detector
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+
+pytest.importorskip(
+    "mcp.server.fastmcp",
+    reason="requires the mcp 1.x server pinned in requirements.txt",
+)
+
+from app.mcp import server as mcp_server
+from app.mcp.server import MCPServer, ToolExecutionPolicy
+from app.tool.base import BaseTool, ToolResult
+from app.tool.terminate import Terminate
+
+
+class Sleep(BaseTool):
+    """Sleeps, blocking its thread or not, and counts its calls."""
+
+    name: str = "sleep"
+    description: str = "Sleeps for the given seconds."
+    parameters: dict = {
+        "type": "object",
+        "properties": {"seconds": {"type": "number"}},
+        "required": ["seconds"],
+    }
+    blocking: bool = False
+    calls: int = 0
+    running: int = 0
+    max_running: int = 0
+
+    async def execute(self, seconds: float) -> ToolResult:
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if self.blocking:
+                time.sleep(seconds)
+            else:
+                await asyncio.sleep(seconds)
+        finally:
+            self.running -= 1
+        return ToolResult(output=threading.current_thread().name)
+
+
+@pytest.fixture
+def server(monkeypatch) -> MCPServer:
+    """Creates a server without the browser tool, which needs a model."""
+    monkeypatch.setattr(mcp_server, "BrowserUseTool", Terminate)
+    return MCPServer()
+
+
+async def call(server: MCPServer, name: str, arguments: dict) -> str:
+    (content,) = await server.server.call_tool(name, arguments)
+    return content.text
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit(server):
+    """Tests that calls beyond the tool's limit wait."""
+    tool = Sleep()
+    server.register_tool(tool, policy=ToolExecutionPolicy(max_concurrency=2))
+    await asyncio.gather(*(call(server, "sleep", {"seconds": 0.05}) for _ in range(5)))
+
+    assert tool.max_running == 2
+    assert server.get_stats()["free_slots"]["sleep"] == 2
+
+
+@pytest.mark.asyncio
+async def test_offloaded_tool_does_not_block_loop(server):
+    """Tests that a blocking tool runs in the worker pool."""
+    server.register_tool(Sleep(blocking=True), policy=ToolExecutionPolicy(offload=True))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker_task = asyncio.create_task(ticker())
+    result = await call(server, "sleep", {"seconds": 0.2})
+    ticker_task.cancel()
+
+    assert "mcp-tool" in result
+    assert ticks >= 10
+
+
+@pytest.mark.asyncio
+async def test_cancelled_offloaded_call_keeps_its_slot(server):
+    """Tests that a cancelled call in the worker pool holds its slot until it ends."""
+    tool = Sleep(blocking=True)
+    server.register_tool(
+        tool, policy=ToolExecutionPolicy(max_concurrency=1, offload=True)
+    )
+    cancelled = asyncio.create_task(call(server, "sleep", {"seconds": 0.2}))
+    await asyncio.sleep(0.05)
+    cancelled.cancel()
+    waiting = asyncio.create_task(call(server, "sleep", {"seconds": 0}))
+    await asyncio.sleep(0.05)
+
+    assert server.get_stats()["in_flight"]["sleep"] == 1
+    assert server.get_stats()["free_slots"]["sleep"] == 0
+    assert tool.calls == 1
+
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    assert tool.running == 0
+    await waiting
+
+    assert tool.max_running == 1
+    assert tool.calls == 2
+    assert server.get_stats()["in_flight"]["sleep"] == 0
+
+
+@pytest.mark.asyncio
+async def test_result_cache(server):
+    """Tests that equal calls of a cached tool run once."""
+    tool = Sleep()
+    server.register_tool(tool, policy=ToolExecutionPolicy(cache_ttl=60))
+    first = await call(server, "sleep", {"seconds": 0})
+    assert await call(server, "sleep", {"seconds": 0}) == first
+    await call(server, "sleep", {"seconds": 0.01})
+
+    assert tool.calls == 2
+    assert server.get_stats()["cache_hits"] == 1
+
+
+def test_context_parameter_not_in_schema(server):
+    """Tests that the injected request context is hidden from clients."""
+    server.register_tool(Sleep())
+    (tool,) = [t for t in server.server._tool_manager.list_tools() if t.name == "sleep"]
+
+    assert set(tool.parameters["properties"]) == {"seconds"}
+
+
+def test_default_policies(server):
+    """Tests that the standard stateful tools never run concurrently."""
+    server.register_all_tools()
+
+    assert server.policies["bash"].max_concurrency == 1
+    assert server.policies["browser_use"].max_concurrency == 1
+    assert server.policies["str_replace_editor"].max_concurrency == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_edits_all_apply(server, tmp_path):
+    """Tests that concurrent edits of one file through the editor policy all apply."""
+    server.register_all_tools()
+    path = tmp_path / "edits.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(200)))
+
+    await asyncio.gather(
+        *(
+            call(
+                server,
+                "str_replace_editor",
+                {
+                    "command": "str_replace",
+                    "path": str(path),
+                    "old_str": f"line {i}\n",
+                    "new_str": f"edited {i}\n",
+                },
+            )
+            for i in range(200)
+        )
+    )
+
+    assert path.read_text() == "".join(f"edited {i}\n" for i in range(200))
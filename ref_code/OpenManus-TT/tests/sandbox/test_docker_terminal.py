@@ -1,10 +1,20 @@
 """Tests for the AsyncDockerizedTerminal implementation."""
 
+import fcntl
+import os
+import pty
+import socket
+import subprocess
+import termios
+import threading
+import time
+from types import SimpleNamespace
+
 import docker
 import pytest
 import pytest_asyncio
 
-from app.sandbox.core.terminal import AsyncDockerizedTerminal
+from app.sandbox.core.terminal import AsyncDockerizedTerminal, DockerSession
 
 
 @pytest.fixture(scope="module")
@@ -93,6 +103,116 @@ class TestAsyncDockerizedTerminal:
         assert terminal.session is not None
 
 
+class FakeAPIClient:
+    """Docker API stand-in running the exec command locally on a pseudo terminal."""
+
+    def __init__(self):
+        self.processes = []
+        self._exec = {}
+
+    def exec_create(self, container_id, cmd, environment=None, **kwargs):
+        exec_id = f"exec-{len(self._exec)}"
+        self._exec[exec_id] = (cmd, environment or {})
+        return {"Id": exec_id}
+
+    def exec_start(self, exec_id, **kwargs):
+        cmd, environment = self._exec[exec_id]
+        master, slave = pty.openpty()
+        process = subprocess.Popen(
+            cmd,
+            stdin=slave,
+            stdout=slave,
+            stderr=slave,
+            env={**os.environ, **environment},
+            start_new_session=True,
+            # Make the pty the controlling terminal so ctrl+c reaches the shell
+            preexec_fn=lambda: fcntl.ioctl(0, termios.TIOCSCTTY, 0),
+        )
+        os.close(slave)
+        self.processes.append(process)
+
+        session_sock, exec_sock = socket.socketpair()
+
+        def pty_to_socket():
+            try:
+                while data := os.read(master, 4096):
+                    exec_sock.sendall(data)
+            except OSError:
+                pass
+
+        def socket_to_pty():
+            try:
+                while data := exec_sock.recv(4096):
+                    os.write(master, data)
+            except OSError:
+                pass
+
+        threading.Thread(target=pty_to_socket, daemon=True).start()
+        threading.Thread(target=socket_to_pty, daemon=True).start()
+        return SimpleNamespace(_sock=session_sock)
+
+    def exec_inspect(self, exec_id):
+        return {"Running": False}
+
+
+@pytest_asyncio.fixture
+async def local_session(tmp_path):
+    """Fixture providing a DockerSession attached to a local shell."""
+    api = FakeAPIClient()
+    session = DockerSession("fake-container", api=api)
+    await session.create(str(tmp_path), {"TEST_VAR": "test_value"})
+    yield session
+    await session.close()
+    for process in api.processes:
+        process.kill()
+        process.wait()
+
+
+class TestDockerSession:
+    """Test cases for DockerSession I/O, without a Docker daemon."""
+
+    @pytest.mark.asyncio
+    async def test_output_resembling_prompt(self, local_session):
+        """Test output containing "$ " and digits is returned unchanged."""
+        result = await local_session.execute("echo '$ not a prompt'; echo 42")
+        assert result == "$ not a prompt\n42"
+
+    @pytest.mark.asyncio
+    async def test_environment_and_working_directory(self, local_session, tmp_path):
+        """Test the session starts in the working directory with the env vars."""
+        assert await local_session.execute("pwd") == str(tmp_path)
+        assert await local_session.execute("echo $TEST_VAR") == "test_value"
+
+    @pytest.mark.asyncio
+    async def test_large_output(self, local_session):
+        """Test output spanning many reads is collected completely."""
+        result = await local_session.execute("seq 1 20000")
+        lines = result.splitlines()
+        assert len(lines) == 20000
+        assert lines[-1] == "20000"
+
+    @pytest.mark.asyncio
+    async def test_streamed_output(self, local_session):
+        """Test output is passed to the callback before the command finishes."""
+        chunks = []
+        start = time.monotonic()
+        result = await local_session.execute(
+            "for i in 1 2 3; do echo $i; sleep 0.3; done",
+            on_output=lambda chunk: chunks.append((time.monotonic() - start, chunk)),
+        )
+        assert result == "1\n2\n3"
+        assert len(chunks) > 1
+        assert chunks[0][0] < 0.3
+        assert "".join(chunk for _, chunk in chunks).split() == ["1", "2", "3"]
+
+    @pytest.mark.asyncio
+    async def test_timeout_keeps_session_usable(self, local_session):
+        """Test a timed out command is interrupted and the next one still works."""
+        with pytest.raises(TimeoutError):
+            await local_session.execute("sleep 5", timeout=1)
+        assert await local_session.execute("echo after") == "after"
+
+
 # Configure pytest-asyncio
 def pytest_configure(config):
     """Configure pytest-asyncio."""
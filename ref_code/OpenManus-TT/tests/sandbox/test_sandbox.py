@@ -1,5 +1,12 @@
+import io
+import os
+import subprocess
+import tarfile
+
+import docker
 import pytest
 import pytest_asyncio
+from docker.models.containers import ExecResult
 
 from app.sandbox.core.sandbox import DockerSandbox, SandboxSettings
 
@@ -148,5 +155,131 @@ async def test_sandbox_error_handling():
         await sandbox.create()
 
 
+class FakeContainer:
+    """Container stand-in mapping container paths onto a host directory."""
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.round_trips = 0
+
+    def _host_path(self, path):
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def get_archive(self, path):
+        self.round_trips += 1
+        host_path = self._host_path(path)
+        if not os.path.exists(host_path):
+            raise docker.errors.NotFound(f"{path} not found")
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            tar.add(host_path, arcname=os.path.basename(path))
+        data = buffer.getvalue()
+        return (data[i : i + 1000] for i in range(0, len(data), 1000)), {}
+
+    def put_archive(self, path, data):
+        self.round_trips += 1
+        data = data if isinstance(data, bytes) else b"".join(data)
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            tar.extractall(self._host_path(path), filter="data")
+        return True
+
+    def exec_run(self, cmd, stream=False, demux=False, **kwargs):
+        self.round_trips += 1
+        args = [self._host_path(arg) if arg.startswith("/") else arg for arg in cmd]
+        result = subprocess.run(args, capture_output=True)
+        if stream:
+            stdout = result.stdout
+            frames = [(stdout[i : i + 1000], None) for i in range(0, len(stdout), 1000)]
+            return ExecResult(None, iter(frames + [(None, result.stderr)]))
+        return ExecResult(result.returncode, result.stdout + result.stderr)
+
+
+class FakeTerminal:
+    """Terminal stand-in accepting every command."""
+
+    async def run_command(self, cmd, timeout=None, on_output=None):
+        return ""
+
+
+@pytest.fixture
+def fake_sandbox(tmp_path, monkeypatch):
+    """Creates a sandbox whose container is a host directory."""
+    monkeypatch.setattr(docker, "from_env", lambda: None)
+    sandbox = DockerSandbox(SandboxSettings(work_dir="/workspace"))
+    sandbox.container = FakeContainer(tmp_path / "container")
+    sandbox.terminal = FakeTerminal()
+    return sandbox
+
+
+@pytest.mark.asyncio
+async def test_batch_file_transfer(fake_sandbox):
+    """Tests many files are written and read in one round trip each."""
+    files = {
+        "/workspace/file1.txt": "Content 1",
+        "nested/deeper/file2.txt": "Content 2 with ünïcode",
+        "/tmp/file3.txt": "",
+    }
+    await fake_sandbox.write_files(files)
+    assert fake_sandbox.container.round_trips == 1
+
+    contents = await fake_sandbox.read_files(list(files))
+    assert contents == files
+    assert fake_sandbox.container.round_trips == 2
+
+    assert (
+        await fake_sandbox.read_file("nested/deeper/file2.txt")
+        == files["nested/deeper/file2.txt"]
+    )
+
+    with pytest.raises(FileNotFoundError, match="missing.txt"):
+        await fake_sandbox.read_files(["/workspace/file1.txt", "missing.txt"])
+
+
+@pytest.mark.asyncio
+async def test_streaming_copy(fake_sandbox, tmp_path):
+    """Tests large files and directories copy through streamed archives."""
+    src_dir = tmp_path / "src"
+    (src_dir / "sub").mkdir(parents=True)
+    large_content = os.urandom(3 * 1024 * 1024 + 17)
+    (src_dir / "large.bin").write_bytes(large_content)
+    (src_dir / "sub" / "small.txt").write_text("small")
+
+    await fake_sandbox.copy_to(str(src_dir), "/workspace/data")
+    await fake_sandbox.copy_from("/workspace/data/large.bin", str(tmp_path / "out.bin"))
+    assert (tmp_path / "out.bin").read_bytes() == large_content
+    assert await fake_sandbox.read_file("/workspace/data/sub/small.txt") == "small"
+
+
+@pytest.mark.asyncio
+async def test_directory_sync(fake_sandbox, tmp_path):
+    """Tests directory sync only transfers files whose content changed."""
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (local_dir / name).write_text(name)
+
+    stats = await fake_sandbox.sync_to(str(local_dir), "/workspace/project")
+    assert stats == {"uploaded": 3, "unchanged": 0, "deleted": 0}
+
+    (local_dir / "b.txt").write_text("changed")
+    (local_dir / "c.txt").unlink()
+    stats = await fake_sandbox.sync_to(
+        str(local_dir), "/workspace/project", delete=True
+    )
+    assert stats == {"uploaded": 1, "unchanged": 1, "deleted": 1}
+    contents = await fake_sandbox.read_files(
+        ["/workspace/project/a.txt", "/workspace/project/b.txt"]
+    )
+    assert contents["/workspace/project/b.txt"] == "changed"
+    with pytest.raises(FileNotFoundError):
+        await fake_sandbox.read_file("/workspace/project/c.txt")
+
+    # Changes made in the container come back the same way
+    await fake_sandbox.write_files({"/workspace/project/sub/d.txt": "new"})
+    stats = await fake_sandbox.sync_from("/workspace/project", str(local_dir))
+    assert stats == {"downloaded": 1, "unchanged": 2}
+    assert (local_dir / "sub" / "d.txt").read_text() == "new"
+
+
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
@@ -1,11 +1,14 @@
 import asyncio
 import os
 import tempfile
+import time
+from types import SimpleNamespace
 from typing import AsyncGenerator
 
 import pytest
 import pytest_asyncio
 
+from app.config import SandboxSettings
 from app.sandbox.core.manager import SandboxManager
 
 
@@ -134,5 +137,152 @@ async def test_manager_cleanup(manager):
     assert not manager._last_used
 
 
+class FakeDockerClient:
+    """Docker client stand-in where every image is available."""
+
+    images = SimpleNamespace(get=lambda image: image)
+
+
+class FakeSandbox:
+    """Sandbox stand-in whose startup takes a fixed delay."""
+
+    start_delay = 0.2
+    instances = []
+
+    def __init__(self, config=None, volume_bindings=None):
+        self.config = config
+        self.volume_bindings = volume_bindings
+        self.created = False
+        self.cleaned_up = False
+        self.resets = 0
+        self.fail_reset = False
+        FakeSandbox.instances.append(self)
+
+    async def create(self):
+        await asyncio.sleep(self.start_delay)
+        self.created = True
+        return self
+
+    async def reset(self, reset_command):
+        if self.fail_reset:
+            raise RuntimeError("reset failed")
+        self.resets += 1
+
+    async def cleanup(self):
+        self.cleaned_up = True
+
+
+@pytest_asyncio.fixture(scope="function")
+async def pooled_manager() -> AsyncGenerator[SandboxManager, None]:
+    """Creates a sandbox manager with a warm pool backed by fake sandboxes."""
+    FakeSandbox.instances = []
+    manager = SandboxManager(
+        max_sandboxes=5,
+        idle_timeout=60,
+        cleanup_interval=30,
+        pool_size=2,
+        client=FakeDockerClient(),
+        sandbox_factory=FakeSandbox,
+    )
+    try:
+        yield manager
+    finally:
+        await manager.cleanup()
+
+
+async def wait_for_pool(manager: SandboxManager, ready: int) -> None:
+    """Waits until the background refill has reached the given ready count."""
+    for _ in range(50):
+        if manager.get_pool_stats()["ready"] == ready:
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"Pool did not reach {ready} ready sandboxes")
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_hit(pooled_manager):
+    """Tests a warmed pool hands out a started sandbox without waiting."""
+    await pooled_manager.warm_pool()
+    assert pooled_manager.get_pool_stats()["ready"] == 2
+
+    start = time.monotonic()
+    sandbox_id = await pooled_manager.create_sandbox()
+    assert time.monotonic() - start < FakeSandbox.start_delay
+
+    sandbox = await pooled_manager.get_sandbox(sandbox_id)
+    assert sandbox.created
+    stats = pooled_manager.get_pool_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 0
+
+    # The used slot is refilled in the background
+    await wait_for_pool(pooled_manager, 2)
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_miss_then_hit(pooled_manager):
+    """Tests the first request for a configuration misses and fills the pool."""
+    config = SandboxSettings(image="python:3.11-slim")
+    await pooled_manager.create_sandbox(config)
+    assert pooled_manager.get_pool_stats()["misses"] == 1
+
+    await wait_for_pool(pooled_manager, 2)
+    sandbox_id = await pooled_manager.create_sandbox(config)
+    sandbox = await pooled_manager.get_sandbox(sandbox_id)
+    assert sandbox.config.image == "python:3.11-slim"
+    assert pooled_manager.get_pool_stats()["hits"] == 1
+
+    # A different configuration is served by its own pool
+    await pooled_manager.create_sandbox(SandboxSettings(image="python:3.12-slim"))
+    assert pooled_manager.get_pool_stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_volume_bindings_bypass_pool(pooled_manager):
+    """Tests sandboxes with volume bindings are always created fresh."""
+    await pooled_manager.warm_pool()
+    sandbox_id = await pooled_manager.create_sandbox(volume_bindings={"/tmp": "/data"})
+    sandbox = await pooled_manager.get_sandbox(sandbox_id)
+    assert sandbox.volume_bindings == {"/tmp": "/data"}
+    assert pooled_manager.get_pool_stats()["ready"] == 2
+
+    await pooled_manager.delete_sandbox(sandbox_id)
+    assert sandbox.cleaned_up
+
+
+@pytest.mark.asyncio
+async def test_released_sandbox_reset_into_pool(pooled_manager):
+    """Tests a released sandbox is reset and reused when a reset command is set."""
+    pooled_manager.reset_command = "rm -rf /workspace/*"
+    await pooled_manager.warm_pool()
+    sandbox_id = await pooled_manager.create_sandbox()
+    sandbox = await pooled_manager.get_sandbox(sandbox_id)
+
+    # Let the refill finish, then make room for the released sandbox
+    await wait_for_pool(pooled_manager, 2)
+    await pooled_manager.create_sandbox()
+
+    await pooled_manager.delete_sandbox(sandbox_id)
+    assert sandbox.resets == 1
+    assert not sandbox.cleaned_up
+    assert pooled_manager.get_pool_stats()["recycled"] == 1
+
+    # A sandbox that fails to reset is destroyed instead
+    broken_id = await pooled_manager.create_sandbox()
+    broken = await pooled_manager.get_sandbox(broken_id)
+    broken.fail_reset = True
+    await pooled_manager.delete_sandbox(broken_id)
+    assert broken.cleaned_up
+
+
+@pytest.mark.asyncio
+async def test_pooled_sandboxes_cleaned_up(pooled_manager):
+    """Tests manager cleanup also destroys the ready sandboxes."""
+    await pooled_manager.warm_pool()
+    await pooled_manager.cleanup()
+    assert all(sandbox.cleaned_up for sandbox in FakeSandbox.instances)
+    assert pooled_manager.get_pool_stats()["ready"] == 0
+
+
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
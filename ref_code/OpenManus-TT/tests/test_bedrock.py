@@ -0,0 +1,308 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List
+
+import pytest
+
+from app.bedrock import BedrockClient
+
+
+def tool_use_events(text: str, tools: List[Dict]) -> List[Dict]:
+    """Builds the converse_stream events of a reply with text and tool uses."""
+    events = [
+        {"messageStart": {"role": "assistant"}},
+        {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": text}}},
+        {"contentBlockStop": {"contentBlockIndex": 0}},
+    ]
+    for block_index, tool in enumerate(tools, start=1):
+        arguments = json.dumps(tool["input"])
+        half = len(arguments) // 2
+        events += [
+            {
+                "contentBlockStart": {
+                    "contentBlockIndex": block_index,
+                    "start": {
+                        "toolUse": {"toolUseId": tool["id"], "name": tool["name"]}
+                    },
+                }
+            },
+            {
+                "contentBlockDelta": {
+                    "contentBlockIndex": block_index,
+                    "delta": {"toolUse": {"input": arguments[:half]}},
+                }
+            },
+            {
+                "contentBlockDelta": {
+                    "contentBlockIndex": block_index,
+                    "delta": {"toolUse": {"input": arguments[half:]}},
+                }
+            },
+            {"contentBlockStop": {"contentBlockIndex": block_index}},
+        ]
+    events += [
+        {"messageStop": {"stopReason": "tool_use" if tools else "end_turn"}},
+        {
+            "metadata": {
+                "usage": {"inputTokens": 10, "outputTokens": 5, "totalTokens": 15}
+            }
+        },
+    ]
+    return events
+
+
+class EventStream:
+    """Blocking event stream like botocore's, optionally slow."""
+
+    def __init__(self, events: List[Dict], delay: float = 0.0):
+        self.events = events
+        self.delay = delay
+        self.closed = False
+        self.sent = 0
+
+    def __iter__(self):
+        for event in self.events:
+            if self.closed:
+                return
+            time.sleep(self.delay)
+            self.sent += 1
+            yield event
+
+    def close(self):
+        self.closed = True
+
+
+class StubBedrock:
+    """Stands in for the boto3 bedrock-runtime client."""
+
+    def __init__(self, events: List[Dict], delay: float = 0.0):
+        self.events = events
+        self.delay = delay
+        self.requests: List[Dict] = []
+        self.streams: List[EventStream] = []
+
+    def converse_stream(self, **request):
+        self.requests.append(request)
+        stream = EventStream(self.events, self.delay)
+        self.streams.append(stream)
+        return {"stream": stream}
+
+    def converse(self, **request):
+        self.requests.append(request)
+        time.sleep(self.delay)
+        return {
+            "output": {
+                "message": {
+                    "role": "assistant",
+                    "content": [
+                        {"text": "ok"},
+                        {
+                            "toolUse": {
+                                "toolUseId": "t1",
+                                "name": "search",
+                                "input": {"q": "x"},
+                            }
+                        },
+                    ],
+                }
+            },
+            "stopReason": "tool_use",
+            "usage": {"inputTokens": 3, "outputTokens": 2, "totalTokens": 5},
+        }
+
+
+async def collect(stream) -> List:
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_openai_chunks():
+    """Tests text and multiple tool use blocks converted to OpenAI chunks."""
+    tools = [
+        {"id": "t1", "name": "search", "input": {"q": "weather"}},
+        {"id": "t2", "name": "browse", "input": {"url": "http://a.b"}},
+    ]
+    client = BedrockClient(client=StubBedrock(tool_use_events("Hello", tools)))
+    stream = await client.chat.completions.create(
+        model="m",
+        messages=[{"role": "user", "content": "hi"}],
+        max_tokens=10,
+        temperature=0.0,
+        stream=True,
+    )
+    chunks = await collect(stream)
+
+    assert chunks[0].choices[0].delta.role == "assistant"
+    text = "".join(chunk.choices[0].delta.content or "" for chunk in chunks)
+    assert text == "Hello"
+
+    calls: Dict[int, Dict] = {}
+    for chunk in chunks:
+        for tool_call in chunk.choices[0].delta.tool_calls or []:
+            call = calls.setdefault(tool_call.index, {"arguments": ""})
+            if tool_call.id:
+                call["id"] = tool_call.id
+                call["name"] = tool_call.function.name
+            call["arguments"] += tool_call.function.arguments
+    assert [calls[i]["id"] for i in sorted(calls)] == ["t1", "t2"]
+    assert [json.loads(calls[i]["arguments"]) for i in sorted(calls)] == [
+        tool["input"] for tool in tools
+    ]
+
+    last = chunks[-1]
+    assert last.choices[0].finish_reason == "tool_calls"
+    assert last.usage.total_tokens == 15
+    assert all(chunk.id == last.id for chunk in chunks)
+
+
+@pytest.mark.asyncio
+async def test_stream_does_not_block_event_loop():
+    """Tests that other coroutines run while a slow stream is read."""
+    client = BedrockClient(client=StubBedrock(tool_use_events("slow", []), delay=0.05))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker_task = asyncio.create_task(ticker())
+    stream = await client.chat.completions.create(
+        model="m",
+        messages=[{"role": "user", "content": "hi"}],
+        max_tokens=10,
+        temperature=0.0,
+    )
+    await collect(stream)
+    ticker_task.cancel()
+    # Five events at 50ms each leave room for well over ten ticks
+    assert ticks >= 10
+
+
+@pytest.mark.asyncio
+async def test_concurrent_streams_keep_their_tool_ids():
+    """Tests that concurrent requests do not share tool use state."""
+
+    async def run(tool_id: str) -> str:
+        events = tool_use_events("", [{"id": tool_id, "name": "f", "input": {}}])
+        client = BedrockClient(client=StubBedrock(events, delay=0.005))
+        stream = await client.chat.completions.create(
+            model="m",
+            messages=[{"role": "user", "content": "hi"}],
+            max_tokens=10,
+            temperature=0.0,
+        )
+        ids = [
+            tool_call.id
+            for chunk in await collect(stream)
+            for tool_call in chunk.choices[0].delta.tool_calls or []
+            if tool_call.id
+        ]
+        return ids[0]
+
+    tool_ids = [f"tool-{i}" for i in range(8)]
+    assert await asyncio.gather(*(run(tool_id) for tool_id in tool_ids)) == tool_ids
+
+
+@pytest.mark.asyncio
+async def test_closed_stream_stops_worker():
+    """Tests that closing a stream early stops reading the bounded event stream."""
+    events = [{"messageStart": {"role": "assistant"}}] + [
+        {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": "x"}}}
+    ] * 1000
+    stub = StubBedrock(events)
+    client = BedrockClient(client=stub, queue_size=4)
+    stream = await client.chat.completions.create(
+        model="m",
+        messages=[{"role": "user", "content": "hi"}],
+        max_tokens=10,
+        temperature=0.0,
+    )
+    await stream.__anext__()
+    await asyncio.sleep(0.1)
+    # The worker waits for the consumer instead of buffering everything
+    assert stub.streams[0].sent < 10
+
+    stream.close()
+    await asyncio.to_thread(stream._thread.join, 2)
+    assert not stream._thread.is_alive()
+    assert stub.streams[0].closed
+
+
+@pytest.mark.asyncio
+async def test_stream_error_is_raised():
+    """Tests that an error in the worker thread reaches the consumer."""
+
+    class FailingBedrock(StubBedrock):
+        def converse_stream(self, **request):
+            raise RuntimeError("throttled")
+
+    client = BedrockClient(client=FailingBedrock([]))
+    stream = await client.chat.completions.create(
+        model="m",
+        messages=[{"role": "user", "content": "hi"}],
+        max_tokens=10,
+        temperature=0.0,
+    )
+    with pytest.raises(RuntimeError, match="throttled"):
+        await collect(stream)
+
+
+@pytest.mark.asyncio
+async def test_non_streaming_runs_in_thread():
+    """Tests the non-streaming call off the event loop thread."""
+    stub = StubBedrock([])
+    calling_threads = []
+    converse = stub.converse
+
+    def record(**request):
+        calling_threads.append(threading.current_thread())
+        return converse(**request)
+
+    stub.converse = record
+    client = BedrockClient(client=stub)
+    response = await client.chat.completions.create(
+        model="m",
+        messages=[{"role": "user", "content": "hi"}],
+        max_tokens=10,
+        temperature=0.0,
+        stream=False,
+    )
+    assert calling_threads[0] is not threading.current_thread()
+    assert response.choices[0].finish_reason == "tool_calls"
+    assert response.choices[0].message.tool_calls[0].id == "t1"
+
+
+def test_messages_use_tool_call_ids():
+    """Tests that tool results are matched by tool_call_id and grouped."""
+    completions = BedrockClient(client=StubBedrock([])).chat.completions
+    tool_calls = [
+        {
+            "id": f"t{i}",
+            "type": "function",
+            "function": {"name": "f", "arguments": json.dumps({"i": i})},
+        }
+        for i in (1, 2)
+    ]
+    system, messages = completions._convert_openai_messages_to_bedrock_format(
+        [
+            {"role": "system", "content": "sys"},
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": None, "tool_calls": tool_calls},
+            {"role": "tool", "content": "one", "tool_call_id": "t1"},
+            {"role": "tool", "content": "two", "tool_call_id": "t2"},
+        ]
+    )
+    assert system == [{"text": "sys"}]
+    assert [block["toolUse"]["toolUseId"] for block in messages[1]["content"]] == [
+        "t1",
+        "t2",
+    ]
+    assert len(messages) == 3
+    assert [block["toolResult"]["toolUseId"] for block in messages[2]["content"]] == [
+        "t1",
+        "t2",
+    ]
@@ -0,0 +1,325 @@
+import asyncio
+import functools
+import http.server
+import tempfile
+import threading
+from types import SimpleNamespace
+from typing import AsyncGenerator, List
+
+import pytest
+import pytest_asyncio
+from browser_use import Browser as BrowserUseBrowser
+from browser_use import BrowserConfig
+
+from app.tool import browser_pool, browser_use_tool
+from app.tool.browser_pool import (
+    BrowserPool,
+    close_browser_pool,
+    warm_up_browser_pool,
+)
+from app.tool.browser_use_tool import BrowserUseTool
+
+
+class FakePage:
+    """Page reporting a fixed JS heap size."""
+
+    def __init__(self, heap_bytes: int = 0):
+        self.heap_bytes = heap_bytes
+
+    async def evaluate(self, script: str) -> int:
+        return self.heap_bytes
+
+
+class FakeContext:
+    """Context recording its lifecycle instead of driving a page."""
+
+    def __init__(self, browser: "FakeBrowser"):
+        self.browser = browser
+        self.visited: List[str] = []
+        self.closed = False
+        self.session = None
+
+    async def get_current_page(self) -> FakePage:
+        if self.session is None:
+            self.session = SimpleNamespace(context=SimpleNamespace(pages=[FakePage()]))
+        return self.session.context.pages[0]
+
+    async def navigate_to(self, url: str) -> None:
+        self.visited.append(url)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeBrowser:
+    """Browser handing out fake contexts."""
+
+    def __init__(self):
+        self.contexts: List[FakeContext] = []
+        self.closed = False
+
+    async def new_context(self, config=None) -> FakeContext:
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def fake_pool(**kwargs) -> BrowserPool:
+    kwargs.setdefault("browser_factory", FakeBrowser)
+    return BrowserPool(context_config_factory=lambda: None, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_contexts_share_browser():
+    """Tests that sessions get separate contexts of one browser."""
+    pool = fake_pool(max_browsers=2, max_contexts_per_browser=4)
+    first = await pool.acquire()
+    second = await pool.acquire()
+
+    assert first is not second
+    assert first.browser is second.browser
+    assert pool.get_stats()["launched"] == 1
+
+    await pool.release(first)
+    assert first.closed
+    assert not first.browser.closed
+    await pool.close()
+    assert second.browser.closed
+
+
+@pytest.mark.asyncio
+async def test_spreads_over_browsers_and_waits_when_full():
+    """Tests the per-browser context limit and waiting for a free slot."""
+    pool = fake_pool(max_browsers=2, max_contexts_per_browser=1)
+    first = await pool.acquire()
+    second = await pool.acquire()
+    assert first.browser is not second.browser
+
+    waiting = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+
+    await pool.release(first)
+    third = await asyncio.wait_for(waiting, 1)
+    assert third.browser is first.browser
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_recycles_after_max_uses():
+    """Tests that a browser is closed after serving max_uses contexts."""
+    pool = fake_pool(max_browsers=1, max_uses=2)
+    first = await pool.acquire()
+    second = await pool.acquire()
+    browser = first.browser
+
+    await pool.release(first)
+    assert not browser.closed
+    await pool.release(second)
+    assert browser.closed
+
+    third = await pool.acquire()
+    assert third.browser is not browser
+    stats = pool.get_stats()
+    assert stats["launched"] == 2
+    assert stats["recycled"] == 1
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_recycles_over_memory_limit():
+    """Tests that a context exceeding the memory limit recycles its browser."""
+    pool = fake_pool(max_browsers=1, context_memory_limit_mb=1)
+    context = await pool.acquire()
+    page = await context.get_current_page()
+    page.heap_bytes = 2 * 1024 * 1024
+
+    await pool.release(context)
+    assert context.browser.closed
+    assert (await pool.acquire()).browser is not context.browser
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_warm_contexts():
+    """Tests that warm contexts are handed out with the warm-up pages loaded."""
+    pool = fake_pool(warm_contexts=1, warmup_urls=["http://warm.example"])
+    await pool.warm_up()
+    assert pool.get_stats()["warm_contexts"] == 1
+
+    context = await pool.acquire()
+    assert context.visited == ["http://warm.example"]
+    assert pool.get_stats()["warm_hits"] == 1
+
+    # The pool refills in the background
+    await asyncio.sleep(0.05)
+    assert pool.get_stats()["warm_contexts"] == 1
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_context_replaces_browser():
+    """Tests that a browser failing to open a context is replaced."""
+
+    class BrokenBrowser(FakeBrowser):
+        async def new_context(self, config=None):
+            raise RuntimeError("browser crashed")
+
+    browsers = [BrokenBrowser(), FakeBrowser()]
+    pool = fake_pool(max_browsers=1, browser_factory=lambda: browsers.pop(0))
+
+    with pytest.raises(RuntimeError):
+        await pool.acquire()
+    context = await pool.acquire()
+    assert isinstance(context.browser, FakeBrowser)
+    assert pool.get_stats()["recycled"] == 1
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_acquire_keeps_browser():
+    """Tests that giving up on an acquire frees its slot without retiring the browser."""
+    opening = asyncio.Event()
+
+    class SlowBrowser(FakeBrowser):
+        async def new_context(self, config=None):
+            if self.contexts:
+                opening.set()
+                await asyncio.sleep(10)
+            return await super().new_context(config)
+
+    pool = fake_pool(max_browsers=1, browser_factory=SlowBrowser)
+    first = await pool.acquire()
+    pending = asyncio.create_task(pool.acquire())
+    await opening.wait()
+    pending.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await pending
+
+    (pooled,) = pool._browsers
+    assert not pooled.retiring and not pooled.broken
+    assert pooled.active == 1
+    assert not first.browser.closed
+    await pool.release(first)
+    assert pool.get_stats()["launched"] == 1
+    await pool.close()
+
+
+def enable_pool(monkeypatch, pool: BrowserPool, warm_contexts: int = 0) -> None:
+    """Makes the pool the shared one, with pooling enabled in the settings."""
+    settings = SimpleNamespace(
+        browser_config=SimpleNamespace(
+            pool=SimpleNamespace(enabled=True, warm_contexts=warm_contexts)
+        )
+    )
+    monkeypatch.setattr(browser_pool, "_BROWSER_POOL", pool)
+    monkeypatch.setattr(browser_pool, "config", settings)
+    monkeypatch.setattr(browser_use_tool, "config", settings)
+
+
+@pytest.mark.asyncio
+async def test_teardown_closes_shared_pool(monkeypatch):
+    """Tests that the warm-up and teardown helpers start and close the shared pool."""
+    pool = fake_pool(warm_contexts=1)
+    enable_pool(monkeypatch, pool, warm_contexts=1)
+    await warm_up_browser_pool()
+    assert pool.get_stats()["warm_contexts"] == 1
+
+    tool = BrowserUseTool(llm=None)
+    context = await tool._ensure_browser_initialized()
+    await tool.cleanup()
+    (browser,) = {pooled.browser for pooled in pool._browsers}
+    assert context.closed
+    assert not browser.closed
+
+    await close_browser_pool()
+    assert browser.closed
+    assert all(context.closed for context in browser.contexts)
+    assert browser_pool._BROWSER_POOL is None
+    # Closing again, or without a pool, does nothing
+    await close_browser_pool()
+
+
+@pytest.mark.asyncio
+async def test_tool_uses_only_pooled_context(monkeypatch):
+    """Tests that a tool holding a pooled context never launches its own browser."""
+    pool = fake_pool()
+    monkeypatch.setattr(browser_use_tool, "get_browser_pool", lambda: pool)
+    monkeypatch.setattr(
+        browser_use_tool,
+        "config",
+        SimpleNamespace(
+            browser_config=SimpleNamespace(pool=SimpleNamespace(enabled=True))
+        ),
+    )
+    tool = BrowserUseTool(llm=None)
+
+    context = await tool._ensure_browser_initialized()
+    assert await tool._ensure_browser_initialized() is context
+    assert tool.browser is None
+
+    await tool.cleanup()
+    assert context.closed
+    assert not context.browser.closed
+    await pool.close()
+
+
+@pytest.fixture
+def static_server():
+    """Serves a static HTML page from a temporary directory."""
+    with tempfile.TemporaryDirectory() as directory:
+        with open(f"{directory}/index.html", "w") as f:
+            f.write("<html><body><h1>pooled page</h1></body></html>")
+        handler = functools.partial(
+            http.server.SimpleHTTPRequestHandler, directory=directory
+        )
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f"http://127.0.0.1:{server.server_address[1]}/index.html"
+        finally:
+            server.shutdown()
+
+
+@pytest_asyncio.fixture
+async def real_pool() -> AsyncGenerator[BrowserPool, None]:
+    """Creates a pool of headless browsers, skipping if none can be launched."""
+    pool = BrowserPool(
+        max_browsers=1,
+        browser_factory=lambda: BrowserUseBrowser(BrowserConfig(headless=True)),
+    )
+    try:
+        context = await pool.acquire()
+        await context.get_current_page()
+    except Exception as e:
+        await pool.close()
+        pytest.skip(f"No browser available: {e}")
+    await pool.release(context)
+    try:
+        yield pool
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_real_browser_contexts_are_isolated(real_pool, static_server):
+    """Tests pooled contexts of a real browser against a local page."""
+    first = await real_pool.acquire()
+    second = await real_pool.acquire()
+    try:
+        await first.navigate_to(static_server)
+        page = await first.get_current_page()
+        await page.evaluate("() => localStorage.setItem('session', 'first')")
+        assert "pooled page" in await page.content()
+
+        await second.navigate_to(static_server)
+        other = await second.get_current_page()
+        assert await other.evaluate("() => localStorage.getItem('session')") is None
+    finally:
+        await real_pool.release(first)
+        await real_pool.release(second)
+    assert real_pool.get_stats()["launched"] == 1
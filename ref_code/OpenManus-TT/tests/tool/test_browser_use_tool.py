@@ -0,0 +1,158 @@
+import base64
+import io
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from PIL import Image
+
+from app.config import ScreenshotSettings
+from app.llm import TokenCounter
+from app.tool import browser_use_tool
+from app.tool.browser_use_tool import BrowserUseTool, encode_screenshot
+
+
+def noise(width: int, height: int, format: str = "PNG") -> bytes:
+    """Encodes an image of noise, which compresses badly."""
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def jpeg(image_bytes: bytes, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(image_bytes)).convert("RGB").save(
+        buffer, format="JPEG", quality=quality
+    )
+    return buffer.getvalue()
+
+
+def decode(encoded: str) -> bytes:
+    return base64.b64decode(encoded)
+
+
+def test_screenshot_fits_token_budget():
+    """Tests that a large screenshot is downscaled until it fits the budget."""
+    settings = ScreenshotSettings(token_budget=425)
+    screenshot = noise(2560, 1600)
+    assert TokenCounter.high_detail_tokens(2560, 1600) > settings.token_budget
+
+    image = Image.open(io.BytesIO(decode(encode_screenshot(screenshot, settings))))
+
+    assert image.format == "JPEG"
+    assert TokenCounter.high_detail_tokens(*image.size) <= settings.token_budget
+    assert image.size[0] / image.size[1] == pytest.approx(1.6, rel=0.01)
+
+
+def test_quality_lowered_to_min_quality():
+    """Tests that a screenshot over max_bytes ends at min_quality, not below."""
+    screenshot = noise(300, 200)
+    settings = ScreenshotSettings(quality=90, min_quality=30, max_bytes=1)
+
+    assert decode(encode_screenshot(screenshot, settings)) == jpeg(screenshot, 30)
+
+    settings = ScreenshotSettings(quality=90, max_bytes=10_000_000)
+    assert decode(encode_screenshot(screenshot, settings)) == jpeg(screenshot, 90)
+
+
+def test_fitting_jpeg_passes_through():
+    """Tests that a JPEG within both limits is returned as it was captured."""
+    screenshot = noise(300, 200, format="JPEG")
+
+    assert decode(encode_screenshot(screenshot, ScreenshotSettings())) == screenshot
+
+
+class FakePage:
+    """Page whose text, and so its state hash, can be changed."""
+
+    def __init__(self):
+        self.text = "first"
+
+    async def bring_to_front(self) -> None:
+        pass
+
+    async def wait_for_load_state(self) -> None:
+        pass
+
+    async def evaluate(self, script: str) -> str:
+        return self.text
+
+
+class FakeContext:
+    """Context returning a state with a viewport screenshot of the page."""
+
+    def __init__(self):
+        self.page = FakePage()
+        self.screenshot = base64.b64encode(noise(300, 200, format="JPEG")).decode()
+
+    async def get_state(self) -> SimpleNamespace:
+        return SimpleNamespace(
+            url="https://example.com",
+            title="Example",
+            tabs=[],
+            element_tree=None,
+            viewport_info=None,
+            screenshot=self.screenshot,
+        )
+
+    async def get_current_page(self) -> FakePage:
+        return self.page
+
+
+@pytest.fixture
+def encoded(monkeypatch) -> List[bytes]:
+    """Records the screenshots the tool encodes."""
+    calls: List[bytes] = []
+
+    def record(screenshot: bytes, settings: ScreenshotSettings) -> str:
+        calls.append(screenshot)
+        return encode_screenshot(screenshot, settings)
+
+    monkeypatch.setattr(browser_use_tool, "encode_screenshot", record)
+    return calls
+
+
+def use_settings(monkeypatch, settings: ScreenshotSettings) -> None:
+    monkeypatch.setattr(
+        BrowserUseTool, "_get_screenshot_settings", staticmethod(lambda: settings)
+    )
+
+
+@pytest.mark.asyncio
+async def test_unchanged_state_skips_screenshot(monkeypatch, encoded):
+    """Tests that a repeated state has no screenshot and a revisited one is cached."""
+    use_settings(monkeypatch, ScreenshotSettings(skip_unchanged=True))
+    tool = BrowserUseTool(llm=None)
+    context = FakeContext()
+
+    first = await tool.get_current_state(context)
+    assert first.base64_image is not None
+    assert (await tool.get_current_state(context)).base64_image is None
+
+    context.page.text = "second"
+    assert (await tool.get_current_state(context)).base64_image is not None
+    context.page.text = "first"
+    revisited = await tool.get_current_state(context)
+
+    assert revisited.base64_image == first.base64_image
+    assert len(encoded) == 2
+
+
+@pytest.mark.asyncio
+async def test_unchanged_state_reuses_cached_screenshot(monkeypatch, encoded):
+    """Tests that without skipping, a repeated state gets the cached screenshot."""
+    use_settings(monkeypatch, ScreenshotSettings(skip_unchanged=False))
+    tool = BrowserUseTool(llm=None)
+    context = FakeContext()
+
+    first = await tool.get_current_state(context)
+    second = await tool.get_current_state(context)
+
+    assert first.base64_image is not None
+    assert second.base64_image == first.base64_image
+    assert len(encoded) == 1
+
+    await tool.cleanup()
+    assert (await tool.get_current_state(context)).base64_image is not None
+    assert len(encoded) == 2
@@ -0,0 +1,90 @@
+import json
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from app.tool.deep_research import FALLBACK_RELEVANCE_SCORE, DeepResearch
+from app.tool.web_search import SearchResult
+
+
+class FakeLLM:
+    """Answers every tool request with the given arguments, recording prompts."""
+
+    def __init__(self, arguments: dict):
+        self.arguments = arguments
+        self.prompts: List[str] = []
+
+    async def ask_tool(self, messages, **kwargs):
+        self.prompts.append(messages[0]["content"])
+        function = SimpleNamespace(arguments=json.dumps(self.arguments))
+        return SimpleNamespace(tool_calls=[SimpleNamespace(function=function)])
+
+
+def page(index: int) -> SearchResult:
+    return SearchResult(
+        position=index,
+        url=f"https://example.com/{index}",
+        title=f"Page {index}",
+        source="test",
+        raw_content=f"Content of page {index}",
+    )
+
+
+def test_parse_insights_skips_malformed_items():
+    """Tests that bad items are dropped or coerced one by one."""
+    insights = DeepResearch._parse_insights(
+        [
+            "not an insight",
+            {"content": "", "relevance_score": 0.9},
+            {"content": "high", "relevance_score": "high"},
+            {"content": "string score", "relevance_score": "0.4"},
+            {"content": "out of range", "relevance_score": 7},
+            {"content": "one too many", "relevance_score": 0.1},
+        ],
+        "https://example.com",
+        "Example",
+    )
+
+    assert [(i.content, i.relevance_score) for i in insights] == [
+        ("high", FALLBACK_RELEVANCE_SCORE),
+        ("string score", 0.4),
+        ("out of range", 1.0),
+    ]
+
+
+def test_parse_insights_ignores_non_list():
+    """Tests that insights which are not a list count as none."""
+    assert DeepResearch._parse_insights({"content": "x"}, "u", "t") == []
+
+
+@pytest.mark.asyncio
+async def test_malformed_insight_does_not_abort_batch():
+    """Tests that one page's malformed insights leave the others' in place."""
+    llm = FakeLLM(
+        {
+            "sources": [
+                {
+                    "source_id": 0,
+                    "insights": [
+                        42,
+                        {"content": "first page", "relevance_score": "high"},
+                    ],
+                },
+                {
+                    "source_id": 1,
+                    "insights": [{"content": "second page", "relevance_score": 0.9}],
+                },
+                "not a source",
+            ]
+        }
+    )
+    tool = DeepResearch.model_construct(llm=llm)
+
+    insights = await tool._analyze_batch([page(0), page(1)], "query")
+
+    assert [(i.source_url, i.content) for i in insights] == [
+        ("https://example.com/0", "first page"),
+        ("https://example.com/1", "second page"),
+    ]
+    assert len(llm.prompts) == 1
@@ -0,0 +1,180 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from mcp import ClientSession
+from mcp.types import CallToolResult, TextContent
+
+from app.tool.mcp import MCPClients, MCPRequestMultiplexer, MCPToolCatalogCache
+
+
+TOOLS = [
+    {
+        "name": "echo",
+        "description": "Echo text",
+        "inputSchema": {"type": "object", "properties": {"text": {"type": "string"}}},
+    }
+]
+
+
+def test_catalog_cache_keyed_by_config(tmp_path):
+    """Tests that catalogs are stored per server config."""
+    cache = MCPToolCatalogCache(str(tmp_path))
+    config = {"type": "stdio", "command": "python", "args": ["server.py"]}
+    cache.save(config, TOOLS)
+
+    assert cache.load(dict(reversed(config.items()))) == TOOLS
+    assert cache.load({**config, "args": ["other.py"]}) is None
+
+
+def test_catalog_cache_ignores_corrupt_file(tmp_path):
+    """Tests that an unreadable cache entry counts as missing."""
+    cache = MCPToolCatalogCache(str(tmp_path))
+    config = {"type": "sse", "url": "http://localhost:8000/sse"}
+    cache.save(config, TOOLS)
+    cache._path(config).write_text("{not json")
+
+    assert cache.load(config) is None
+
+
+@pytest.mark.asyncio
+async def test_cached_tools_are_updated_in_place():
+    """Tests that cached tool proxies pick up the live session once connected."""
+    clients = MCPClients()
+    clients._ready["srv"] = asyncio.get_running_loop().create_future()
+    clients._register_tools("srv", None, TOOLS)
+    cached = clients.tool_map["mcp_srv_echo"]
+    version = clients.tools_version
+
+    session = MagicMock(spec=ClientSession)
+    clients._register_tools("srv", session, TOOLS + [{**TOOLS[0], "name": "reverse"}])
+    assert clients.tool_map["mcp_srv_echo"] is cached
+    assert cached.session is session
+    assert set(clients.tool_map) == {"mcp_srv_echo", "mcp_srv_reverse"}
+    assert clients.tools_version > version
+
+    # Tools the server no longer offers are dropped
+    clients._register_tools("srv", session, TOOLS)
+    assert set(clients.tool_map) == {"mcp_srv_echo"}
+
+
+@pytest.mark.asyncio
+async def test_cached_tool_waits_for_connection():
+    """Tests that calling a cached tool waits for the server's handshake."""
+    clients = MCPClients()
+    ready = asyncio.get_running_loop().create_future()
+    clients._ready["srv"] = ready
+    clients._register_tools("srv", None, TOOLS)
+    tool = clients.tool_map["mcp_srv_echo"]
+
+    class Session:
+        async def call_tool(self, name, arguments):
+            return type("Result", (), {"content": []})()
+
+    call = asyncio.create_task(tool.execute(text="hi"))
+    await asyncio.sleep(0.05)
+    assert not call.done()
+
+    clients._register_tools("srv", Session(), TOOLS)
+    ready.set_result(None)
+    result = await asyncio.wait_for(call, 1)
+    assert result.output == "No output returned."
+
+
+class SlowSession:
+    """Session whose tool calls take a given time, recording notifications."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._request_id = 0
+        self.running = 0
+        self.max_running = 0
+        self.notifications = []
+
+    async def call_tool(self, name, arguments=None):
+        self._request_id += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return CallToolResult(content=[TextContent(type="text", text=name)])
+
+    async def send_notification(self, notification):
+        self.notifications.append(notification)
+
+
+class SessionWithoutIds:
+    """Session whose tool calls hang, with no request id counter to read."""
+
+    def __init__(self):
+        self.notifications = []
+
+    async def call_tool(self, name, arguments=None):
+        await asyncio.sleep(1.0)
+
+    async def send_notification(self, notification):
+        self.notifications.append(notification)
+
+
+@pytest.mark.asyncio
+async def test_multiplexer_limits_in_flight_calls():
+    """Tests that calls beyond max_in_flight queue."""
+    session = SlowSession(0.05)
+    multiplexer = MCPRequestMultiplexer(session, max_in_flight=2)
+    await asyncio.gather(*(multiplexer.call_tool("f") for _ in range(6)))
+
+    assert session.max_running == 2
+    stats = multiplexer.get_stats()
+    assert stats["ok"] == 6
+    assert stats["max_queue_time"] >= 0.05
+    assert len(multiplexer.recent_calls) == 6
+
+
+@pytest.mark.asyncio
+async def test_multiplexer_cancels_call_past_deadline():
+    """Tests that a timed out call is cancelled on the server."""
+    session = SlowSession(0.0)
+    multiplexer = MCPRequestMultiplexer(session, call_timeout=0.05)
+    await multiplexer.call_tool("first")
+    session.delay = 1.0
+
+    with pytest.raises(asyncio.TimeoutError):
+        await multiplexer.call_tool("second")
+
+    (notification,) = session.notifications
+    assert notification.model_dump(by_alias=True, exclude_none=True) == {
+        "method": "notifications/cancelled",
+        "params": {"requestId": 1, "reason": "Call timed out after 0.05 seconds"},
+    }
+    assert multiplexer.get_stats()["timeout"] == 1
+    assert multiplexer.get_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_multiplexer_skips_cancel_without_request_id():
+    """Tests that a session not exposing request ids gets no cancellation."""
+    session = SessionWithoutIds()
+    multiplexer = MCPRequestMultiplexer(session, call_timeout=0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await multiplexer.call_tool("slow")
+
+    assert session.notifications == []
+    assert multiplexer.get_stats()["timeout"] == 1
+
+
+@pytest.mark.asyncio
+async def test_multiplexer_coalesces_equal_calls():
+    """Tests that concurrent equal calls share one request."""
+    session = SlowSession(0.05)
+    multiplexer = MCPRequestMultiplexer(session, coalesce_calls=True)
+    results = await asyncio.gather(
+        *(multiplexer.call_tool("f", {"x": 1}) for _ in range(3)),
+        multiplexer.call_tool("f", {"x": 2}),
+    )
+
+    assert session._request_id == 2
+    assert all(result.content[0].text == "f" for result in results)
+    assert multiplexer.get_stats()["coalesced"] == 2
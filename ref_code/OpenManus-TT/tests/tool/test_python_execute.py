@@ -0,0 +1,133 @@
+import sys
+from typing import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+
+from app.tool.python_execute import PythonExecute
+
+
+# Burns the given seconds of CPU time in the kernel
+BURN_CPU = """
+import time
+start = time.process_time()
+while time.process_time() - start < {seconds}:
+    pass
+"""
+
+
+@pytest_asyncio.fixture
+async def tool() -> AsyncGenerator[PythonExecute, None]:
+    """Creates the tool, stopping its kernels afterwards."""
+    tool = PythonExecute()
+    try:
+        yield tool
+    finally:
+        await tool.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_state_kept_across_calls(tool):
+    """Tests that globals of one call are visible to the next."""
+    await tool.execute("x = 41")
+    result = await tool.execute("print(x + 1)")
+
+    assert result == {"observation": "42\n", "success": True}
+
+
+@pytest.mark.asyncio
+async def test_error_keeps_state(tool):
+    """Tests that an exception is reported and the session survives it."""
+    await tool.execute("x = 1")
+    result = await tool.execute("raise ValueError('boom')")
+    assert not result["success"]
+    assert "ValueError: boom" in result["observation"]
+
+    assert (await tool.execute("print(x)"))["observation"] == "1\n"
+
+
+@pytest.mark.asyncio
+async def test_timeout_interrupts_and_keeps_state(tool):
+    """Tests that a timed out call is interrupted without losing the session."""
+    await tool.execute("x = 'kept'")
+    result = await tool.execute("print('started')\nwhile True:\n    pass", timeout=1)
+
+    assert not result["success"]
+    assert result["observation"].startswith("started\n")
+    assert "Execution timeout after 1 seconds" in result["observation"]
+    assert "restarted" not in result["observation"]
+    assert (await tool.execute("print(x)"))["observation"] == "kept\n"
+
+
+@pytest.mark.asyncio
+async def test_uninterruptible_code_restarts_kernel(tool, monkeypatch):
+    """Tests that code ignoring the interrupt is killed and the session restarted."""
+    monkeypatch.setattr(PythonExecute, "interrupt_grace", 0.5)
+    await tool.execute("x = 1")
+    result = await tool.execute(
+        "import signal\n"
+        "signal.signal(signal.SIGINT, signal.SIG_IGN)\n"
+        "while True:\n"
+        "    pass",
+        timeout=1,
+    )
+
+    assert not result["success"]
+    assert "restarted" in result["observation"]
+    result = await tool.execute("print(x)")
+    assert "NameError" in result["observation"]
+    assert (await tool.execute("print('alive')"))["observation"] == "alive\n"
+
+
+@pytest.mark.asyncio
+async def test_exited_kernel_restarts(tool):
+    """Tests that a kernel exiting during a call is replaced on the next one."""
+    result = await tool.execute("print('bye')\nimport os\nos._exit(3)")
+
+    assert not result["success"]
+    assert "exited unexpectedly" in result["observation"]
+    assert (await tool.execute("print('back')"))["observation"] == "back\n"
+
+
+@pytest.mark.asyncio
+async def test_explicit_restart_discards_state(tool):
+    """Tests that restart gives the session a fresh kernel."""
+    await tool.execute("x = 1")
+    result = await tool.execute("print('x' in globals())", restart=True)
+
+    assert result["observation"] == "False\n"
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_isolated_and_evicted_lru(tool):
+    """Tests per-session globals and stopping the least recently used kernel."""
+    tool.max_kernels = 2
+    await tool.execute("name = 'a'", session_id="a")
+    await tool.execute("name = 'b'", session_id="b")
+    # Using a makes b the least recently used session
+    assert (await tool.execute("print(name)", session_id="a"))["observation"] == "a\n"
+    await tool.execute("name = 'c'", session_id="c")
+
+    assert list(tool._kernels) == ["a", "c"]
+    assert (await tool.execute("print(name)", session_id="a"))["observation"] == "a\n"
+    result = await tool.execute("print(name)", session_id="b")
+    assert "NameError" in result["observation"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="resource limits need POSIX")
+async def test_cpu_limit_applies_per_call():
+    """Tests that the CPU limit is a per-call budget, not one for the session."""
+    tool = PythonExecute(cpu_limit=1)
+    try:
+        await tool.execute("x = 'kept'")
+        for _ in range(4):
+            result = await tool.execute(BURN_CPU.format(seconds=0.7), timeout=10)
+            assert result["success"], result
+
+        result = await tool.execute("while True:\n    pass", timeout=10)
+        assert not result["success"]
+        assert "CPU time limit of 1 seconds exceeded" in result["observation"]
+        assert (await tool.execute("print(x)"))["observation"] == "kept\n"
+    finally:
+        await tool.cleanup()
@@ -0,0 +1,170 @@
+from pathlib import Path
+
+import pytest
+
+from app.exceptions import ToolError
+from app.tool.file_operators import LocalFileOperator
+from app.tool.str_replace_editor import StrReplaceEditor
+
+
+LINES = "".join(f"line {i}\n" for i in range(1, 9))
+
+
+class UnversionedOperator(LocalFileOperator):
+    """Local operator that, like the sandbox one, cannot tell file versions."""
+
+    def __init__(self):
+        self.reads = 0
+
+    async def read_file(self, path) -> str:
+        self.reads += 1
+        return await super().read_file(path)
+
+    async def get_version(self, path):
+        return None
+
+
+@pytest.fixture
+def editor(monkeypatch) -> StrReplaceEditor:
+    """Creates an editor working on the local filesystem."""
+    operator = LocalFileOperator()
+    monkeypatch.setattr(StrReplaceEditor, "_get_operator", lambda self: operator)
+    return StrReplaceEditor()
+
+
+@pytest.fixture
+def path(tmp_path) -> Path:
+    path = tmp_path / "file.txt"
+    path.write_text(LINES)
+    return path
+
+
+@pytest.mark.asyncio
+async def test_unversioned_files_are_not_cached(monkeypatch, path):
+    """Tests that files whose version is unknown are read every time, not cached."""
+    operator = UnversionedOperator()
+    monkeypatch.setattr(StrReplaceEditor, "_get_operator", lambda self: operator)
+    editor = StrReplaceEditor()
+
+    await editor.execute(command="view", path=str(path))
+    await editor.execute(
+        command="str_replace", path=str(path), old_str="line 2", new_str="two"
+    )
+    result = await editor.execute(command="view", path=str(path), view_range=[2, 2])
+
+    assert "two" in result
+    assert operator.reads == 3
+    assert not editor._file_cache
+
+
+def expected_view(editor: StrReplaceEditor, path: Path, start: int, end: int) -> str:
+    """Formats lines of the file on disk as a view of them, by splitting it."""
+    lines = path.read_text().split("\n")
+    selected = lines[start - 1 :] if end == -1 else lines[start - 1 : end]
+    return editor._make_output("\n".join(selected), str(path), init_line=start)
+
+
+async def assert_views_match(editor: StrReplaceEditor, path: Path) -> None:
+    """Checks every view range of the file against the content on disk."""
+    line_count = len(path.read_text().split("\n"))
+    for start in range(1, line_count + 1):
+        for end in [-1, *range(start, line_count + 1)]:
+            result = await editor.execute(
+                command="view", path=str(path), view_range=[start, end]
+            )
+            assert result == expected_view(editor, path, start, end), (start, end)
+
+
+@pytest.mark.asyncio
+async def test_view_ranges_at_start_and_end(editor, path):
+    """Tests view ranges touching the first and the last lines."""
+    first = await editor.execute(command="view", path=str(path), view_range=[1, 2])
+    assert first.split("\n")[1:-1] == ["     1\tline 1", "     2\tline 2"]
+
+    last = await editor.execute(command="view", path=str(path), view_range=[8, -1])
+    assert last.split("\n")[1:-1] == ["     8\tline 8", "     9\t"]
+
+    await assert_views_match(editor, path)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content", [LINES, LINES.rstrip("\n")])
+async def test_insert_at_first_and_last_line(editor, path, content):
+    """Tests inserting before the first line and after the last one, and undoing it."""
+    path.write_text(content)
+    line_count = len(content.split("\n"))
+    # Builds the cached line index, which the inserts update in place
+    await editor.execute(command="view", path=str(path))
+
+    await editor.execute(command="insert", path=str(path), insert_line=0, new_str="top")
+    assert path.read_text() == "top\n" + content
+    await editor.execute(
+        command="insert",
+        path=str(path),
+        insert_line=line_count + 1,
+        new_str="bottom\nend",
+    )
+    assert path.read_text() == "top\n" + content + "\nbottom\nend"
+    await assert_views_match(editor, path)
+
+    await editor.execute(command="undo_edit", path=str(path))
+    assert path.read_text() == "top\n" + content
+    await editor.execute(command="undo_edit", path=str(path))
+    assert path.read_text() == content
+    await assert_views_match(editor, path)
+
+
+@pytest.mark.asyncio
+async def test_str_replace_then_undo(editor, path):
+    """Tests edits changing the line count, their views, and undoing them in order."""
+    await editor.execute(command="view", path=str(path))
+
+    await editor.execute(
+        command="str_replace",
+        path=str(path),
+        old_str="line 2\nline 3\n",
+        new_str="two and three\n",
+    )
+    after_first = LINES.replace("line 2\nline 3\n", "two and three\n")
+    assert path.read_text() == after_first
+    await editor.execute(
+        command="str_replace", path=str(path), old_str="line 7", new_str="7\n7b\n7c"
+    )
+    assert path.read_text() == after_first.replace("line 7", "7\n7b\n7c")
+    await assert_views_match(editor, path)
+
+    await editor.execute(command="undo_edit", path=str(path))
+    assert path.read_text() == after_first
+    await editor.execute(command="undo_edit", path=str(path))
+    assert path.read_text() == LINES
+    await assert_views_match(editor, path)
+    with pytest.raises(ToolError, match="No edit history"):
+        await editor.execute(command="undo_edit", path=str(path))
+
+
+@pytest.mark.asyncio
+async def test_undo_after_tab_expansion(editor, path):
+    """Tests that undoing an edit restores the tabs it expanded."""
+    content = "def f():\n\treturn 1\n\tpass\n"
+    path.write_text(content)
+
+    await editor.execute(
+        command="str_replace", path=str(path), old_str="return 1", new_str="return 2"
+    )
+    assert path.read_text() == "def f():\n        return 2\n        pass\n"
+
+    await editor.execute(command="undo_edit", path=str(path))
+    assert path.read_text() == content
+
+
+@pytest.mark.asyncio
+async def test_undo_refused_after_external_edit(editor, path):
+    """Tests that an edit is not undone over changes made outside the editor."""
+    await editor.execute(
+        command="str_replace", path=str(path), old_str="line 4", new_str="four"
+    )
+    path.write_text(path.read_text() + "appended elsewhere\n")
+
+    with pytest.raises(ToolError, match="was modified since the last edit"):
+        await editor.execute(command="undo_edit", path=str(path))
+    assert path.read_text().endswith("appended elsewhere\n")
@@ -0,0 +1,55 @@
+from app.tool.web_search import WebContentFetcher
+
+
+ARTICLE_TEXT = " ".join(f"Sentence {i} of the article body." for i in range(40))
+
+
+def page(body: str) -> str:
+    return f"<html><head><title>t</title></head><body>{body}</body></html>"
+
+
+def test_drops_page_chrome():
+    """Tests that navigation, sidebars and scripts are removed."""
+    text = WebContentFetcher.extract_text(
+        page(
+            "<nav>Home | About</nav>"
+            '<div class="sidebar">Popular posts</div>'
+            "<script>var tracking = 1;</script>"
+            f"<article><p>{ARTICLE_TEXT}</p></article>"
+            '<div id="comments">First!</div>'
+        )
+    )
+
+    assert ARTICLE_TEXT in text
+    for chrome in ("Home | About", "Popular posts", "tracking", "First!"):
+        assert chrome not in text
+
+
+def test_keeps_chrome_named_wrapper_of_article():
+    """Tests that a wrapper with a chrome-like class keeps the article inside."""
+    text = WebContentFetcher.extract_text(
+        page(
+            '<div class="page has-sidebar">'
+            f"<article><p>{ARTICLE_TEXT}</p></article>"
+            '<div class="sidebar">Popular posts</div>'
+            "</div>"
+        )
+    )
+
+    assert ARTICLE_TEXT in text
+    assert "Popular posts" not in text
+
+
+def test_keeps_chrome_named_wrapper_of_most_text():
+    """Tests that a wrapper holding most of the page's text is kept."""
+    text = WebContentFetcher.extract_text(
+        page(
+            '<div id="main" class="content share-buttons-enabled">'
+            f"<p>{ARTICLE_TEXT}</p>"
+            '<div class="share">Share on social media</div>'
+            "</div>"
+        )
+    )
+
+    assert ARTICLE_TEXT in text
+    assert "Share on social media" not in text
@@ -1,4 +1,36 @@
-from .agent import *
-from .prompt import *
-from .tool import *
-from .logger import *
+import importlib
+
+# 顶层包不再一次性导入所有子包（openai、pydantic、baidusearch等库导入都比较慢），用到哪个名字再导入对应的子包
+_LAZY_IMPORTS = {
+    "ToolCallingAgent": "agent",
+    "ToolManager": "agent",
+    "MemoryManager": "agent",
+    "MemoryCompressor": "agent",
+    "LLM": "agent",
+    "BaseToolResultStore": "agent",
+    "MemoryToolResultStore": "agent",
+    "DiskToolResultStore": "agent",
+    "SYSTEM_PROMPT": "prompt",
+    "NEXT_STEP_PROMPT": "prompt",
+    "FINAL_STEP_PROMPT": "prompt",
+    "COMPRESS_PROMPT": "prompt",
+    "terminate": "tool",
+    "get_current_time": "tool",
+    "add": "tool",
+    "baidu_search": "tool",
+}
+_SUBPACKAGES = ["agent", "prompt", "tool", "logger"]
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name: str):
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(f".{_LAZY_IMPORTS[name]}", __name__)
+        value = getattr(module, name)
+        # 导入一次后放进模块的全局变量，下次访问不再走__getattr__
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,25 @@
-from .agent import ToolCallingAgent
-from .tool_manager import ToolManager
-from .memory_manager import MemoryManager
-from .llm import LLM
+import importlib
+
+# 用到哪个类再导入对应的模块，只用工具管理器时不必导入openai等大模型相关的库
+_LAZY_IMPORTS = {
+    "ToolCallingAgent": "agent",
+    "ToolManager": "tool_manager",
+    "MemoryManager": "memory_manager",
+    "MemoryCompressor": "memory_compressor",
+    "LLM": "llm",
+    "BaseToolResultStore": "tool_result_store",
+    "MemoryToolResultStore": "tool_result_store",
+    "DiskToolResultStore": "tool_result_store",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(f".{_LAZY_IMPORTS[name]}", __name__)
+        value = getattr(module, name)
+        # 导入一次后放进模块的全局变量，下次访问不再走__getattr__
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,14 @@
-from typing import List, Dict, Optional, Callable
+from typing import List, Dict, Optional, Callable, Union
+import asyncio
 import json
 from .memory_manager import MemoryManager
+from .memory_compressor import MemoryCompressor
+from .tool_result_store import BaseToolResultStore
 from .tool_manager import ToolManager
 from .llm import LLM
 from loguru import logger
 from ..prompt import NEXT_STEP_PROMPT, FINAL_STEP_PROMPT
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class BaseAgent(BaseModel):
@@ -52,13 +55,27 @@ class ToolCallingAgent(BaseAgent):
         tool_manager (ToolManager): 工具管理器（继承自BaseAgent）
         memory_manager (MemoryManager): 记忆管理器（继承自BaseAgent）
         max_step (int): 最大步骤，默认10
+        memory_compressor (MemoryCompressor, optional): 记忆压缩器，默认None表示不压缩记忆
+        tool_result_store (BaseToolResultStore, optional): 工具结果存储，设置后过长的工具结果只在上下文中保留预览和句柄，默认None表示不转存
     """
     max_step: int = Field(default=10, description="最大步骤")
+    memory_compressor: Optional[MemoryCompressor] = Field(
+        default=None, description="记忆压缩器")
+    tool_result_store: Optional[BaseToolResultStore] = Field(
+        default=None, description="工具结果存储")
     next_step_prompt: str = Field(default=NEXT_STEP_PROMPT,
                                   description="下一步提示")
     final_step_prompt: str = Field(default=FINAL_STEP_PROMPT,
                                    description="最后一步提示")
 
+    @model_validator(mode="after")
+    def register_builtin_tools(self) -> "ToolCallingAgent":
+        """设置了工具结果存储时，自动注册分段读取工具结果的内置工具"""
+        if self.tool_result_store is not None:
+            self.add_tool(self.tool_result_store.read_tool_result,
+                          tool_name=self.tool_result_store.tool_name)
+        return self
+
     # React框架，先think（reasoning），再act
     async def think(self, message: List[Dict]) -> bool:
         """使用大模型进行思考，返回是否需要使用工具
@@ -69,10 +86,17 @@ class ToolCallingAgent(BaseAgent):
         Returns:
             bool: 是否需要使用工具
         """
-        # 添加终止提示
-        message.append({"role": "user", "content": self.next_step_prompt})
+        # 添加下一步提示：只在构建本次请求时临时叠加，不能直接append到message上
+        # 因为message就是记忆模块里的列表本身，append会让每一步都在记忆里永久多一份提示
+        request_messages = [
+            *message, {
+                "role": "user",
+                "content": self.next_step_prompt
+            }
+        ]
         response = await self.llm.chat(
-            messages=message, tools=self.tool_manager.get_tool_schema_list())
+            messages=request_messages,
+            tools=self.tool_manager.get_tool_schema_list())
 
         # 回复内容全部加入记忆模块，加入的得是字典
         self.memory_manager.add_message(response.model_dump())
@@ -117,6 +141,10 @@ class ToolCallingAgent(BaseAgent):
                         tool_name, **tool_arguments)
                 logger.info(f"工具{tool_name}执行成功")
 
+                # 过长的工具结果转存，上下文中只保留预览和句柄
+                if self.tool_result_store is not None and tool_name != self.tool_result_store.tool_name:
+                    tool_result = self.tool_result_store.offload(tool_result)
+
                 # 然后是一个tool message
                 tool_message = {
                     "role": "tool",
@@ -162,7 +190,11 @@ class ToolCallingAgent(BaseAgent):
             # 获取最新的message
             logger.warning(f"智能体正在行动……")
             current_message = self.memory_manager.get_memory()[-1]
+            # 记忆过长时，压缩和工具执行并发进行，不额外增加每一步的耗时
+            compress_task = self._start_compress()
             should_terminate = await self.act(current_message)
+            if compress_task:
+                await compress_task
             if should_terminate:
                 return True
             else:
@@ -170,6 +202,26 @@ class ToolCallingAgent(BaseAgent):
         else:
             return False
 
+    def _start_compress(self) -> Optional[asyncio.Task]:
+        """记忆超过阈值时在后台启动压缩任务
+
+        Returns:
+            Optional[asyncio.Task]: 压缩任务，不需要压缩时返回None
+        """
+        if self.memory_compressor is None or not self.memory_compressor.should_compress(
+                self.memory_manager):
+            return None
+
+        async def compress():
+            # 压缩失败不影响智能体运行，大不了这一步不压缩
+            try:
+                await self.memory_compressor.compress(self.memory_manager)
+            except Exception as e:
+                logger.error(f"记忆压缩失败，错误信息：{e}")
+
+        logger.warning(f"记忆过长，正在后台压缩记忆……")
+        return asyncio.create_task(compress())
+
     async def run(self, message: List[Dict]):
         """运行完整轮数的react过程
 
@@ -230,6 +282,12 @@ class ToolCallingAgent(BaseAgent):
         return decorator
 
     def add_tool(self,
-                 func: Callable,
+                 func: Union[Callable, str],
                  tool_name: Optional[str] = None) -> None:
+        """注册工具
+
+        Args:
+            func (Union[Callable, str]): 要注册的工具函数，也可以是"模块路径:函数名"形式的导入路径，用到时才导入
+            tool_name (Optional[str]): 工具名称，如果为None，则使用函数名作为工具名称
+        """
         self.tool_manager.register_tool(func, tool_name)
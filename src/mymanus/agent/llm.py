@@ -65,8 +65,6 @@ class LLM:
             request_params = {
                 "model": self.model,
                 "messages": messages,
-                "tool_choice":
-                self.tool_choice if tool_choice is None else tool_choice,
                 "max_tokens":
                 self.max_tokens if max_tokens is None else max_tokens,
                 "temperature":
@@ -83,17 +81,22 @@ class LLM:
                     "enable_thinking": self.enable_thinking
                 }
 
-            # 如果有工具,添加工具相关参数
+            # 如果有工具,添加工具相关参数，没有工具时不能传tool_choice，否则接口会报错
             if tools:
                 request_params["tools"] = tools
+                request_params[
+                    "tool_choice"] = self.tool_choice if tool_choice is None else tool_choice
 
             # 调用API
             if not request_params["stream"]:
                 # 非流式请求
                 response = await self.client.chat.completions.create(
                     **request_params)
-                # 更新：把推理过程print出来但不保存
-                print(f"推理过程：{response.choices[0].message.reasoning_content}")
+                # 更新：把推理过程print出来但不保存，不是每个大模型都有reasoning_content字段
+                reasoning_content = getattr(response.choices[0].message,
+                                            "reasoning_content", None)
+                if reasoning_content:
+                    print(f"推理过程：{reasoning_content}")
                 return response.choices[0].message
             else:
                 # 流式请求
@@ -0,0 +1,131 @@
+from typing import List, Dict, Optional, Tuple
+import uuid
+from loguru import logger
+from .llm import LLM
+from .memory_manager import MemoryManager
+from ..prompt import COMPRESS_PROMPT
+
+
+class MemoryCompressor:
+    """记忆压缩器，记忆的token数超过阈值后，把较早的工具结果和对话压缩成一条摘要消息
+    相比MemoryManager按条数直接丢弃最早的消息，压缩可以让长时间运行的智能体在上下文长度基本不变的前提下保留历史信息
+    被压缩的原始消息会放进MemoryManager的冷存储，可以通过摘要编号取回
+
+    Args:
+        llm (LLM): 用于生成摘要的大模型实例，可以和智能体共用，也可以用一个更便宜的模型
+        token_threshold (int, optional): 触发压缩的记忆token数阈值，默认8000
+        keep_recent (int, optional): 压缩时保留最近的消息条数，默认4
+        max_chars_per_message (int, optional): 送去压缩的每条消息最多保留的字符数，默认2000
+    """
+
+    def __init__(self,
+                 llm: LLM,
+                 token_threshold: int = 8000,
+                 keep_recent: int = 4,
+                 max_chars_per_message: int = 2000):
+        self.llm = llm
+        self.token_threshold = token_threshold
+        self.keep_recent = keep_recent
+        self.max_chars_per_message = max_chars_per_message
+
+    def should_compress(self, memory_manager: MemoryManager) -> bool:
+        """判断记忆是否需要压缩
+
+        Args:
+            memory_manager (MemoryManager): 记忆管理器
+
+        Returns:
+            bool: 是否需要压缩
+        """
+        return memory_manager.count_tokens() >= self.token_threshold
+
+    def _select_messages(self, memory: List[Dict]) -> List[Dict]:
+        """选出需要压缩的消息：开头的system消息和用户的第一个问题要保留，最近的keep_recent条消息也要保留，剩下的中间部分压缩
+
+        Args:
+            memory (List[Dict]): 全部记忆
+
+        Returns:
+            List[Dict]: 需要压缩的消息
+        """
+        # 开头的system消息和用户的问题固定保留
+        start = 0
+        while start < len(memory) and memory[start].get("role") == "system":
+            start += 1
+        if start < len(memory) and memory[start].get("role") == "user":
+            start += 1
+
+        # 最后一条是正在执行工具的assistant消息，至少要保留它，否则压缩期间追加的tool消息就找不到对应的调用了
+        # tool消息必须紧跟在发起调用的assistant消息后面，所以保留区不能从tool消息开始
+        end = max(start, len(memory) - max(self.keep_recent, 1))
+        while end > start and end < len(memory) and memory[end].get(
+                "role") == "tool":
+            end -= 1
+
+        return memory[start:end]
+
+    def _format_messages(self, messages: List[Dict]) -> str:
+        """把需要压缩的消息拼成一段文本，每条消息过长时截断
+
+        Args:
+            messages (List[Dict]): 需要压缩的消息
+
+        Returns:
+            str: 拼接后的文本
+        """
+        lines = []
+        for message in messages:
+            content = message.get("content") or ""
+            if len(content) > self.max_chars_per_message:
+                content = content[:self.max_chars_per_message] + "……"
+            for tool_call in message.get("tool_calls") or []:
+                content += f"\n调用工具：{tool_call['function']['name']}，入参：{tool_call['function']['arguments']}"
+            lines.append(f"[{message.get('role')}] {content}")
+        return "\n".join(lines)
+
+    async def summarize(self, messages: List[Dict]) -> str:
+        """调用大模型生成摘要
+
+        Args:
+            messages (List[Dict]): 需要压缩的消息
+
+        Returns:
+            str: 摘要
+        """
+        response = await self.llm.chat(messages=[{
+            "role": "system",
+            "content": COMPRESS_PROMPT
+        }, {
+            "role": "user",
+            "content": self._format_messages(messages)
+        }],
+                                        stream=False)
+        return response.content or ""
+
+    async def compress(
+            self,
+            memory_manager: MemoryManager) -> Optional[Tuple[str, Dict]]:
+        """压缩记忆，可以和工具执行并发运行，压缩期间新增的消息不受影响
+
+        Args:
+            memory_manager (MemoryManager): 记忆管理器
+
+        Returns:
+            Optional[Tuple[str, Dict]]: 摘要编号和摘要消息，没有可压缩的消息时返回None
+        """
+        # 先拍一个快照，后面按对象身份替换，不受并发追加消息的影响
+        messages = self._select_messages(list(memory_manager.get_memory()))
+        if not messages:
+            return None
+
+        summary = await self.summarize(messages)
+        digest_id = uuid.uuid4().hex[:8]
+        digest = {
+            "role": "assistant",
+            "content": f"【历史摘要，编号{digest_id}】\n{summary}",
+        }
+        memory_manager.replace_with_digest(messages, digest, digest_id)
+        logger.info(
+            f"记忆压缩完成：{len(messages)}条消息压缩为摘要{digest_id}，当前记忆约{memory_manager.count_tokens()}个token"
+        )
+        return digest_id, digest
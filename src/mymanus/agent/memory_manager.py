@@ -1,18 +1,40 @@
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Optional, Any
 from pydantic import BaseModel, Field
 # pydantic：将Python代码的数据类型验证实体化
 
 
+def estimate_tokens(message: Dict[str, Any]) -> int:
+    """粗略估计一条消息的token数，不依赖分词器
+    经验值：中文大约1个字1个token，英文大约4个字符1个token，够用来判断要不要压缩记忆了
+
+    Args:
+        message (Dict[str, Any]): 消息
+
+    Returns:
+        int: 估计的token数
+    """
+    text = message.get("content") or ""
+    # assistant消息调用工具时content可能为空，但工具入参同样占token
+    for tool_call in message.get("tool_calls") or []:
+        text += tool_call["function"]["name"] + tool_call["function"][
+            "arguments"]
+    ascii_count = sum(1 for char in text if char.isascii())
+    return len(text) - ascii_count + ascii_count // 4 + 1
+
+
 class MemoryManager(BaseModel):
     """记忆管理器，用于存储对话历史
-    
+
     Args:
         memory (`List[Dict[str, str]]`): 记忆
         max_memory (`int`): 最大记忆数
+        archive (`Dict[str, List[Dict]]`): 冷存储，key是摘要编号，value是被压缩掉的原始消息
     """
     memory: List[Dict[str, str]] = Field(default_factory=list,
                                          description="记忆")
     max_memory: int = Field(default=10, description="最大记忆数")
+    archive: Dict[str, List[Dict]] = Field(default_factory=dict,
+                                           description="被压缩消息的冷存储")
 
     def add_message(self, message: Union[Dict[str, str], List[Dict[str,
                                                                    str]]]):
@@ -34,9 +56,69 @@ class MemoryManager(BaseModel):
         """获取记忆"""
         return self.memory
 
+    def count_tokens(self, messages: Optional[List[Dict]] = None) -> int:
+        """估计消息列表的总token数
+
+        Args:
+            messages (List[Dict], optional): 消息列表，默认是全部记忆
+
+        Returns:
+            int: 估计的token数
+        """
+        if messages is None:
+            messages = self.memory
+        return sum(estimate_tokens(message) for message in messages)
+
+    def replace_with_digest(self, messages: List[Dict], digest: Dict,
+                            digest_id: str):
+        """用一条摘要消息替换掉记忆中的一段旧消息，原始消息放入冷存储
+        压缩和工具执行是并发的，期间记忆尾部可能新增了消息、头部也可能被淘汰了消息，所以这里按对象身份而不是下标来定位
+
+        Args:
+            messages (List[Dict]): 被压缩的原始消息
+            digest (Dict): 摘要消息
+            digest_id (str): 摘要编号，用于从冷存储取回原始消息
+        """
+        archived_ids = {id(message) for message in messages}
+        new_memory = []
+        inserted = False
+        for message in self.memory:
+            if id(message) in archived_ids:
+                # 摘要放在被压缩的第一条消息原来的位置上
+                if not inserted:
+                    new_memory.append(digest)
+                    inserted = True
+                continue
+            new_memory.append(message)
+
+        # 被压缩的消息已经全部被淘汰了，摘要就接在开头的system消息后面
+        if not inserted:
+            index = 0
+            while index < len(new_memory) and new_memory[index].get(
+                    "role") == "system":
+                index += 1
+            new_memory.insert(index, digest)
+
+        self.memory = new_memory
+        self.archive[digest_id] = list(messages)
+
+    def get_archive(self, digest_id: str) -> List[Dict]:
+        """从冷存储取回被压缩的原始消息
+
+        Args:
+            digest_id (str): 摘要编号
+
+        Returns:
+            List[Dict]: 原始消息
+        """
+        if digest_id not in self.archive:
+            raise ValueError(f"摘要编号{digest_id}不存在")
+        return self.archive[digest_id]
+
     def clear(self):
         """清空记忆"""
         self.memory = []
+        self.archive = {}
 
 
 if __name__ == "__main__":
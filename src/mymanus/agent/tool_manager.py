@@ -2,9 +2,14 @@ from pydantic import BaseModel, Field, model_validator
 from typing import Callable, get_type_hints, Dict, Any, Type, Optional, List, Literal, get_args, get_origin, Tuple, Union, override
 import random
 import inspect
+import asyncio
+import importlib
+import importlib.util
+import json
+import os
 import warnings
 from abc import ABC, abstractmethod
-from mymanus.tool.math import add
+from mymanus.tool.cache import BaseToolCache, CachePolicy, get_cache_key
 
 
 class BaseTool(BaseModel, ABC):
@@ -317,44 +322,205 @@ class FunctionTool(BaseTool):
         return self.tool(**kwargs)
 
 
+class LazyFunctionTool:
+    """按导入路径懒注册的函数工具，注册时不导入工具所在的模块，也不做pydantic校验和schema反射
+    第一次需要schema或者执行时才真正导入，如果ToolManager的schema缓存里有这个工具，生成schema时也不用导入
+
+    Args:
+        import_path (str): 工具函数的导入路径，格式为"模块路径:函数名"，例如"mymanus.tool.search:baidu_search"
+        tool_name (str): 工具名称
+        tool_schema (Dict[str, Any], optional): 预先编译好的工具schema，默认None表示第一次用到时生成
+        cache_policy (CachePolicy, optional): 缓存策略，默认None表示读取工具上用装饰器声明的策略
+    """
+
+    def __init__(self,
+                 import_path: str,
+                 tool_name: str,
+                 tool_schema: Optional[Dict[str, Any]] = None,
+                 cache_policy: Optional[CachePolicy] = None):
+        self.import_path = import_path
+        self.tool_name = tool_name
+        self.cache_policy = cache_policy
+        self._tool_schema = tool_schema
+        self._function_tool: Optional[FunctionTool] = None
+
+    @property
+    def loaded(self) -> bool:
+        """工具函数是否已经导入"""
+        return self._function_tool is not None
+
+    @property
+    def has_schema(self) -> bool:
+        """是否已经有schema，不需要再导入模块生成"""
+        return self._tool_schema is not None
+
+    def load(self) -> FunctionTool:
+        """导入工具函数，生成对应的FunctionTool
+
+        Returns:
+            FunctionTool: 函数工具
+        """
+        if self._function_tool is None:
+            module_name, _, function_name = self.import_path.partition(":")
+            function = getattr(importlib.import_module(module_name),
+                               function_name)
+            # 已经有schema就直接用，不用再反射一遍
+            self._function_tool = FunctionTool(tool=function,
+                                               tool_name=self.tool_name,
+                                               tool_schema=self._tool_schema)
+            self._tool_schema = self._function_tool.tool_schema
+        return self._function_tool
+
+    @property
+    def tool(self) -> Callable:
+        """工具函数"""
+        return self.load().tool
+
+    @property
+    def tool_schema(self) -> Dict[str, Any]:
+        """工具schema"""
+        if self._tool_schema is None:
+            self.load()
+        return self._tool_schema
+
+    def get_cache_policy(self) -> Optional[CachePolicy]:
+        """获取缓存策略，没有注册时指定的话需要导入工具读取装饰器声明的策略
+
+        Returns:
+            Optional[CachePolicy]: 缓存策略，不可缓存时返回None
+        """
+        cache_policy = self.cache_policy
+        if cache_policy is None:
+            cache_policy = getattr(self.tool, "__cache_policy__", None)
+        if cache_policy is not None and cache_policy.cacheable:
+            return cache_policy
+        return None
+
+    def execute(self, **kwargs) -> Any:
+        """执行工具"""
+        return self.load().execute(**kwargs)
+
+
 class ToolManager:
     """工具管理类，管理所有的工具，期望具备的功能：
     1. 工具注册：让工具管理器感知到，包括生成对应的schema保存起来
     2. 工具执行：执行工具，并返回结果
     3. 工具删除：删除工具
     4. 工具列表：获取所有工具列表
+    5. 工具缓存：相同工具、相同入参的结果可以按缓存策略复用
     
+    工具既可以直接传函数注册，也可以传"模块路径:函数名"形式的导入路径懒注册，懒注册的工具用到时才导入
+
     Args:
-        tools (Dict[str, BaseTool]): 工具字典，key是工具名称，value是工具实例
+        cache (BaseToolCache, optional): 工具结果缓存，默认None表示不缓存
+        schema_cache_path (str, optional): 懒注册工具的schema缓存文件，工具模块没有修改时直接读取schema，不用导入模块，默认None表示不缓存
     
     """
 
     # 初始化类
-    def __init__(self):
-        self.tools: Dict[str, BaseTool] = {}  # 每一个工具都是BaseTool实例
+    def __init__(self,
+                 cache: Optional[BaseToolCache] = None,
+                 schema_cache_path: Optional[str] = None):
+        self.tools: Dict[str, Union[BaseTool, LazyFunctionTool]] = {
+        }  # 每一个工具都是BaseTool实例，懒注册的工具是LazyFunctionTool实例
+        self.cache = cache
+        self.schema_cache_path = schema_cache_path
+        self.schema_cache: Dict[str, Dict[str, Any]] = {}
+        if schema_cache_path and os.path.exists(schema_cache_path):
+            with open(schema_cache_path, "r", encoding="utf-8") as f:
+                self.schema_cache = json.load(f)
+        # 每个工具的缓存策略，没有策略的工具不缓存
+        self.cache_policies: Dict[str, CachePolicy] = {}
+        # 正在执行的工具调用，相同的调用并发进来时只执行一次
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 每个工具的缓存命中情况
+        self.cache_stats: Dict[str, Dict[str, int]] = {}
 
     # 工具注册：让工具管理器感知到
-    def register_tool(self, tool: Any, tool_name: Optional[str] = None):
+    def register_tool(self,
+                      tool: Any,
+                      tool_name: Optional[str] = None,
+                      cache_policy: Optional[CachePolicy] = None):
         """注册工具
 
         Args:
-            tool (Any): 工具，形式不限
+            tool (Any): 工具，形式不限，传入"模块路径:函数名"形式的字符串时按导入路径懒注册
             tool_name (Optional[str]): 工具名称，默认是函数名
+            cache_policy (Optional[CachePolicy]): 缓存策略，默认读取工具上用cache_policy装饰器声明的策略，都没有则不缓存
         """
         # 后面可能会增加工具是类的可能性，现在默认就是一个函数
         # 生成工具的名称，没有名称给一个默认的名称
         if tool_name is None:
-            tool_name = tool.__name__
+            tool_name = tool.partition(":")[2] if isinstance(
+                tool, str) else tool.__name__
         elif tool_name in self.tools:
             warnings.warn(f"工具名称{tool_name}已存在，将覆盖原有工具")
 
+        if isinstance(tool, str):
+            self.tools[tool_name] = LazyFunctionTool(
+                import_path=tool,
+                tool_name=tool_name,
+                tool_schema=self._load_cached_schema(tool, tool_name),
+                cache_policy=cache_policy)
+            self.cache_policies.pop(tool_name, None)
+            return
+
+        if cache_policy is None:
+            cache_policy = getattr(tool, "__cache_policy__", None)
+        if cache_policy is not None and cache_policy.cacheable:
+            self.cache_policies[tool_name] = cache_policy
+        else:
+            self.cache_policies.pop(tool_name, None)
+
         # 生成工具的实例
         tool = FunctionTool(tool=tool, tool_name=tool_name)
         self.tools[tool_name] = tool
 
+    def _get_module_mtime(self, import_path: str) -> Optional[float]:
+        """获取工具所在模块文件的修改时间，用来判断schema缓存是否过期，只查找模块文件而不执行模块"""
+        try:
+            spec = importlib.util.find_spec(import_path.partition(":")[0])
+        except (ImportError, ValueError):
+            return None
+        if spec is None or not spec.origin or not os.path.exists(spec.origin):
+            return None
+        return os.path.getmtime(spec.origin)
+
+    def _load_cached_schema(self, import_path: str,
+                            tool_name: str) -> Optional[Dict[str, Any]]:
+        """从schema缓存中读取懒注册工具的schema，模块文件修改过则缓存失效"""
+        cached = self.schema_cache.get(f"{import_path}#{tool_name}")
+        if cached is None or cached["mtime"] != self._get_module_mtime(
+                import_path):
+            return None
+        return cached["schema"]
+
+    def _save_cached_schema(self, tool: LazyFunctionTool):
+        """把懒注册工具生成的schema写入schema缓存文件"""
+        self.schema_cache[f"{tool.import_path}#{tool.tool_name}"] = {
+            "mtime": self._get_module_mtime(tool.import_path),
+            "schema": tool.tool_schema
+        }
+        with open(self.schema_cache_path, "w", encoding="utf-8") as f:
+            json.dump(self.schema_cache, f, ensure_ascii=False)
+
+    def _get_cache_policy(self, tool_name: str) -> Optional[CachePolicy]:
+        """获取工具的缓存策略，不可缓存时返回None"""
+        tool = self.tools[tool_name]
+        if isinstance(tool, LazyFunctionTool):
+            return tool.get_cache_policy()
+        return self.cache_policies.get(tool_name)
+
+    async def _run_tool(self, tool_name: str, **kwargs) -> Any:
+        """执行工具本身，兼容同步和异步的工具函数"""
+        result = self.tools[tool_name].execute(**kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
     # 工具执行：执行工具，并返回结果
-    def execute_tool(self, tool_name: str, **kwargs) -> Any:
-        """执行工具
+    async def execute_tool(self, tool_name: str, **kwargs) -> Any:
+        """执行工具，可缓存的工具先查缓存，相同的调用同时进来时只真正执行一次
 
         Args:
             tool_name (str): 工具名称
@@ -366,7 +532,54 @@ class ToolManager:
         if tool_name not in self.tools:
             raise ValueError(f"工具名称{tool_name}不存在")
 
-        return self.tools[tool_name].execute(**kwargs)
+        if self.cache is None:
+            return await self._run_tool(tool_name, **kwargs)
+        cache_policy = self._get_cache_policy(tool_name)
+        if cache_policy is None:
+            return await self._run_tool(tool_name, **kwargs)
+
+        stats = self.cache_stats.setdefault(tool_name, {
+            "hits": 0,
+            "misses": 0
+        })
+        key = get_cache_key(tool_name, kwargs)
+        hit, result = self.cache.get(key)
+        if hit:
+            stats["hits"] += 1
+            return result
+
+        # 同样的调用正在执行，等它的结果就行，也算命中
+        if key in self._inflight:
+            stats["hits"] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._run_tool(tool_name, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他调用在等的话，避免出现异常未被获取的警告
+            future.exception()
+            raise
+        else:
+            self.cache.set(key, result, cache_policy.ttl)
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """获取每个工具的缓存命中情况
+
+        Returns:
+            Dict[str, Dict[str, int]]: key是工具名称，value包括hits（命中次数）和misses（未命中次数）
+        """
+        return self.cache_stats
 
     # 工具删除：删除工具
     def delete_tool(self, tool_name: str) -> bool:
@@ -380,6 +593,7 @@ class ToolManager:
         """
         if tool_name in self.tools:
             del self.tools[tool_name]
+            self.cache_policies.pop(tool_name, None)
             return True
 
         return False
@@ -400,7 +614,16 @@ class ToolManager:
         Returns:
             工具schema列表
         """
-        return [tool.tool_schema for tool in self.tools.values()]
+        schema_list = []
+        for tool in self.tools.values():
+            # 懒注册的工具第一次生成schema后写入缓存，下次启动不用再导入
+            if isinstance(tool, LazyFunctionTool
+                          ) and not tool.has_schema and self.schema_cache_path:
+                schema_list.append(tool.tool_schema)
+                self._save_cached_schema(tool)
+            else:
+                schema_list.append(tool.tool_schema)
+        return schema_list
 
 
 # 模拟天气查询工具。返回结果示例："北京今天是雨天。"
@@ -468,6 +691,5 @@ if __name__ == "__main__":
 
     # print(get_origin(12345))
     # print(get_args(None))
-    # func = add
-    # tool_manager.register_tool(func)
+    # tool_manager.register_tool("mymanus.tool.math:add")
     # print(tool_manager.tools['add'].tool_schema)
@@ -0,0 +1,132 @@
+from typing import Dict
+from abc import ABC, abstractmethod
+from pathlib import Path
+import hashlib
+
+
+class BaseToolResultStore(ABC):
+    """工具结果存储基类，把过长的工具结果放到上下文之外保存
+    大模型的上下文里只保留一段预览和一个句柄，需要时再通过read_tool_result工具分段读取，避免一个很长的搜索结果在之后的每一步都被重复发送给大模型
+
+    Args:
+        max_inline_chars (int, optional): 工具结果超过这个字符数就转存，默认4000
+        preview_chars (int, optional): 转存后上下文中保留的预览字符数，默认1000
+    """
+
+    # 读取工具的名称，读取结果本身不能再被转存
+    tool_name = "read_tool_result"
+
+    def __init__(self, max_inline_chars: int = 4000, preview_chars: int = 1000):
+        self.max_inline_chars = max_inline_chars
+        self.preview_chars = preview_chars
+
+    @staticmethod
+    def _get_handle(content: str) -> str:
+        """按内容生成句柄，相同的内容只存一份
+
+        Args:
+            content (str): 工具结果
+
+        Returns:
+            str: 句柄
+        """
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    @abstractmethod
+    def put(self, content: str) -> str:
+        """保存工具结果，返回句柄"""
+
+    @abstractmethod
+    def get(self, handle: str) -> str:
+        """根据句柄取回完整的工具结果"""
+
+    def offload(self, content: str) -> str:
+        """工具结果过长时转存，返回预览和句柄，否则原样返回
+
+        Args:
+            content (str): 工具结果
+
+        Returns:
+            str: 放进上下文的内容
+        """
+        if not isinstance(content, str) or len(
+                content) <= self.max_inline_chars:
+            return content
+
+        handle = self.put(content)
+        return (
+            f"{content[:self.preview_chars]}\n……\n"
+            f"【工具结果过长，已转存，以上为前{self.preview_chars}个字符的预览，全文共{len(content)}个字符，句柄：{handle}。"
+            f"如需查看更多内容，请调用{self.tool_name}工具分段读取】")
+
+    async def read_tool_result(self,
+                               handle: str,
+                               offset: int = 0,
+                               length: int = 2000) -> str:
+        """分段读取已转存的过长工具结果
+
+        Args:
+            handle (str): 工具结果的句柄
+            offset (int): 起始字符位置，默认0
+            length (int): 读取的字符数，默认2000
+
+        Returns:
+            str: 工具结果片段
+        """
+        content = self.get(handle)
+        # 单次读取不能超过转存阈值，否则读出来的内容又把上下文撑大了
+        length = max(0, min(length, self.max_inline_chars))
+        offset = max(0, offset)
+        end = min(offset + length, len(content))
+        return f"【句柄{handle}，第{offset}至{end}个字符，全文共{len(content)}个字符】\n{content[offset:end]}"
+
+
+class MemoryToolResultStore(BaseToolResultStore):
+    """把工具结果保存在内存中，适合单进程运行的智能体"""
+
+    def __init__(self, max_inline_chars: int = 4000, preview_chars: int = 1000):
+        super().__init__(max_inline_chars, preview_chars)
+        self.results: Dict[str, str] = {}
+
+    def put(self, content: str) -> str:
+        handle = self._get_handle(content)
+        self.results[handle] = content
+        return handle
+
+    def get(self, handle: str) -> str:
+        if handle not in self.results:
+            raise ValueError(f"工具结果句柄{handle}不存在")
+        return self.results[handle]
+
+
+class DiskToolResultStore(BaseToolResultStore):
+    """把工具结果按内容寻址保存在磁盘上，多个智能体进程可以共用同一个目录
+
+    Args:
+        storage_dir (str, optional): 保存目录，默认".tool_results"
+        max_inline_chars (int, optional): 工具结果超过这个字符数就转存，默认4000
+        preview_chars (int, optional): 转存后上下文中保留的预览字符数，默认1000
+    """
+
+    def __init__(self,
+                 storage_dir: str = ".tool_results",
+                 max_inline_chars: int = 4000,
+                 preview_chars: int = 1000):
+        super().__init__(max_inline_chars, preview_chars)
+        self.storage_dir = Path(storage_dir)
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+
+    def put(self, content: str) -> str:
+        handle = self._get_handle(content)
+        path = self.storage_dir / f"{handle}.txt"
+        # 内容寻址，文件已存在说明内容一样，不用重复写
+        if not path.exists():
+            path.write_text(content, encoding="utf-8")
+        return handle
+
+    def get(self, handle: str) -> str:
+        path = self.storage_dir / f"{handle}.txt"
+        # 句柄是大模型传进来的，只允许字母数字，防止读到目录之外的文件
+        if not handle.isalnum() or not path.exists():
+            raise ValueError(f"工具结果句柄{handle}不存在")
+        return path.read_text(encoding="utf-8")
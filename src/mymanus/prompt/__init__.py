@@ -35,3 +35,13 @@ FINAL_STEP_PROMPT = """
 5. 回复尽可能结构化分点陈述
 6. 如果设计搜索的网页url，在回复中也要提供
 """
+
+COMPRESS_PROMPT = """
+请把下面这段智能体与用户、工具之间的历史交互压缩成一份简洁的摘要，供智能体后续步骤参考。
+# 注意事项：
+1. 保留用户的需求、已经调用过的工具及其关键结论
+2. 保留后续步骤可能用到的关键事实、数据和网页url
+3. 删除重复、冗余和与任务无关的内容
+4. 不要编造历史中没有的信息
+5. 直接输出摘要内容，不要输出任何其他说明
+"""
@@ -1,4 +1,14 @@
 from .terminate import terminate
 from .general import *
-from .search import *
 from .math import *
+
+__all__ = ["terminate", "get_current_time", "add", "baidu_search"]
+
+
+def __getattr__(name: str):
+    # 百度搜索依赖baidusearch及其网络请求相关的库，导入比较慢，用到时再导入
+    if name == "baidu_search":
+        from .search import baidu_search
+        globals()[name] = baidu_search
+        return baidu_search
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,153 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from pydantic import BaseModel, Field
+import hashlib
+import json
+import time
+
+
+class CachePolicy(BaseModel):
+    """工具结果的缓存策略
+
+    Args:
+        cacheable (bool): 是否可以缓存，默认True
+        ttl (float, optional): 缓存有效期（秒），默认None表示纯函数，结果永久有效
+    """
+    cacheable: bool = Field(default=True, description="是否可以缓存")
+    ttl: Optional[float] = Field(default=None, description="缓存有效期（秒）")
+
+
+def cache_policy(cacheable: bool = True, ttl: Optional[float] = None):
+    """用装饰器声明工具的缓存策略，ToolManager注册工具时会读取
+
+    Args:
+        cacheable (bool, optional): 是否可以缓存，默认True
+        ttl (float, optional): 缓存有效期（秒），默认None表示纯函数，结果永久有效
+    """
+
+    def decorator(func: Callable) -> Callable:
+        func.__cache_policy__ = CachePolicy(cacheable=cacheable, ttl=ttl)
+        return func
+
+    return decorator
+
+
+def no_cache(func: Callable) -> Callable:
+    """声明工具不可缓存，例如获取当前时间这种每次结果都不一样的工具"""
+    return cache_policy(cacheable=False)(func)
+
+
+def get_cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    """生成缓存的key：工具名称+规范化的json入参，入参顺序不同也能命中同一个缓存
+
+    Args:
+        tool_name (str): 工具名称
+        arguments (Dict[str, Any]): 工具入参
+
+    Returns:
+        str: 缓存key
+    """
+    return tool_name + ":" + json.dumps(arguments,
+                                        sort_keys=True,
+                                        ensure_ascii=False,
+                                        separators=(",", ":"),
+                                        default=str)
+
+
+class BaseToolCache(ABC):
+    """工具结果缓存的基类"""
+
+    @abstractmethod
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """读取缓存，返回是否命中和缓存的结果"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """写入缓存，ttl为None表示永久有效"""
+
+    @abstractmethod
+    def clear(self):
+        """清空缓存"""
+
+
+class MemoryToolCache(BaseToolCache):
+    """内存LRU缓存，超过最大条数时淘汰最久没有用过的结果
+
+    Args:
+        max_size (int, optional): 最大缓存条数，默认1024
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        # value是(过期时间, 结果)，过期时间为None表示永久有效
+        self.cache: OrderedDict[str, Tuple[Optional[float],
+                                           Any]] = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        if key not in self.cache:
+            return False, None
+        expire_at, value = self.cache[key]
+        if expire_at is not None and expire_at < time.time():
+            del self.cache[key]
+            return False, None
+        self.cache.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expire_at = time.time() + ttl if ttl is not None else None
+        self.cache[key] = (expire_at, value)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class DiskToolCache(BaseToolCache):
+    """磁盘缓存，多个会话、多个进程可以共用同一个目录，结果必须能被json序列化
+
+    Args:
+        cache_dir (str, optional): 缓存目录，默认".tool_cache"
+    """
+
+    def __init__(self, cache_dir: str = ".tool_cache"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _get_path(self, key: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        path = self._get_path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False, None
+        if data["expire_at"] is not None and data["expire_at"] < time.time():
+            path.unlink(missing_ok=True)
+            return False, None
+        return True, data["value"]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expire_at = time.time() + ttl if ttl is not None else None
+        try:
+            content = json.dumps({
+                "expire_at": expire_at,
+                "value": value
+            },
+                                 ensure_ascii=False)
+        except TypeError:
+            # 结果不能被json序列化就不缓存了
+            return
+        # 先写临时文件再替换，避免别的进程读到写了一半的文件
+        path = self._get_path(key)
+        tmp_path = path.with_suffix(f".{time.time_ns()}.tmp")
+        tmp_path.write_text(content, encoding="utf-8")
+        tmp_path.replace(path)
+
+    def clear(self):
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
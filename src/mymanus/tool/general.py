@@ -1,6 +1,8 @@
 from datetime import datetime
+from .cache import no_cache
 
 
+@no_cache
 async def get_current_time() -> str:
     """查询当前时间的工具。返回结果示例：“当前时间：2024-04-15 17:15:18。“
 
@@ -1,6 +1,8 @@
 from typing import List
+from .cache import cache_policy
 
 
+@cache_policy()
 async def add(numbers: List[float]) -> float:
     """对任意个数的数字进行加法运算
     
@@ -1,7 +1,10 @@
 from baidusearch.baidusearch import search
 from typing import Optional
+from .cache import cache_policy
 
 
+# 搜索结果会随时间变化，缓存一小时
+@cache_policy(ttl=3600)
 async def baidu_search(query: str, num_results: Optional[int] = 10) -> str:
     """百度搜索工具
 
@@ -1,3 +1,7 @@
+from .cache import no_cache
+
+
+@no_cache
 async def terminate():
     """这是一个特殊的工具，这个工具的作用就是一旦调用，就意味着智能体已经解决了所有的问题，返回一个固定回答
     
@@ -0,0 +1,87 @@
+# 测试智能体冷启动耗时：用python -X importtime统计各个模块的import耗时，并对比直接注册和按导入路径懒注册工具的耗时
+# 用法：python startup_bench.py [--top 15]
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+
+# 直接注册：导入所有工具函数，注册时就做pydantic校验和schema反射
+EAGER_CODE = """
+import time
+start = time.perf_counter()
+from mymanus.agent import ToolManager
+from mymanus.tool import baidu_search, get_current_time, terminate, add
+tool_manager = ToolManager()
+for tool in [baidu_search, get_current_time, terminate, add]:
+    tool_manager.register_tool(tool)
+tool_manager.get_tool_schema_list()
+print(time.perf_counter() - start)
+"""
+
+# 懒注册：按导入路径注册，schema从缓存文件读取，工具模块用到时才导入
+LAZY_CODE = """
+import sys, time
+start = time.perf_counter()
+from mymanus.agent import ToolManager
+tool_manager = ToolManager(schema_cache_path=sys.argv[1])
+for path in ["mymanus.tool.search:baidu_search", "mymanus.tool.general:get_current_time",
+             "mymanus.tool.terminate:terminate", "mymanus.tool.math:add"]:
+    tool_manager.register_tool(path)
+tool_manager.get_tool_schema_list()
+print(time.perf_counter() - start)
+"""
+
+
+def run(code: str, *args: str, importtime: bool = False):
+    """在新的python进程中运行代码，返回标准输出和标准错误"""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", code, *args]
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    result = subprocess.run(command,
+                            capture_output=True,
+                            text=True,
+                            env=env,
+                            check=True)
+    return result.stdout, result.stderr
+
+
+def parse_importtime(stderr: str):
+    """解析-X importtime的输出，返回(累计耗时us, 模块名)列表"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        records.append((int(cumulative), module.rstrip()))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="智能体冷启动耗时测试")
+    parser.add_argument("--top", type=int, default=15, help="打印耗时最多的模块个数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        schema_cache_path = os.path.join(tmp_dir, "schema_cache.json")
+        # 先跑一次生成schema缓存，相当于部署时预编译
+        run(LAZY_CODE, schema_cache_path)
+
+        for name, code, extra_args in [("直接注册", EAGER_CODE, []),
+                                       ("懒注册", LAZY_CODE,
+                                        [schema_cache_path])]:
+            stdout, stderr = run(code, *extra_args, importtime=True)
+            records = parse_importtime(stderr)
+            print(f"===== {name}：启动耗时{float(stdout) * 1000:.1f}ms，"
+                  f"共导入{len(records)}个模块 =====")
+            for cumulative, module in sorted(records,
+                                             reverse=True)[:args.top]:
+                print(f"{cumulative / 1000:>10.1f}ms  {module}")
+
+
+if __name__ == "__main__":
+    main()